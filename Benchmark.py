@@ -0,0 +1,266 @@
+##############################################################################
+# 							BENCHMARK										 #
+##############################################################################
+"""
+Name:		Benchmark.py
+
+Benchmark of the FileHandler pipeline of TimeSeriesHandler.py on synthetic sensor logs in the "Date Time T= H= TO="
+format. The generator controls the rates of invalid dates, out-of-range values, duplicates, NaN values and outliers.
+Every stage is timed (wall and CPU time) at increasing sizes, the throughput in rows/second and the scaling exponent
+between sizes are reported. The results are stored as JSON and can be compared with an earlier run.
+
+Usage:
+python Benchmark.py [-n <rows> ...] [-r <repeat>] [--label <label>] [--compare <filename>] [--output-dir <dir>]
+	[--data-dir <dir>] [--plot <filename>] [TimeSeriesHandler.py options except -i/-o, e.g. -md -u limit -c 1000000]
+
+Sizes of 10^7 rows and more need the chunked mode (-c) and several GB of disk space for the generated files.
+"""
+
+####### Import ########
+import pandas as pd
+import numpy as np
+import argparse, sys
+import os
+import io
+import json
+import platform
+import tempfile
+from datetime import datetime
+import warnings
+warnings.filterwarnings(action='ignore')
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from rich.console import Console
+from rich.table import Table
+
+from TimeSeriesHandler import FileHandler, StageProfiler, build_parser, default_config
+
+###### Synthetic sensor log ######
+def write_sensor_log(path:str, rows:int, rng:np.random.Generator, invalid_dates:float=0.01, out_of_range:float=0.01,
+	duplicates:float=0.01, nan:float=0.01, outliers:float=0.005, block:int=1000000) -> None:
+	"""
+	Writes a sensor log with rows lines in blocks of block rows. The rates are fractions of the rows:
+	- invalid_dates: timestamps from the year 1022, in the future or jumping back one hour
+	- out_of_range: Temp outside [0, 50] or Hum outside [0, 100]
+	- duplicates: the previous line is repeated
+	- nan: empty Temp or Hum value
+	- outliers: values far from the mean but in the valid range
+	"""
+	start = np.datetime64('2022-09-14T19:33:07')
+	with open(path, 'w') as file:
+		for offset in range(0, rows, block):
+			size = min(block, rows - offset)
+			times = start + (np.arange(offset, offset + size) * 300 + rng.integers(0, 3, size)).astype('timedelta64[s]')
+			temp = np.round(rng.normal(22, 1.5, size), 1)
+			hum = np.round(rng.normal(45, 5, size), 1)
+			kind = rng.random((5, size))
+			# invalid dates
+			invalid = kind[0] < invalid_dates
+			choice = rng.integers(0, 3, size)
+			times = np.where(invalid & (choice == 0), times - np.timedelta64(365 * 1000, 'D'), times)
+			times = np.where(invalid & (choice == 1), np.datetime64('2099-01-01T00:00:00'), times)
+			times = np.where(invalid & (choice == 2), times - np.timedelta64(3600, 's'), times)
+			# values out of the valid range and outliers
+			wrong = kind[1] < out_of_range
+			temp = np.where(wrong & (choice == 0), 85.0, temp)
+			hum = np.where(wrong & (choice != 0), 120.0, hum)
+			outlier = kind[2] < outliers
+			temp = np.where(outlier & (choice == 0), 45.0, temp)
+			hum = np.where(outlier & (choice != 0), 95.0, hum)
+			dates = pd.Series(np.datetime_as_string(times, unit='s')).str.replace('T', ' ', regex=False)
+			temp = pd.Series(temp).astype(str).mask(kind[3] < nan / 2, '')
+			hum = pd.Series(hum).astype(str).mask((kind[3] >= nan / 2) & (kind[3] < nan), '')
+			lines = (dates + ' T=' + temp + ' H=' + hum + ' TO=45').to_numpy(dtype=object)
+			# duplicates of the previous line
+			repeat = np.flatnonzero(kind[4][1:] < duplicates) + 1
+			lines = np.insert(lines, repeat, lines[repeat - 1])
+			file.write('\n'.join(lines))
+			file.write('\n')
+
+def sensor_log(directory:str, rows:int, seed:int, rates:dict) -> str:
+	"""
+	Path of the synthetic sensor log for rows, seed and rates. The file is generated once and reused.
+	"""
+	name = f'sensor_{rows}_{seed}_' + '_'.join(f'{rates[key]:g}' for key in sorted(rates)) + '.log'
+	path = os.path.join(directory, name)
+	if not os.path.exists(path):
+		write_sensor_log(path + '.partial', rows, np.random.default_rng(seed), **rates)
+		os.replace(path + '.partial', path)
+	return path
+
+###### Benchmark ######
+# defaults of the TimeSeriesHandler.py options that differ from the command line: IQR and remove, no cache
+HANDLER_DEFAULTS = {'inputfile': None, 'outputfile': None, 'iqr': True, 'outlier': 'remove', 's': 3, 'no_cache': True}
+
+def handler_options(arguments:list) -> argparse.Namespace:
+	"""
+	Options of TimeSeriesHandler.py (build_parser) from the arguments that are not options of the benchmark.
+	"""
+	return build_parser(HANDLER_DEFAULTS).parse_args(arguments)
+
+def handler_args(inputfile:str, outputfile:str, plotfile:str, options:argparse.Namespace) -> argparse.Namespace:
+	"""
+	Arguments of TimeSeriesHandler.py for one benchmark run (default_config with the forwarded options).
+	"""
+	return default_config(**{**vars(options.handler), 'inputfile': inputfile, 'outputfile': outputfile, 'plotfile': plotfile, 'plot': False, 'profile': None})
+
+def run_pipeline(path:str, directory:str, options:argparse.Namespace) -> dict:
+	"""
+	Runs the FileHandler pipeline once. Returns wall and CPU time per stage, the total and the counts of the run.
+	"""
+	file = FileHandler(handler_args(path, os.path.join(directory, 'output.csv'), os.path.join(directory, 'plot.png'), options), Console(file=io.StringIO()))
+	file.profiler = StageProfiler(trace_memory=options.trace_memory)
+	file.run()
+	stages = {}
+	for record in file.profiler.records:
+		stage = stages.setdefault(record['stage'], {'wall': 0.0, 'cpu': 0.0})
+		stage['wall'] += record['wall']
+		stage['cpu'] += record['cpu']
+		if options.trace_memory:
+			stage['traced_peak_mb'] = max(stage.get('traced_peak_mb', 0), record['traced_peak_mb'])
+	return {'stages': stages, 'total': file.profiler.total(), 'stats': file.stats, 'errors': file.errors}
+
+def benchmark(options:argparse.Namespace, console:Console) -> dict:
+	"""
+	Runs the pipeline --repeat times for each size. The fastest run of each size is kept.
+	"""
+	rates = {'invalid_dates': options.invalid_dates, 'out_of_range': options.out_of_range, 'duplicates': options.duplicates, 'nan': options.nan, 'outliers': options.outliers}
+	results = []
+	with tempfile.TemporaryDirectory() as work:
+		data_dir = options.data_dir or work
+		os.makedirs(data_dir, exist_ok=True)
+		for rows in options.rows:
+			console.print(f'[spring_green2]Generating {rows} rows...')
+			path = sensor_log(data_dir, rows, options.seed, rates)
+			runs = []
+			for run in range(options.repeat):
+				runs.append(run_pipeline(path, work, options))
+				console.print(f'[spring_green2]{rows} rows, run {run + 1}: {runs[-1]["total"]["wall"]:.3f} s')
+				for error in runs[-1]['errors']:
+					console.print(f'[red]{error}')
+			best = min(runs, key=lambda result: result['total']['wall'])
+			best.update({'rows': rows, 'bytes': os.path.getsize(path), 'runs': [result['total']['wall'] for result in runs]})
+			best['rows_per_second'] = rows / best['total']['wall']
+			results.append(best)
+	return {
+		'label': options.label,
+		'created': datetime.now().isoformat(timespec='seconds'),
+		'python': platform.python_version(),
+		'pandas': pd.__version__,
+		'numpy': np.__version__,
+		'platform': platform.platform(),
+		'options': {**{key: value for key, value in vars(options).items() if key not in ['compare', 'output_dir', 'data_dir', 'plot', 'rows', 'handler']},
+			**{key: value for key, value in vars(options.handler).items() if key not in ['inputfile', 'outputfile', 'plotfile', 'config']}},
+		'rates': rates,
+		'results': results,
+	}
+
+def scaling(results:list, stage:str) -> list:
+	"""
+	Scaling exponents of the wall time between consecutive sizes (1 = linear, 2 = quadratic).
+	"""
+	exponents = []
+	for small, large in zip(results, results[1:]):
+		before = small['stages'].get(stage, {}).get('wall') if stage != 'total' else small['total']['wall']
+		after = large['stages'].get(stage, {}).get('wall') if stage != 'total' else large['total']['wall']
+		if before and after and before > 1e-4:
+			exponents.append(np.log(after / before) / np.log(large['rows'] / small['rows']))
+		else:
+			exponents.append(None)
+	return exponents
+
+def report(benchmark:dict, console:Console, baseline:dict=None) -> None:
+	"""
+	Prints wall time per stage and size, throughput and scaling exponents. With baseline the speedup for equal sizes.
+	"""
+	results = benchmark['results']
+	stages = list(dict.fromkeys(stage for result in results for stage in result['stages']))
+	table = Table(title=f'Benchmark {benchmark["label"]}: wall time per stage (seconds)')
+	table.add_column('Stage', no_wrap=True)
+	for result in results:
+		table.add_column(f'{result["rows"]:,} rows', justify='right')
+	table.add_column('Scaling', justify='right')
+	for stage in stages + ['total']:
+		walls = [(result['stages'].get(stage, {}).get('wall') if stage != 'total' else result['total']['wall']) for result in results]
+		exponents = [exponent for exponent in scaling(results, stage) if exponent is not None]
+		table.add_row(stage, *['' if wall is None else f'{wall:.4f}' for wall in walls], f'n^{exponents[-1]:.2f}' if exponents else '')
+	table.add_row('rows/second', *[f'{result["rows_per_second"]:,.0f}' for result in results], '')
+	console.print(table)
+	if baseline is None:
+		return
+	previous = {result['rows']: result for result in baseline['results']}
+	table = Table(title=f'Speedup {benchmark["label"]} vs. {baseline["label"]} (> 1: faster)')
+	table.add_column('Stage', no_wrap=True)
+	sizes = [result for result in results if result['rows'] in previous]
+	for result in sizes:
+		table.add_column(f'{result["rows"]:,} rows', justify='right')
+	for stage in stages + ['total']:
+		cells = []
+		for result in sizes:
+			before = previous[result['rows']]['stages'].get(stage, {}).get('wall') if stage != 'total' else previous[result['rows']]['total']['wall']
+			after = result['stages'].get(stage, {}).get('wall') if stage != 'total' else result['total']['wall']
+			cells.append(f'{before / after:.2f}x' if before and after else '')
+		table.add_row(stage, *cells)
+	console.print(table)
+
+def plot_scaling(benchmark:dict, path:str, baseline:dict=None) -> None:
+	"""
+	Saves the throughput and the wall time per stage over the size (log-log).
+	"""
+	results = benchmark['results']
+	rows = [result['rows'] for result in results]
+	fig, ax = plt.subplots(1, 2, figsize=(14, 5))
+	fig.suptitle(f'Benchmark {benchmark["label"]}')
+	ax[0].set_title('Throughput')
+	ax[0].set_xlabel('Rows')
+	ax[0].set_ylabel('Rows/second')
+	ax[0].loglog(rows, [result['rows_per_second'] for result in results], marker='o', label=benchmark['label'])
+	if baseline is not None:
+		ax[0].loglog([result['rows'] for result in baseline['results']], [result['rows_per_second'] for result in baseline['results']], marker='o', linestyle='--', label=baseline['label'])
+	ax[0].legend()
+	ax[1].set_title('Wall time per stage')
+	ax[1].set_xlabel('Rows')
+	ax[1].set_ylabel('Seconds')
+	for stage in dict.fromkeys(stage for result in results for stage in result['stages']):
+		ax[1].loglog(rows, [result['stages'].get(stage, {}).get('wall', np.nan) for result in results], marker='.', label=stage)
+	ax[1].legend(fontsize='small')
+	fig.savefig(path)
+	plt.close(fig)
+
+###### MAIN - argparse ######
+if __name__ == '__main__':
+	console = Console()
+	parser = argparse.ArgumentParser(allow_abbrev=False, epilog='Other arguments are passed to TimeSeriesHandler.py (all its options except -i/-o, default: -iq -u remove --no-cache)')
+	parser.add_argument('-n','--rows', action='store', nargs='*', dest='rows', default=[10**4, 10**5, 10**6], type=int, metavar='<rows>', help='Sizes in rows (default: 10000 100000 1000000)')
+	parser.add_argument('-r','--repeat', action='store', dest='repeat', default=1, type=int, metavar='<repeat>', help='Runs per size, the fastest run is kept (default: 1)')
+	parser.add_argument('--seed', action='store', dest='seed', default=0, type=int, metavar='<seed>', help='Random seed for the synthetic files (default: 0)')
+	parser.add_argument('--invalid-dates', action='store', dest='invalid_dates', default=0.01, type=float, metavar='<rate>', help='Rate of invalid dates (default: 0.01)')
+	parser.add_argument('--out-of-range', action='store', dest='out_of_range', default=0.01, type=float, metavar='<rate>', help='Rate of values out of the valid range (default: 0.01)')
+	parser.add_argument('--duplicates', action='store', dest='duplicates', default=0.01, type=float, metavar='<rate>', help='Rate of duplicated lines (default: 0.01)')
+	parser.add_argument('--nan', action='store', dest='nan', default=0.01, type=float, metavar='<rate>', help='Rate of empty values (default: 0.01)')
+	parser.add_argument('--outliers', action='store', dest='outliers', default=0.005, type=float, metavar='<rate>', help='Rate of outliers (default: 0.005)')
+	parser.add_argument('--label', action='store', dest='label', default=datetime.now().strftime('%Y%m%d-%H%M%S'), metavar='<label>', help='Name of the run (default: date and time)')
+	parser.add_argument('--output-dir', action='store', dest='output_dir', default='benchmarks', metavar='<dir>', help='Directory of the stored results <label>.json (default: benchmarks)')
+	parser.add_argument('--data-dir', action='store', dest='data_dir', default=None, metavar='<dir>', help='Directory to keep the generated files for later runs (default: temporary)')
+	parser.add_argument('--compare', action='store', dest='compare', default=None, metavar='<filename>', help='Results of an earlier run to compare with')
+	parser.add_argument('--plot', action='store', dest='plot', default=None, metavar='<filename>', help='Save scaling curves as image (default: disabled)')
+	parser.add_argument('--trace-memory', action='store_true', dest='trace_memory', default=False, help='Trace the memory of each stage with tracemalloc (default: disabled)')
+	# all other arguments are options of TimeSeriesHandler.py
+	args, forwarded = parser.parse_known_args()
+	args.handler = handler_options(forwarded)
+
+	result = benchmark(args, console)
+	baseline = None
+	if args.compare:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+	report(result, console, baseline)
+	os.makedirs(args.output_dir, exist_ok=True)
+	path = os.path.join(args.output_dir, f'{args.label}.json')
+	with open(path, 'w') as file:
+		json.dump(result, file, indent=2, default=str)
+	console.print(f'[spring_green2]Results written: {path}')
+	if args.plot:
+		plot_scaling(result, args.plot, baseline)
+		console.print(f'[spring_green2]Scaling curves saved: {args.plot}')
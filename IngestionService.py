@@ -0,0 +1,345 @@
+##############################################################################
+# 						INGESTION SERVICE									 #
+##############################################################################
+"""
+Name:		IngestionService.py
+
+Long-running asyncio service that cleans batches of raw "Date Time T= H= TO=" lines with the FileHandler stages of
+TimeSeriesHandler.py, without starting a new interpreter per batch. The service speaks HTTP/1.1 on a local TCP port or
+on a Unix socket:
+- POST /sensors/<sensor>/lines	Body: raw lines. Response: the cleaned rows as CSV (Temp,Hum,Datetime).
+- DELETE /sensors/<sensor>		Forgets the state of a sensor.
+- GET /stats					Throughput, latency percentiles, queue and sensor counts as JSON.
+
+Each sensor keeps the state of the follow mode between batches (ChunkCleaner anchors and held back rows, median timegap,
+duplicate windows and running outlier statistics), so a batch is cleaned like the lines appended to a followed file.
+Batches of one sensor are cleaned in order, batches of different sensors in parallel in a process pool. Batches wait in a
+bounded queue; when it stays full the service answers 503 (backpressure).
+
+Usage:
+python IngestionService.py [--host <host>] [--port <port> | --unix <path>] [-w <n>] [--queue-size <n>]
+	[TimeSeriesHandler.py options except -i/-o, e.g. -iq -u limit --rules rules.json]
+
+curl --data-binary @input.log http://127.0.0.1:8080/sensors/sensor1/lines
+curl --unix-socket /tmp/ingest.sock http://localhost/stats
+"""
+
+####### Import ########
+import pandas as pd
+import numpy as np
+import argparse, sys
+import os
+import io
+import json
+import time
+import asyncio
+import collections
+import re
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+warnings.filterwarnings(action='ignore')
+from rich.console import Console
+
+from TimeSeriesHandler import FileHandler, build_parser, default_config, format_csv
+
+###### Cleaning (worker processes) ######
+def clean_batch(config:argparse.Namespace, state:dict, data:bytes) -> dict:
+	"""
+	Cleans the complete lines of a batch with the state of the sensor (None for the first batch) in a worker process.
+	Returns the cleaned rows as CSV, the new state and the counts of the batch. The state stays None while the lines
+	have no valid timestamp or median timegap; the caller keeps these lines for the next batch.
+	"""
+	file = FileHandler(config, Console(file=io.StringIO()), source=data)
+	options = file.follow_options('CLEAN_BATCH')
+	if options is None:
+		raise ValueError('; '.join(file.errors))
+	frame, state = file.clean_new_lines(data, state, options)
+	if file.errors:
+		raise ValueError('; '.join(file.errors))
+	csv = format_csv(frame, True, config.date_format) if frame is not None else ''
+	return {'csv': csv, 'state': state, 'stats': file.stats, 'errors': file.errors}
+
+###### Metrics ######
+class ServiceMetrics(object):
+	"""
+	Counters of the service, the latencies of the last `size` batches (time in the queue and cleaning) and the rows of
+	the last `interval` seconds for the current throughput. The rows held back are not counted here, they are a current
+	value of the sensors.
+	"""
+
+	def __init__(self, size:int=10000, interval:float=60.0) -> None:
+		"""
+		Constructor for the ServiceMetrics class.
+		"""
+		self.started = time.time()
+		self.interval = interval
+		self.counts = {'batches': 0, 'rows_in': 0, 'rows_out': 0, 'outliers': 0, 'errors': 0, 'rejected': 0}
+		self.latencies = collections.deque(maxlen=size)
+		self.recent = collections.deque()
+
+	def record(self, seconds:float, stats:dict) -> None:
+		"""
+		Records a cleaned batch.
+		"""
+		now = time.time()
+		self.counts['batches'] += 1
+		for key in ['rows_in', 'rows_out', 'outliers']:
+			self.counts[key] += int(stats.get(key, 0))
+		self.latencies.append(seconds)
+		self.recent.append((now, int(stats.get('rows_in', 0))))
+		while self.recent and (self.recent[0][0] < now - self.interval):
+			self.recent.popleft()
+
+	def summary(self, **extra) -> dict:
+		"""
+		Counters, throughput in rows/second (since start and over the last interval) and latency percentiles in ms.
+		"""
+		now = time.time()
+		uptime = now - self.started
+		recent = sum(rows for moment, rows in self.recent if moment >= now - self.interval)
+		latencies = np.array(self.latencies, dtype='float64') * 1000
+		percentiles = dict(zip(['p50_ms', 'p90_ms', 'p99_ms', 'max_ms'], np.percentile(latencies, [50, 90, 99, 100]).round(3).tolist())) if len(latencies) else {}
+		return {'uptime_s': round(uptime, 3), **self.counts, **extra,
+			'rows_per_s': round(self.counts['rows_in'] / uptime, 1) if uptime > 0 else 0.0,
+			f'rows_per_s_last_{int(self.interval)}s': round(recent / min(self.interval, uptime), 1) if uptime > 0 else 0.0,
+			'latency': {'batches': len(latencies), **percentiles}}
+
+###### Service ######
+class HTTPError(Exception):
+	"""
+	Error answered with an HTTP status.
+	"""
+
+	def __init__(self, status:int, message:str) -> None:
+		super().__init__(message)
+		self.status = status
+
+class IngestionService(object):
+	"""
+	HTTP/1.1 server (TCP or Unix socket) that puts the batches in a bounded queue. `workers` consumer tasks take them from
+	the queue and clean them in the process pool, one batch per sensor at a time.
+	"""
+	reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+	route = re.compile(r'^/sensors/([A-Za-z0-9_.\-]+)(/lines)?$')
+
+	def __init__(self, config:argparse.Namespace, workers:int, queue_size:int, queue_timeout:float, max_body:int, console:Console) -> None:
+		"""
+		Constructor for the IngestionService class.
+		"""
+		self.config = config
+		self.workers = workers
+		self.queue_size = queue_size
+		self.queue_timeout = queue_timeout
+		self.max_body = max_body
+		self.console = console
+		self.metrics = ServiceMetrics()
+		# per sensor: state of the follow mode, lines not cleaned yet (partial line, lines before the first timegap), the
+		# number of rows among them already counted as rows_in, the rows held back after the last batch, lock
+		self.sensors = {}
+		self.queue = None
+		self.pool = None
+
+	async def serve(self, host:str, port:int, unix:str=None) -> None:
+		"""
+		Starts the process pool, the consumer tasks and the server and runs until cancelled.
+		"""
+		self.queue = asyncio.Queue(self.queue_size)
+		self.pool = ProcessPoolExecutor(max_workers=self.workers)
+		consumers = [asyncio.create_task(self.consume()) for _ in range(self.workers)]
+		try:
+			if unix:
+				server = await asyncio.start_unix_server(self.handle, path=unix)
+				self.console.print(f'[{messageColor}]Ingestion service listening on unix:{unix} ({self.workers} workers, queue of {self.queue_size} batches)')
+			else:
+				server = await asyncio.start_server(self.handle, host, port)
+				self.console.print(f'[{messageColor}]Ingestion service listening on http://{host}:{port} ({self.workers} workers, queue of {self.queue_size} batches)')
+			async with server:
+				await server.serve_forever()
+		finally:
+			for consumer in consumers:
+				consumer.cancel()
+			self.pool.shutdown(cancel_futures=True)
+			if unix and os.path.exists(unix):
+				os.remove(unix)
+
+	async def consume(self) -> None:
+		"""
+		Consumer task: cleans the batches of the queue in the process pool.
+		"""
+		loop = asyncio.get_running_loop()
+		while True:
+			sensor, data, future = await self.queue.get()
+			try:
+				entry = self.sensors.setdefault(sensor, {'state': None, 'buffer': b'', 'pending': 0, 'held': 0, 'lock': asyncio.Lock()})
+				async with entry['lock']:
+					data = entry['buffer'] + data
+					# a partial last line waits for the next batch like in follow mode
+					end = data.rfind(b'\n') + 1
+					complete, entry['buffer'] = data[:end], data[end:]
+					result = await loop.run_in_executor(self.pool, clean_batch, self.config, entry['state'], complete)
+					rows = int(result['stats'].get('rows_in', 0))
+					# rows of lines kept from the batches before were counted by them
+					result['stats']['rows_in'] = max(rows - entry['pending'], 0)
+					entry['pending'] = 0
+					if result['state'] is None:
+						# no valid timestamp or timegap yet: the lines are cleaned again with the next batch
+						result['stats']['held'] = rows
+						entry['pending'] = rows
+						entry['buffer'] = complete + entry['buffer']
+						if len(entry['buffer']) > self.max_body:
+							entry['buffer'] = b''
+							entry['pending'] = 0
+							entry['held'] = 0
+							raise HTTPError(400, f'No valid timestamp and median timegap in the first {self.max_body} bytes of sensor {sensor}')
+					entry['state'] = result['state']
+					entry['held'] = int(result['stats'].get('held', 0))
+				if not future.cancelled():
+					future.set_result(result)
+			except Exception as e:
+				if not future.cancelled():
+					future.set_exception(e)
+			finally:
+				self.queue.task_done()
+
+	async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+		"""
+		Answers the requests of one connection (keep-alive) until the client closes it.
+		"""
+		try:
+			while True:
+				request = await self.read_request(reader)
+				if request is None:
+					break
+				method, path, headers, body = request
+				try:
+					status, content_type, content, extra = await self.dispatch(method, path, body)
+				except HTTPError as e:
+					status, content_type, content, extra = e.status, 'application/json', json.dumps({'error': str(e)}), {}
+					if e.status == 503:
+						extra['Retry-After'] = '1'
+				except Exception as e:
+					self.metrics.counts['errors'] += 1
+					status, content_type, content, extra = 500, 'application/json', json.dumps({'error': f'{type(e).__name__}: {e}'}), {}
+				close = headers.get('connection', '').lower() == 'close'
+				await self.write_response(writer, status, content_type, content.encode('utf-8'), extra, close)
+				if close:
+					break
+		except HTTPError as e:
+			await self.write_response(writer, e.status, 'application/json', json.dumps({'error': str(e)}).encode('utf-8'), {}, True)
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+	async def read_request(self, reader:asyncio.StreamReader) -> tuple:
+		"""
+		Reads request line, headers and body (Content-Length). None if the client closed the connection.
+		"""
+		line = await reader.readline()
+		if not line:
+			return None
+		try:
+			method, path, _ = line.decode('latin-1').split(' ', 2)
+		except ValueError:
+			raise HTTPError(400, 'Invalid request line')
+		headers = {}
+		while True:
+			line = await reader.readline()
+			if line in (b'\r\n', b'\n', b''):
+				break
+			name, _, value = line.decode('latin-1').partition(':')
+			headers[name.strip().lower()] = value.strip()
+		if 'chunked' in headers.get('transfer-encoding', '').lower():
+			raise HTTPError(411, 'Chunked requests are not supported, send Content-Length')
+		try:
+			length = int(headers.get('content-length', 0) or 0)
+		except ValueError:
+			raise HTTPError(400, 'Invalid Content-Length')
+		if length > self.max_body:
+			raise HTTPError(413, f'Batch larger than {self.max_body} bytes')
+		body = await reader.readexactly(length) if length else b''
+		return method.upper(), path.split('?', 1)[0], headers, body
+
+	async def dispatch(self, method:str, path:str, body:bytes) -> tuple:
+		"""
+		Routes a request. Returns status, content type, content and extra headers.
+		"""
+		if path == '/stats':
+			if method != 'GET':
+				raise HTTPError(405, 'Use GET for /stats')
+			# rows held back now (not a counter): the rows of the last batch of each sensor that wait for the next lines
+			summary = self.metrics.summary(rows_held=sum(entry['held'] for entry in self.sensors.values()), queue=self.queue.qsize(), queue_size=self.queue_size, workers=self.workers, sensors=len(self.sensors))
+			return 200, 'application/json', json.dumps(summary), {}
+		match = self.route.match(path)
+		if match is None:
+			raise HTTPError(404, f'Unknown path: {path}')
+		sensor = match.group(1)
+		if method == 'DELETE' and not match.group(2):
+			found = self.sensors.pop(sensor, None) is not None
+			return (200 if found else 404), 'application/json', json.dumps({'sensor': sensor, 'deleted': found}), {}
+		if method != 'POST' or not match.group(2):
+			raise HTTPError(405, 'Use POST /sensors/<sensor>/lines or DELETE /sensors/<sensor>')
+		start = time.perf_counter()
+		future = asyncio.get_running_loop().create_future()
+		try:
+			await asyncio.wait_for(self.queue.put((sensor, body, future)), self.queue_timeout)
+		except asyncio.TimeoutError:
+			self.metrics.counts['rejected'] += 1
+			raise HTTPError(503, f'Queue full ({self.queue_size} batches)')
+		try:
+			result = await future
+		except HTTPError:
+			self.metrics.counts['errors'] += 1
+			raise
+		self.metrics.record(time.perf_counter() - start, result['stats'])
+		if result['errors']:
+			self.metrics.counts['errors'] += 1
+		stats = result['stats']
+		extra = {f'X-{name}': str(int(stats.get(key, 0))) for name, key in [('Rows-In', 'rows_in'), ('Rows-Out', 'rows_out'), ('Rows-Held', 'held'), ('Outliers', 'outliers')]}
+		return 200, 'text/csv', result['csv'], extra
+
+	async def write_response(self, writer:asyncio.StreamWriter, status:int, content_type:str, content:bytes, extra:dict, close:bool) -> None:
+		"""
+		Writes a response and waits until the client takes it (backpressure on slow clients).
+		"""
+		headers = [f'HTTP/1.1 {status} {self.reasons.get(status, "")}', f'Content-Type: {content_type}', f'Content-Length: {len(content)}', f'Connection: {"close" if close else "keep-alive"}']
+		headers += [f'{name}: {value}' for name, value in extra.items()]
+		writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + content)
+		await writer.drain()
+
+###### MAIN - argparse ######
+highlightColor = 'blue'
+messageColor = 'spring_green2'
+errorColor = 'red'
+
+if __name__ == '__main__':
+	console = Console()
+	parser = argparse.ArgumentParser(allow_abbrev=False, epilog='Other arguments are passed to TimeSeriesHandler.py (its options except -i/-o, default: -no -u ignore --no-cache)')
+	parser.add_argument('--host', action='store', dest='host', default='127.0.0.1', metavar='<host>', help='Address of the HTTP server (default: 127.0.0.1)')
+	parser.add_argument('--port', action='store', dest='port', default=8080, type=int, metavar='<port>', help='Port of the HTTP server (default: 8080)')
+	parser.add_argument('--unix', action='store', dest='unix', default=None, metavar='<path>', help='Listen on a Unix socket instead of a TCP port (default: disabled)')
+	parser.add_argument('-w','--workers', action='store', dest='workers', default=os.cpu_count(), type=int, metavar='<n>', help='Worker processes that clean batches (default: number of CPUs)')
+	parser.add_argument('--queue-size', action='store', dest='queue_size', default=64, type=int, metavar='<n>', help='Batches waiting for a worker before requests are delayed (default: 64)')
+	parser.add_argument('--queue-timeout', action='store', dest='queue_timeout', default=5.0, type=float, metavar='<s>', help='Seconds a batch waits for a place in the full queue before 503 is answered (default: 5)')
+	parser.add_argument('--max-body', action='store', dest='max_body', default=64 * 1024 * 1024, type=int, metavar='<bytes>', help='Maximum size of a batch (default: 64 MB)')
+	# all other arguments are options of TimeSeriesHandler.py with its defaults, except: no outlier removal, no cache
+	args, forwarded = parser.parse_known_args()
+	handler = build_parser({'inputfile': None, 'outputfile': None, 'no': True, 'outlier': None, 's': 3, 'no_cache': True}).parse_args(forwarded)
+	config = default_config(**vars(handler))
+	# invalid options (rules, max-gap, duplicate keys) are reported once at start instead of with every batch
+	errors = FileHandler(config, Console(file=io.StringIO()), source=b'')
+	if errors.follow_options('INGESTION_SERVICE') is None:
+		for message in errors.errors:
+			console.print(f'[{errorColor}]{message}')
+		sys.exit(2)
+	service = IngestionService(config, max(1, args.workers), max(1, args.queue_size), args.queue_timeout, args.max_body, console)
+	console.print(f'\n[{highlightColor}][bold]Case Study - Time Series - Dockal - IngestionService.py STARTED![/bold]\n\n')
+	try:
+		asyncio.run(service.serve(args.host, args.port, args.unix))
+	except KeyboardInterrupt:
+		console.print(f'[{messageColor}]Keyboard Interrupt!')
+	except Exception:
+		console.print()
+		console.print_exception()
+	finally:
+		console.print(f'\n[{highlightColor}][bold]Case Study - Time Series - Dockal - IngestionService.py STOPPED![/bold]\n')
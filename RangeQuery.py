@@ -0,0 +1,86 @@
+##############################################################################
+# 						RANGE QUERY											 #
+##############################################################################
+"""
+Name:		RangeQuery.py
+
+Answers time range queries on an output-file of TimeSeriesHandler.py written with --index (hour or day) without reading
+the whole file. The index (<output-file>.index.json) lists the partitions of the output-file with their first and last
+timestamp, their position (byte range in plain CSV files, row range otherwise) and count/min/max/mean of Temp and Hum:
+- Rows: only the partitions in the range are read, the rows are found by a binary search of the sorted Datetime column.
+- Aggregates (--aggregates): the values of the partitions in the range are taken from the index, no rows are read.
+
+Usage:
+python RangeQuery.py -i <output-file> --start <timestamp> --end <timestamp> [--columns <columns>] [--aggregates] [-o <filename>]
+
+python RangeQuery.py -i output.log --start "2022-09-15 14:00" --end "2022-09-15 15:00" --columns Hum
+python RangeQuery.py -i output.log --start 2022-09-15 --end 2022-09-16 --aggregates
+"""
+
+####### Import ########
+import pandas as pd
+import argparse, sys
+import time
+import warnings
+warnings.filterwarnings(action='ignore')
+from rich.console import Console
+from rich.table import Table
+
+from TimeSeriesHandler import TimeIndex
+
+###### Output ######
+def frame_table(frame:pd.DataFrame, title:str, rows:int) -> Table:
+	"""
+	rich Table of the first rows of frame.
+	"""
+	table = Table(title=title)
+	for column in frame.columns:
+		table.add_column(str(column), justify='left' if frame[column].dtype.kind in 'OMb' else 'right')
+	for values in frame.head(rows).itertuples(index=False):
+		table.add_row(*['' if pd.isna(value) else f'{value:.2f}' if isinstance(value, float) else str(value) for value in values])
+	return table
+
+###### MAIN - argparse ######
+highlightColor = 'blue'
+messageColor = 'spring_green2'
+errorColor = 'red'
+
+if __name__ == '__main__':
+	console = Console()
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-i','--input', action='store', required=True, dest='inputfile', metavar='<filename>', help='Output-file of TimeSeriesHandler.py written with --index')
+	parser.add_argument('--start', action='store', dest='start', default=None, metavar='<timestamp>', help='First timestamp of the range, e.g. "2022-09-15 14:00" (default: first row)')
+	parser.add_argument('--end', action='store', dest='end', default=None, metavar='<timestamp>', help='Timestamp after the range, rows at --end are not included (default: last row)')
+	parser.add_argument('--columns', action='store', dest='columns', default=None, metavar='<columns>', help='Comma separated value columns of the rows, Datetime is always included (default: all columns)')
+	parser.add_argument('--aggregates', action='store_true', dest='aggregates', default=False, help='Print count/min/max/mean of Temp and Hum per partition from the index instead of the rows (default: disabled)')
+	parser.add_argument('--rows', action='store', dest='rows', default=20, metavar='<n>', type=int, help='Rows printed (default: 20)')
+	parser.add_argument('-o','--output', action='store', dest='outputfile', default=None, metavar='<filename>', help='Write the rows or aggregates as CSV (default: disabled)')
+	args = parser.parse_args()
+
+	try:
+		index = TimeIndex.load(args.inputfile)
+		columns = [column.strip() for column in args.columns.split(',') if column.strip()] if args.columns else None
+		unknown = sorted(set(columns or []) - set(index.columns or []))
+		if unknown:
+			raise ValueError(f'Unknown columns: {unknown}. Columns: {index.columns}')
+		started = time.perf_counter()
+		if args.aggregates:
+			frame = index.aggregates(args.start, args.end)
+			title = f'Aggregates per {index.period} ({len(frame)} partitions)'
+		else:
+			frame = index.query(args.start, args.end, columns)
+			title = f'Rows {args.start or "first"} - {args.end or "last"} ({len(frame)} rows)'
+		elapsed = time.perf_counter() - started
+		console.print(frame_table(frame, title, args.rows))
+		partitions = len(index.select(args.start, args.end))
+		source = 'values from the index' if args.aggregates else 'rows read'
+		console.print(f'[{messageColor}]{partitions} of {len(index.partitions)} partitions in the range, {source} ({elapsed * 1000:.1f} ms)')
+		if args.outputfile is not None:
+			frame.to_csv(args.outputfile, index=False)
+			console.print(f'[{messageColor}]Output-file processed: {args.outputfile}')
+	except (ValueError, ImportError) as e:
+		console.print(f'[{errorColor}]RANGE_QUERY EXCEPTION - {e}')
+		sys.exit(2)
+	except OSError:
+		console.print(f'[{errorColor}]RANGE_QUERY EXCEPTION - Cannot read the output-file: {args.inputfile}')
+		sys.exit(2)
@@ -0,0 +1,437 @@
+##############################################################################
+# 						REGRESSION CHECK									 #
+##############################################################################
+"""
+Name:		RegressionCheck.py
+
+Compares the vectorized processing steps of TimeSeriesHandler.py with the original row-by-row implementation
+(check_valid_date, replace_nat, check_valid_value).
+interpolate_gaps is compared with Series.interpolate (method='linear' and method='time').
+The chunked mode (--chunksize) is compared with the default mode at small chunk sizes.
+median_timegap is compared with statistics.median on timegaps with NaT at random positions (NaT is not ordered, the
+result of the original sort depends on where the NaT are).
+An outlier method on the command line must replace the method of a --config file.
+The original loops are kept in this file as reference (legacy_*). The check runs on input.log and on synthetic
+files in the "Date Time T= H= TO=" format. The fast parser (--parser fast) is compared with read_csv.
+
+Usage:
+python RegressionCheck.py [-i <filename> ...] [--reference <filename>] [-n <rows>] [-r <runs>] [--seed <seed>] [-c <rows> ...]
+"""
+
+####### Import ########
+import pandas as pd
+import numpy as np
+import argparse, sys
+import os
+import io
+import json
+import statistics
+import tempfile
+from datetime import datetime
+import warnings
+warnings.filterwarnings(action='ignore')
+from rich.console import Console
+
+from TimeSeriesHandler import ValidSpan, find_invalid_dates, fill_nat_segments, SensorLogParser, ValueRules, interpolate_gaps, FileHandler, default_config, median_timegap, build_parser, load_config, process
+
+###### Reference implementations ######
+def legacy_check_valid_date(datetimes:pd.Series, first_index:int, last_index:int, start_time, now) -> pd.Series:
+	"""
+	Row-by-row check_valid_date of TimeSeriesHandler.py 1.0. Returns a copy of datetimes with invalid dates changed to NaT.
+	"""
+	datetimes = datetimes.copy()
+	for index in datetimes.index:
+		if first_index >= index:
+			previous_date = (datetimes[first_index])
+		elif first_index == 0:
+			previous_date = 0
+		else:
+			previous_date = (datetimes[index-1])
+
+		actual_date = (datetimes[index])
+
+		if last_index > index:
+			next_date = (datetimes[index+1])
+		elif len(datetimes.index) > last_index:
+			next_date = now
+
+		last_nat = np.isnat(np.datetime64(str(datetimes[last_index])))
+		is_nat = np.isnat(np.datetime64(str(datetimes[index])))
+
+		if not is_nat:
+			if not last_nat:
+				if (not (start_time <= actual_date <= now)) or (actual_date >= next_date) or (previous_date >= actual_date):
+					datetimes[index] = pd.NaT
+	return datetimes
+
+def legacy_replace_nat(datetimes:pd.Series, first_index:int, mean_timegap) -> pd.Series:
+	"""
+	Row-by-row replace_nat of TimeSeriesHandler.py 1.0. Returns a copy of datetimes with NaT replaced.
+	Raises KeyError for runs of NaT at the end of the file (like the original).
+	"""
+	datetimes = datetimes.copy()
+	nat_index = [index for index in datetimes.index if np.isnat(np.datetime64(str(datetimes[index])))]
+	for nat in nat_index[::-1]:
+		if (first_index < nat):
+			if not np.isnat(np.datetime64(str(datetimes[nat - 1]))):
+				datetimes[nat] = datetimes[nat - 1] + mean_timegap
+			else:
+				datetimes[nat] = datetimes[nat + 1] - mean_timegap
+		elif (first_index >= nat):
+			datetimes[nat] = datetimes[first_index+1] - mean_timegap
+			if first_index >= 1:
+				first_index-=1
+	return datetimes
+
+def legacy_check_valid_value(dataframe:pd.DataFrame) -> tuple:
+	"""
+	Row-by-row check_valid_value of TimeSeriesHandler.py 1.0. Returns a copy of dataframe with invalid values changed to NaN
+	and the reported indices.
+	"""
+	dataframe = dataframe.copy()
+	valid_temp = [0, 50]  # Valid range for temperature values
+	valid_hum = [0, 100]  # Valid range for humidity values
+	nan_index = []
+	for index in dataframe.index:
+		if (dataframe['Temp'][index] < valid_temp[0]) or (dataframe['Temp'][index] > valid_temp[1]):
+			dataframe['Temp'][index] = np.nan
+			nan_index.append(index)
+		if (dataframe['Hum'][index] < valid_hum[0]) or (dataframe['Hum'][index] > valid_hum[1]):
+			dataframe['Hum'][index] = np.nan
+			nan_index.append(index)
+	return dataframe, nan_index
+
+###### Helpers ######
+def read_datetimes(path:str) -> pd.Series:
+	"""
+	Reads the input-file like open_file, rename_columns, drop_duplicates and create_datetime do.
+	"""
+	dataframe = pd.read_csv(path, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True)
+	dataframe.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+	dataframe = dataframe.drop_duplicates().reset_index(drop=True)
+	return pd.to_datetime(dataframe['Date'] + ' ' + dataframe['Time'], errors="coerce")
+
+def compare_parser(path:str) -> np.ndarray:
+	"""
+	Parses the input-file with SensorLogParser and with read_csv, drop_duplicates, create_datetime and format_data_columns.
+	Returns the indices of mismatching rows.
+	"""
+	dataframe = pd.read_csv(path, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True, dtype=object)
+	dataframe.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+	dataframe = dataframe.drop_duplicates().reset_index(drop=True)
+	expected = pd.DataFrame({
+		'Temp': pd.to_numeric(dataframe['Temp'].str.replace('T=', ''), errors='coerce'),
+		'Hum': pd.to_numeric(dataframe['Hum'].str.replace('H=', ''), errors='coerce'),
+		'Datetime': pd.to_datetime(dataframe['Date'] + ' ' + dataframe['Time'], errors="coerce"),
+	})
+	parsed = SensorLogParser().read(path)
+	parsed = parsed.drop_duplicates(subset=['Key']).drop(columns=['Key']).reset_index(drop=True)
+	if len(parsed) != len(expected):
+		return np.arange(abs(len(parsed) - len(expected)))
+	mismatch = np.zeros(len(parsed), dtype=bool)
+	for column in expected.columns:
+		left, right = expected[column], parsed[column]
+		mismatch |= (left.to_numpy() != right.to_numpy()) & ~(left.isna().to_numpy() & right.isna().to_numpy())
+	return np.flatnonzero(mismatch)
+
+def compare_values(path:str) -> np.ndarray:
+	"""
+	Runs legacy check_valid_value and ValueRules with the default rules on the values of the input-file.
+	Returns the indices of mismatching rows (or reported indices).
+	"""
+	dataframe = pd.read_csv(path, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True, dtype=object)
+	dataframe.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+	dataframe = dataframe.drop_duplicates().reset_index(drop=True)
+	values = pd.DataFrame({
+		'Temp': pd.to_numeric(dataframe['Temp'].str.replace('T=', ''), errors='coerce'),
+		'Hum': pd.to_numeric(dataframe['Hum'].str.replace('H=', ''), errors='coerce'),
+	})
+	legacy, nan_index = legacy_check_valid_value(values)
+	found = ValueRules().check(values)
+	mismatch = np.zeros(len(values), dtype=bool)
+	for column in ['Temp', 'Hum']:
+		replaced = ValueRules.replace(values[column], found[column]['range'])
+		mismatch |= ~np.isclose(legacy[column].to_numpy(dtype='float64'), np.asarray(replaced, dtype='float64'), rtol=0, atol=0, equal_nan=True)
+	positions = np.concatenate([found[column]['range'] for column in ['Temp', 'Hum']])
+	if positions[np.argsort(positions, kind='stable')].tolist() != nan_index:
+		mismatch[nan_index] = True
+	return np.flatnonzero(mismatch)
+
+def compare_interpolation(path:str, datetimes:pd.Series) -> np.ndarray:
+	"""
+	Interpolates the values of the input-file with interpolate_gaps and with Series.interpolate by row position and by
+	the repaired Datetime. Returns the indices of mismatching rows.
+	"""
+	dataframe = pd.read_csv(path, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True)
+	dataframe.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+	dataframe = dataframe.drop_duplicates().reset_index(drop=True)
+	if len(dataframe) != len(datetimes):
+		return np.arange(abs(len(dataframe) - len(datetimes)))
+	index = pd.DatetimeIndex(datetimes)
+	mismatch = np.zeros(len(dataframe), dtype=bool)
+	for column, prefix in [('Temp', 'T='), ('Hum', 'H=')]:
+		values = pd.to_numeric(dataframe[column].astype(str).str.replace(prefix, ''), errors='coerce').to_numpy(dtype='float64')
+		linear = pd.Series(values).interpolate(method='linear').to_numpy()
+		mismatch |= ~np.isclose(linear, interpolate_gaps(values, datetimes.to_numpy(), 'linear'), equal_nan=True)
+		if not index.hasnans:
+			time = pd.Series(values, index=index).interpolate(method='time').to_numpy()
+			mismatch |= ~np.isclose(time, interpolate_gaps(values, datetimes.to_numpy(), 'time'), equal_nan=True)
+	return np.flatnonzero(mismatch)
+
+def compare_chunked(path:str, directory:str, chunksizes:list) -> list:
+	"""
+	Runs the pipeline (IQR, limit) on the input-file in the default mode and in the chunked mode for each chunk size.
+	Returns the chunk sizes whose output-file differs or that report an error.
+	"""
+	outputs = {}
+	errors = {}
+	for chunksize in [None] + list(chunksizes):
+		outputfile = os.path.join(directory, f'chunked_{chunksize}.csv')
+		file = FileHandler(default_config(inputfile=path, outputfile=outputfile, iqr=True, outlier='limit', chunksize=chunksize, no_cache=True), Console(file=io.StringIO()))
+		file.run()
+		errors[chunksize] = file.errors
+		outputs[chunksize] = open(outputfile, 'rb').read() if os.path.exists(outputfile) else None
+	return [chunksize for chunksize in chunksizes if errors[chunksize] or (outputs[chunksize] != outputs[None])]
+
+def compare_median(rng:np.random.Generator, runs:int=200) -> list:
+	"""
+	Compares median_timegap with statistics.median over Timedeltas and NaT like the original calculate_mean_timegap, for
+	short lists (insertion sort) and long lists (merged runs), NaT in runs and single NaT at the start, middle and end.
+	Returns the lengths of the mismatching lists.
+	"""
+	mismatches = []
+	for run in range(runs):
+		n = int(rng.choice([1, 2, 3, 5, 20, 63, 64, 65, 200, 2000]))
+		gaps = rng.normal(300, 20, n).astype('int64') * 1000000000
+		# rows with the same timestamp and backward jumps give zero and negative timegaps
+		gaps[rng.random(n) < 0.05] = 0
+		gaps[rng.random(n) < 0.02] *= -1
+		nat = rng.random(n) < [0.0, 0.01, 0.1, 0.5, 0.9][run % 5]
+		if run % 7 == 0:
+			start = int(rng.integers(0, n))
+			nat[start:start + int(rng.integers(1, 40))] = True
+		if run % 11 == 0:
+			nat[[0, n // 2, -1]] = True
+		gaps[nat] = np.iinfo(np.int64).min
+		expected = statistics.median([pd.NaT if is_nat else pd.Timedelta(int(gap)) for gap, is_nat in zip(gaps.tolist(), nat.tolist())])
+		result = median_timegap(gaps)
+		if not ((pd.isnull(expected) and pd.isnull(result)) or (expected == result)):
+			mismatches.append(n)
+	return mismatches
+
+def compare_config(directory:str) -> list:
+	"""
+	Parses the command line with each outlier method and a --config file that selects IQR, checks that only the method of
+	the command line is set and used by the OutlierEngine. Returns the mismatching methods.
+	"""
+	path = os.path.join(directory, 'config.json')
+	with open(path, 'w') as file:
+		json.dump({'iqr': True, 'outlier': 'limit'}, file)
+	mismatches = []
+	for flag, method in [('-iq', 'iqr'), ('-st', 'std'), ('-md', 'mad'), ('-no', 'no'), (None, 'iqr')]:
+		args = build_parser(load_config(path)).parse_args(['-i', 'input.log', '-o', 'output.log', '--config', path] + ([flag] if flag else []))
+		selected = [key for key in ['iqr', 'std', 'mad', 'no'] if getattr(args, key)]
+		file = FileHandler(args, Console(file=io.StringIO()))
+		if (selected != [method]) or ((method != 'no') and (file.outlier_engine().method != method)):
+			mismatches.append(flag)
+	return mismatches
+
+def compare_cache(path:str, directory:str) -> list:
+	"""
+	Runs the pipeline (IQR, limit) with each reader stage in --skip-stages and a cache directory, then without skipped
+	stages on the same cache directory. Returns the skipped stages after which the normal run differs from a run without
+	cache.
+	"""
+	run = lambda outputfile, **options: FileHandler(default_config(inputfile=path, outputfile=os.path.join(directory, outputfile), iqr=True, outlier='limit', **options), Console(file=io.StringIO())).run()
+	run('uncached.csv', no_cache=True)
+	expected = open(os.path.join(directory, 'uncached.csv'), 'rb').read()
+	mismatches = []
+	for stage in ['drop_raw_duplicates', 'create_datetime']:
+		cache = os.path.join(directory, f'cache_{stage}')
+		run('skipped.csv', cache_dir=cache, skip_stages=stage)
+		run('cached.csv', cache_dir=cache)
+		if open(os.path.join(directory, 'cached.csv'), 'rb').read() != expected:
+			mismatches.append(stage)
+	return mismatches
+
+def compare_process(path:str, directory:str) -> list:
+	"""
+	Runs process (IQR, remove) on the input-file with and without output-file and on its bytes. Returns the runs whose
+	stats have no rows_out or one different from the rows of the result Dataframe.
+	"""
+	runs = {'output-file': process(path, iqr=True, outlier='remove', outputfile=os.path.join(directory, 'process.csv'), no_cache=True),
+		'path': process(path, iqr=True, outlier='remove', no_cache=True),
+		'bytes': process(open(path, 'rb').read(), iqr=True, outlier='remove')}
+	return [name for name, result in runs.items() if result.stats.get('rows_out') != len(result.dataframe)]
+
+def compare_unreadable(directory:str) -> list:
+	"""
+	Runs FileHandler on an empty and a binary input-file, checks that the pipeline stops with one error and that no
+	output-file is created. Returns the names of the failing input-files.
+	"""
+	mismatches = []
+	for name, content in [('empty.log', b''), ('binary.log', bytes(range(256)) * 8)]:
+		inputfile = os.path.join(directory, name)
+		outputfile = os.path.join(directory, f'output_{name}')
+		with open(inputfile, 'wb') as file:
+			file.write(content)
+		file = FileHandler(default_config(inputfile=inputfile, outputfile=outputfile, iqr=True, outlier='limit', no_cache=True), Console(file=io.StringIO()))
+		file.run()
+		if (len(file.errors) != 1) or os.path.exists(outputfile):
+			mismatches.append(name)
+	return mismatches
+
+def write_synthetic_file(path:str, rows:int, rng:np.random.Generator) -> None:
+	"""
+	Writes a synthetic sensor log with invalid leading dates, backward jumps, repeated and future timestamps, broken lines and a long glitch.
+	"""
+	start = np.datetime64('2022-09-14T19:33:07')
+	steps = rng.normal(300, 20, rows).clip(1).astype('int64')
+	times = start + np.cumsum(steps).astype('timedelta64[s]')
+	kind = rng.random(rows)
+	# backward jumps, repeated timestamps and timestamps in the future
+	times = np.where(kind < 0.02, times - np.timedelta64(3600, 's'), times)
+	repeated = (kind >= 0.02) & (kind < 0.04)
+	times[1:][repeated[1:]] = times[:-1][repeated[1:]]
+	leading = rng.integers(1, 5)
+	future = (kind >= 0.04) & (kind < 0.05)
+	future[:leading + 1] = False
+	times = np.where(future, np.datetime64('2099-01-01T00:00:00'), times)
+	# invalid leading years like in input.log
+	times[:leading] = times[:leading] - np.timedelta64(365 * 1000, 'D')
+	# broken lines and one long glitch
+	broken = (kind >= 0.05) & (kind < 0.06)
+	glitch = rng.integers(leading + 1, rows - 60)
+	broken[glitch:glitch + rng.integers(5, 50)] = True
+	with open(path, 'w') as file:
+		for index, time in enumerate(times):
+			date, clock = str(time).split('T')
+			if broken[index]:
+				file.write(f'{date} {clock[:5]}xx T=22.0 H=20.0 TO=45\n')
+			elif kind[index] >= 0.995:
+				# irregular values and lines
+				file.write([f'{date} {clock} T= H=+20. TO=45\n', f'{date} {clock} error \n', f' {date} {clock} T=NA H=2e1 TO=45\n', '   \n', f'{date} {clock} T=-1.5 H=.5 TO=45 x\n'][index % 5])
+			else:
+				file.write(f'{date} {clock} T={20 + kind[index] * 10:.{index % 3}f} H=20.0 TO=45\n')
+
+def compare_file(path:str, now:datetime) -> dict:
+	"""
+	Runs legacy and vectorized check_valid_date, replace_nat and check_valid_value on one file and checks interpolate_gaps.
+	Returns rows, NaT counts, mismatching indices per stage and the repaired Datetime column.
+	"""
+	datetimes = read_datetimes(path)
+	span = ValidSpan(datetimes)
+	first_index, last_index, start_time = span.first_index, span.last_index, span.start_time
+	# calculate_mean_timegap
+	mean_timegap = statistics.median([datetimes[i]-datetimes[i-1] for i in range(1, len(datetimes))])
+	# check_valid_date
+	legacy = legacy_check_valid_date(datetimes, first_index, last_index, start_time, now)
+	invalid = find_invalid_dates(datetimes.to_numpy(), first_index, last_index, start_time, now)
+	vectorized = datetimes.copy()
+	vectorized[invalid] = pd.NaT
+	result = {'rows': len(datetimes), 'nat': int(legacy.isna().sum()), 'check_valid_date': np.flatnonzero(legacy.isna().to_numpy() != vectorized.isna().to_numpy())}
+	result['check_valid_value'] = compare_values(path)
+	# replace_nat (on the legacy result, so both start from the same NaT)
+	filled = pd.Series(fill_nat_segments(legacy.to_numpy(), first_index, mean_timegap))
+	result['datetime'] = filled
+	result['interpolate_nan'] = compare_interpolation(path, filled)
+	try:
+		legacy = legacy_replace_nat(legacy, first_index, mean_timegap)
+		result['replace_nat'] = np.flatnonzero((legacy.to_numpy() != filled.to_numpy()) & ~(legacy.isna().to_numpy() & filled.isna().to_numpy()))
+	except KeyError:
+		# original replace_nat aborts on NaT runs at the end of the file
+		result['replace_nat'] = None
+	return result
+
+def compare_reference(datetimes:pd.Series, path:str) -> np.ndarray:
+	"""
+	Compares repaired timestamps with the Datetime column of a reference output-file (e.g. output.log).
+	"""
+	reference = pd.read_csv(path, parse_dates=['Datetime'])['Datetime']
+	if len(reference) != len(datetimes):
+		return np.arange(abs(len(reference) - len(datetimes)))
+	return np.flatnonzero(reference.to_numpy() != datetimes.to_numpy())
+
+###### MAIN - argparse ######
+if __name__ == '__main__':
+	console = Console()
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-i','--input', action='store', nargs='*', dest='inputfiles', default=['input.log'], metavar='<filename>', help='Input-files to compare (default: input.log)')
+	parser.add_argument('--reference', action='store', dest='reference', default='output.log', metavar='<filename>', help='Reference output-file for the first input-file (default: output.log)')
+	parser.add_argument('-n','--rows', action='store', dest='rows', default=5000, type=int, metavar='<rows>', help='Rows per synthetic file (default: 5000)')
+	parser.add_argument('-r','--runs', action='store', dest='runs', default=5, type=int, metavar='<runs>', help='Number of synthetic files (default: 5)')
+	parser.add_argument('--seed', action='store', dest='seed', default=0, type=int, metavar='<seed>', help='Random seed for synthetic files (default: 0)')
+	parser.add_argument('-c','--chunksizes', action='store', nargs='*', dest='chunksizes', default=[1, 3, 7, 13, 100], type=int, metavar='<rows>', help='Chunk sizes compared with the default mode (default: 1 3 7 13 100)')
+	args = parser.parse_args()
+
+	now = datetime.today()
+	rng = np.random.default_rng(args.seed)
+	failed = 0
+	mismatches = compare_median(np.random.default_rng(args.seed))
+	if len(mismatches):
+		failed += 1
+		console.print(f'[red]median_timegap MISMATCH: list lengths: {mismatches[:20]}')
+	else:
+		console.print(f'[spring_green2]median_timegap OK: 200 lists of timegaps with NaT')
+	with tempfile.TemporaryDirectory() as directory:
+		mismatches = compare_config(directory)
+		if len(mismatches):
+			failed += 1
+			console.print(f'[red]config MISMATCH: outlier methods of the command line not used: {mismatches}')
+		else:
+			console.print(f'[spring_green2]config OK: outlier method of the command line replaces the method of --config')
+		mismatches = compare_process(args.inputfiles[0], directory)
+		if len(mismatches):
+			failed += 1
+			console.print(f'[red]process MISMATCH: rows_out missing or not the rows of the result: {mismatches}')
+		else:
+			console.print(f'[spring_green2]process OK: rows_out with and without output-file')
+		mismatches = compare_unreadable(directory)
+		if len(mismatches):
+			failed += 1
+			console.print(f'[red]unreadable MISMATCH: more than one error or an output-file for: {mismatches}')
+		else:
+			console.print(f'[spring_green2]unreadable OK: empty and binary input-files stop the pipeline without output-file')
+		mismatches = compare_cache(args.inputfiles[0], directory)
+		if len(mismatches):
+			failed += 1
+			console.print(f'[red]cache MISMATCH: normal run loads the cache of a run with --skip-stages: {mismatches}')
+		else:
+			console.print(f'[spring_green2]cache OK: runs with skipped reader stages do not share the cache of a normal run')
+		files = list(args.inputfiles)
+		for run in range(args.runs):
+			path = os.path.join(directory, f'synthetic_{run}.log')
+			write_synthetic_file(path, args.rows, rng)
+			files.append(path)
+		for path in files:
+			result = compare_file(path, now)
+			name = os.path.basename(path)
+			mismatches = compare_parser(path)
+			if len(mismatches):
+				failed += 1
+				console.print(f'[red]parser MISMATCH: {name} indices: {mismatches[:20].tolist()}')
+			else:
+				console.print(f'[spring_green2]parser OK: {name}')
+			for stage in ['check_valid_date', 'replace_nat', 'check_valid_value', 'interpolate_nan']:
+				mismatches = result[stage]
+				if mismatches is None:
+					console.print(f'[yellow]{stage} SKIPPED: {name} (original implementation aborts on this file)')
+				elif len(mismatches):
+					failed += 1
+					console.print(f'[red]{stage} MISMATCH: {name} ({result["rows"]} rows) indices: {mismatches[:20].tolist()}')
+				else:
+					console.print(f'[spring_green2]{stage} OK: {name} ({result["rows"]} rows, {result["nat"]} NaT)')
+			mismatches = compare_chunked(path, directory, args.chunksizes)
+			if len(mismatches):
+				failed += 1
+				console.print(f'[red]chunked MISMATCH: {name} chunk sizes: {mismatches}')
+			else:
+				console.print(f'[spring_green2]chunked OK: {name} (chunk sizes {args.chunksizes})')
+			if (path == args.inputfiles[0]) and args.reference and os.path.exists(args.reference):
+				mismatches = compare_reference(result['datetime'], args.reference)
+				if len(mismatches):
+					failed += 1
+					console.print(f'[red]Datetime MISMATCH with {args.reference}: indices: {mismatches[:20].tolist()}')
+				else:
+					console.print(f'[spring_green2]Datetime OK: {name} matches {args.reference}')
+	sys.exit(1 if failed else 0)
@@ -32,13 +32,16 @@ Procedure:
 - Creating Boxplots and Lineplots for Temp and Hum.
 - Exporting Dataframe to output-file
 
+The pipeline can also be imported and called without starting a new interpreter, for paths and data in memory:
+	from TimeSeriesHandler import process
+	result = process(dataframe, iqr=True, outlier='limit')
 """
 
 ####### Import ########
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
+# seaborn and matplotlib are imported in plot_data, pyarrow and zstandard in OutputWriter (import_optional)
 import datetime
 from datetime import datetime
 import warnings
@@ -46,128 +49,2586 @@ warnings.filterwarnings(action='ignore')
 import argparse, sys
 import pathlib, os
 import statistics
+import tempfile
+import io
+import hashlib, json, shutil, time
+import contextlib, pickle
+import itertools
+import functools
+import gzip
+import glob
+import importlib
+import platform, tracemalloc
+try:
+	import resource
+except ImportError:  # not available on Windows
+	resource = None
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 parent = pathlib.Path(os.path.abspath(os.path.dirname(__file__))).parent.parent
 sys.path.append(f'{parent}')
 from rich.console import Console
+from rich.table import Table
+from rich.markup import escape
+
+def import_optional(name:str):
+	"""
+	Imports a module when it is first needed (plotting, Parquet/Feather and zstd output), so importing this module and
+	the runs without these features stay fast. Returns None if the module is not installed.
+	"""
+	try:
+		return importlib.import_module(name)
+	except ImportError:
+		return None
+
+###### Sensor log parser ######
+# default na_values of pandas.read_csv
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null'}
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# lines per block of the pandas parser with --compact
+COMPACT_BLOCK = 1 << 16
+
+class SensorLogParser(object):
+	"""
+	Fast reader for the fixed "Date Time T= H= TO=" format. Parses the bytes of the input-file with NumPy in one pass
+	into a datetime64[ns] column (explicit timestamp format) and float columns (prefixes stripped).
+	Values that do not fit the simple layout are parsed like format_data_columns does (str.replace and pd.to_numeric).
+	The column Key holds a hash of the five raw fields for drop_duplicates. Counts of irregular lines are kept in counts.
+	"""
+	fields = 5
+	prefixes = {'Temp': b'T=', 'Hum': b'H='}
+	max_digits = 15
+	block_lines = 1 << 20
+
+	def __init__(self, timestamp_format:str=TIMESTAMP_FORMAT, dtype:str='float64') -> None:
+		"""
+		Constructor for the SensorLogParser class.
+		"""
+		self.timestamp_format = timestamp_format
+		self.dtype = dtype
+		self.counts = {'lines': 0, 'blank_lines': 0, 'short_lines': 0, 'long_lines': 0, 'quoted_blocks': 0, 'invalid_timestamps': 0, 'value_fallback': 0, 'invalid_values': 0}
+
+	def read(self, path:str) -> pd.DataFrame:
+		"""
+		Reads the whole input-file.
+		"""
+		frames = list(self.iter_chunks(path, None))
+		if not frames:
+			return self.parse(b'')
+		return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+	def iter_chunks(self, path, chunksize:int=None, block_size:int=1 << 26):
+		"""
+		Reads the input-file (path or binary file object) in blocks of complete lines. Yields DataFrames of chunksize rows (None = one per block).
+		"""
+		with (open(path, 'rb') if isinstance(path, (str, os.PathLike)) else contextlib.nullcontext(path)) as file:
+			rest = b''
+			while True:
+				block = file.read(block_size)
+				if not block:
+					break
+				block = rest + block
+				end = block.rfind(b'\n') + 1
+				if end == 0:
+					rest = block
+					continue
+				block, rest = block[:end], block[end:]
+				yield from self._split(self.parse(block), chunksize)
+			if rest:
+				yield from self._split(self.parse(rest), chunksize)
+
+	def _split(self, frame:pd.DataFrame, chunksize:int):
+		if chunksize is None:
+			yield frame
+			return
+		for start in range(0, len(frame), chunksize):
+			yield frame.iloc[start:start + chunksize]
+
+	def parse(self, buffer:bytes) -> pd.DataFrame:
+		"""
+		Parses complete lines of the input-file.
+		"""
+		if b'"' in buffer:
+			# quoted fields need the csv rules of read_csv
+			self.counts['quoted_blocks'] += 1
+			return self._parse_pandas(buffer)
+		data = np.frombuffer(buffer, dtype=np.uint8)
+		ends = np.flatnonzero(data == ord('\n'))
+		if len(data) and data[-1] != ord('\n'):
+			ends = np.append(ends, len(data))
+		starts = np.concatenate(([0], ends[:-1] + 1)).astype('int64')
+		# strip \r and skip blank lines
+		ends = ends - ((ends > starts) & (data[np.maximum(ends - 1, 0)] == ord('\r')))
+		blank = ends == starts
+		self.counts['lines'] += len(starts)
+		self.counts['blank_lines'] += int(blank.sum())
+		starts, ends = starts[~blank], ends[~blank]
+		frames = [self._parse_lines(data, starts[i:i + self.block_lines], ends[i:i + self.block_lines]) for i in range(0, max(len(starts), 1), self.block_lines)]
+		return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+	def _parse_lines(self, data:np.ndarray, starts:np.ndarray, ends:np.ndarray) -> pd.DataFrame:
+		# field boundaries from the positions of the separators, start -1 marks a missing field
+		if len(starts):
+			spaces = np.flatnonzero(data[starts[0]:ends[-1]] == ord(' ')) + starts[0]
+		else:
+			spaces = np.empty(0, dtype='int64')
+		spaces = np.append(spaces, len(data))
+		first = np.searchsorted(spaces, starts)
+		separators = np.searchsorted(spaces, ends) - first
+		self.counts['short_lines'] += int((separators < self.fields - 1).sum())
+		self.counts['long_lines'] += int((separators > self.fields - 1).sum())
+		field_start = []
+		field_end = []
+		for field in range(self.fields):
+			start = starts if field == 0 else spaces[np.minimum(first + field - 1, len(spaces) - 1)] + 1
+			end = np.where(separators > field, spaces[np.minimum(first + field, len(spaces) - 1)], ends)
+			field_start.append(np.where(separators >= field, start, -1))
+			field_end.append(end)
+		frame = pd.DataFrame({
+			'Temp': self._parse_values(data, field_start[2], field_end[2], 'Temp'),
+			'Hum': self._parse_values(data, field_start[3], field_end[3], 'Hum'),
+			'Datetime': self._parse_datetimes(data, field_start[0], field_end[0], field_start[1], field_end[1]),
+		})
+		frame['Key'] = self._row_keys(data, field_start, field_end)
+		return frame
+
+	def _groups(self, lengths:np.ndarray):
+		# rows grouped by field length, the fields of one group are read as a matrix of bytes
+		order = np.argsort(lengths, kind='stable')
+		bounds = np.flatnonzero(np.diff(lengths[order])) + 1
+		for rows in np.split(order, bounds):
+			if len(rows):
+				yield int(lengths[rows[0]]), rows
+
+	def _tokens(self, data:np.ndarray, start:np.ndarray, end:np.ndarray, rows:np.ndarray) -> list:
+		# decoded fields, NaN for missing fields and default na_values
+		tokens = []
+		for row in rows:
+			token = bytes(data[start[row]:end[row]]).decode('utf-8', 'replace') if start[row] >= 0 else ''
+			tokens.append(np.nan if token in NA_VALUES else token)
+		return tokens
+
+	def _parse_datetimes(self, data:np.ndarray, date_start, date_end, time_start, time_end) -> np.ndarray:
+		result = np.full(len(date_start), np.iinfo(np.int64).min, dtype='int64')
+		present = (date_start >= 0) & (time_start >= 0)
+		rows = np.flatnonzero(present & (date_end - date_start == 10) & (time_end - time_start == 8))
+		if self.timestamp_format != TIMESTAMP_FORMAT:
+			rows = rows[:0]
+		# fixed layout YYYY-MM-DD HH:MM:SS
+		matrix = data[date_start[rows, None] + np.arange(19)]
+		digits = matrix - np.uint8(ord('0'))
+		ok = (matrix[:, 4] == ord('-')) & (matrix[:, 7] == ord('-')) & (matrix[:, 10] == ord(' ')) & (matrix[:, 13] == ord(':')) & (matrix[:, 16] == ord(':'))
+		ok &= (digits[:, [0,1,2,3,5,6,8,9,11,12,14,15,17,18]] <= 9).all(axis=1)
+		number = lambda *columns: sum(digits[:, column].astype('int64') * 10 ** (len(columns) - 1 - i) for i, column in enumerate(columns))
+		year, month, day = number(0, 1, 2, 3), number(5, 6), number(8, 9)
+		hour, minute, second = number(11, 12), number(14, 15), number(17, 18)
+		ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour <= 23) & (minute <= 59) & (second <= 59)
+		months = np.where(ok, (year - 1970) * 12 + month - 1, 0)
+		days = months.astype('datetime64[M]').astype('datetime64[D]') + np.where(ok, day - 1, 0)
+		ok &= days.astype('datetime64[M]').astype('int64') == months
+		seconds = days.astype('int64') * 86400 + hour * 3600 + minute * 60 + second
+		ok &= (seconds > pd.Timestamp.min.value // 10**9 + 1) & (seconds < pd.Timestamp.max.value // 10**9)
+		result[rows[ok]] = seconds[ok] * 10**9
+		# everything else with the explicit format
+		fallback = np.flatnonzero(present)
+		fallback = np.setdiff1d(fallback, rows[ok], assume_unique=True)
+		if len(fallback):
+			dates = pd.Series(self._tokens(data, date_start, date_end, fallback), dtype=object)
+			times = pd.Series(self._tokens(data, time_start, time_end, fallback), dtype=object)
+			parsed = pd.to_datetime(dates + ' ' + times, format=self.timestamp_format, errors="coerce")
+			result[fallback] = parsed.to_numpy(dtype='datetime64[ns]').view('int64')
+		result = result.view('datetime64[ns]')
+		self.counts['invalid_timestamps'] += int(np.isnat(result).sum())
+		return result
+
+	def _parse_values(self, data:np.ndarray, start:np.ndarray, end:np.ndarray, column:str) -> np.ndarray:
+		prefix = self.prefixes[column]
+		result = np.full(len(start), np.nan)
+		lengths = end - start - len(prefix)
+		rows = np.flatnonzero((start >= 0) & (lengths >= 1) & (lengths <= self.max_digits + 2))
+		for offset, byte in enumerate(prefix):
+			rows = rows[data[start[rows] + offset] == byte]
+		# [+-]digits[.digits] as integer of all digits divided by 10**decimals, correctly rounded like float()
+		parsed = []
+		for length, group in self._groups(lengths[rows]):
+			group = rows[group]
+			matrix = data[start[group, None] + len(prefix) + np.arange(length)]
+			digits = matrix - np.uint8(ord('0'))
+			is_digit = digits <= 9
+			dot = matrix == ord('.')
+			sign = (matrix[:, 0] == ord('-')) | (matrix[:, 0] == ord('+'))
+			digit_count = is_digit.sum(axis=1)
+			ok = (digit_count + dot.sum(axis=1) + sign == length) & (dot.sum(axis=1) <= 1) & (digit_count >= 1) & (digit_count <= self.max_digits)
+			mantissa = np.zeros(len(group), dtype='int64')
+			for column in range(length):
+				mantissa = np.where(is_digit[:, column], mantissa * 10 + digits[:, column], mantissa)
+			decimals = np.where(dot.any(axis=1), length - 1 - dot.argmax(axis=1), 0)
+			values = np.where(matrix[:, 0] == ord('-'), -1.0, 1.0) * (mantissa / 10.0 ** decimals)
+			result[group[ok]] = values[ok]
+			parsed.append(group[ok])
+		rows = np.concatenate(parsed) if parsed else rows[:0]
+		# irregular fields like format_data_columns
+		fallback = np.setdiff1d(np.flatnonzero(start >= 0), rows, assume_unique=True)
+		if len(fallback):
+			self.counts['value_fallback'] += len(fallback)
+			tokens = pd.Series(self._tokens(data, start, end, fallback), dtype=object)
+			result[fallback] = pd.to_numeric(tokens.str.replace(prefix.decode(), ''), errors='coerce').to_numpy(dtype='float64')
+		self.counts['invalid_values'] += int(np.isnan(result).sum())
+		return result.astype(self.dtype)
+
+	def _is_na(self, data:np.ndarray, start:np.ndarray, end:np.ndarray) -> np.ndarray:
+		# missing fields, empty fields and default na_values are all NaN for read_csv
+		length = np.where(start >= 0, end - start, 0)
+		na = length == 0
+		pairs = [token.encode()[0] * 256 + token.encode()[1] for token in NA_VALUES if len(token) > 1]
+		candidates = np.flatnonzero((length >= 2) & (length <= max(map(len, NA_VALUES))))
+		candidates = candidates[np.isin(data[start[candidates]].astype('int64') * 256 + data[start[candidates] + 1], pairs)]
+		if len(candidates):
+			na[candidates] = [token is np.nan for token in self._tokens(data, start, end, candidates)]
+		return na
+
+	def _hash(self, data:np.ndarray, start:np.ndarray, lengths:np.ndarray) -> np.ndarray:
+		hashes = lengths.astype('uint64') * np.uint64(0x9E3779B97F4A7C15)
+		for length, rows in self._groups(lengths):
+			if length == 0:
+				continue
+			# bytes of the field as 8-byte words
+			matrix = np.zeros((len(rows), -(-length // 8) * 8), dtype=np.uint8)
+			matrix[:, :length] = data[start[rows, None] + np.arange(length)]
+			words = matrix.view('uint64')
+			key = hashes[rows]
+			for column in range(words.shape[1]):
+				key = (key ^ words[:, column]) * np.uint64(0x100000001B3)
+				key ^= key >> np.uint64(29)
+			hashes[rows] = key
+		return hashes
+
+	def _row_keys(self, data:np.ndarray, field_start:list, field_end:list) -> np.ndarray:
+		# rows that read_csv reads as equal get equal keys: the raw bytes of the five fields,
+		# field by field for rows with missing, empty or NaN fields
+		na = [self._is_na(data, start, end) for start, end in zip(field_start, field_end)]
+		irregular = np.logical_or.reduce(na)
+		keys = self._hash(data, field_start[0], np.where(irregular, 0, field_end[-1] - field_start[0]))
+		rows = np.flatnonzero(irregular)
+		if len(rows):
+			keys[rows] = np.uint64(0)
+			for field, (start, end) in enumerate(zip(field_start, field_end)):
+				lengths = np.where(na[field][rows], 0, end[rows] - start[rows])
+				keys[rows] = keys[rows] * np.uint64(0x100000001B3) + self._hash(data, start[rows], lengths)
+		return keys
+
+	def _parse_pandas(self, buffer:bytes) -> pd.DataFrame:
+		# read_csv like open_file for blocks with quoted fields
+		frame = pd.read_csv(io.BytesIO(buffer), sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True, dtype=object, names=['Date', 'Time', 'Temp', 'Hum', 'TO'])
+		result = pd.DataFrame({
+			'Temp': pd.to_numeric(frame['Temp'].str.replace('T=', ''), errors='coerce').astype(self.dtype),
+			'Hum': pd.to_numeric(frame['Hum'].str.replace('H=', ''), errors='coerce').astype(self.dtype),
+			'Datetime': pd.to_datetime(frame['Date'] + ' ' + frame['Time'], format=self.timestamp_format, errors="coerce"),
+		})
+		result['Key'] = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+		self.counts['invalid_timestamps'] += int(result['Datetime'].isna().sum())
+		self.counts['invalid_values'] += int(result['Temp'].isna().sum() + result['Hum'].isna().sum())
+		return result
+
+###### Parse cache ######
+class ParseCache(object):
+	"""
+	Binary columnar cache of parsed input-files. Each entry is a directory with one .npy file per column (index, Temp, Hum,
+	Datetime) and meta.json. Entries are found by input path and parser options and are valid while the input-file is
+	unchanged: same size and mtime, or same size and content hash if only the mtime changed (e.g. a copy). Columns are
+	memory-mapped copy-on-write on load, the Dataframe uses the mapped pages until a stage modifies them. The least
+	recently used entries are evicted when the cache is larger than max_bytes.
+	"""
+	version = 1
+	columns = ['Temp', 'Hum', 'Datetime']
+
+	def __init__(self, directory:str, max_bytes:int) -> None:
+		"""
+		Constructor for the ParseCache class.
+		"""
+		self.directory = directory
+		self.max_bytes = max_bytes
+
+	def entry(self, path:str, options:dict) -> str:
+		"""
+		Returns the directory of the cache entry for an input-file and parser options.
+		"""
+		name = json.dumps({'path': os.path.abspath(path), 'version': self.version, **options}, sort_keys=True)
+		return os.path.join(self.directory, hashlib.blake2b(name.encode(), digest_size=16).hexdigest())
+
+	def fingerprint(self, path:str, content:bool=True) -> dict:
+		"""
+		Size, mtime and (optionally) blake2b hash of the content of the input-file.
+		"""
+		stat = os.stat(path)
+		result = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+		if content:
+			digest = hashlib.blake2b(digest_size=16)
+			with open(path, 'rb') as file:
+				for block in iter(lambda: file.read(1 << 24), b''):
+					digest.update(block)
+			result['hash'] = digest.hexdigest()
+		return result
+
+	def load(self, path:str, options:dict) -> tuple:
+		"""
+		Returns the cached Dataframe of the input-file and the meta data of the entry or None.
+		"""
+		entry = self.entry(path, options)
+		try:
+			with open(os.path.join(entry, 'meta.json')) as file:
+				meta = json.load(file)
+		except (OSError, ValueError):
+			return None
+		fingerprint = self.fingerprint(path, content=False)
+		if meta['size'] != fingerprint['size']:
+			return None
+		if meta['mtime'] != fingerprint['mtime']:
+			# only the mtime changed: the entry is still valid if the content is the same
+			if meta['hash'] != self.fingerprint(path)['hash']:
+				return None
+			meta['mtime'] = fingerprint['mtime']
+			with open(os.path.join(entry, 'meta.json'), 'w') as file:
+				json.dump(meta, file)
+		columns = {column: np.load(os.path.join(entry, f'{column}.npy'), mmap_mode='c') for column in ['index'] + self.columns}
+		# copy=False keeps the memory-mapped columns as blocks instead of copying them into one block
+		dataframe = pd.DataFrame({column: columns[column] for column in self.columns}, index=pd.Index(columns['index'], copy=False), copy=False)
+		# mark as recently used
+		os.utime(os.path.join(entry, 'meta.json'))
+		return dataframe, meta
+
+	def store(self, path:str, options:dict, dataframe:pd.DataFrame, rows_in:int) -> None:
+		"""
+		Writes the Dataframe (columns Temp, Hum, Datetime) and the number of parsed rows to the cache and evicts old entries.
+		"""
+		entry = self.entry(path, options)
+		os.makedirs(self.directory, exist_ok=True)
+		partial = tempfile.mkdtemp(dir=self.directory, prefix='.partial-')
+		try:
+			np.save(os.path.join(partial, 'index.npy'), dataframe.index.to_numpy(dtype='int64'))
+			for column in self.columns:
+				np.save(os.path.join(partial, f'{column}.npy'), dataframe[column].to_numpy())
+			with open(os.path.join(partial, 'meta.json'), 'w') as file:
+				json.dump({'path': os.path.abspath(path), 'rows': len(dataframe), 'rows_in': rows_in, **options, **self.fingerprint(path)}, file)
+			shutil.rmtree(entry, ignore_errors=True)
+			os.rename(partial, entry)
+		finally:
+			shutil.rmtree(partial, ignore_errors=True)
+		self.evict()
+
+	def evict(self) -> None:
+		"""
+		Removes the least recently used entries until the cache is not larger than max_bytes.
+		"""
+		entries = []
+		for name in os.listdir(self.directory):
+			entry = os.path.join(self.directory, name)
+			try:
+				size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+				entries.append((os.path.getmtime(os.path.join(entry, 'meta.json')), size, entry))
+			except OSError:
+				continue
+		total = sum(size for _, size, _ in entries)
+		for _, size, entry in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			shutil.rmtree(entry, ignore_errors=True)
+			total -= size
+
+###### Valid span ######
+class ValidSpan(object):
+	"""
+	Positions and timestamps of the first and last valid (not NaT) timestamp of a Datetime column.
+	Both ends are located lazily with block-wise scans that stop at the first hit and are cached afterwards.
+	"""
+	block = 4096
+
+	def __init__(self, datetimes) -> None:
+		"""
+		Constructor for the ValidSpan class.
+		"""
+		self.values = np.asarray(datetimes, dtype='datetime64[ns]')
+		self._first_index = None
+		self._last_index = None
+
+	def _scan(self, reverse:bool) -> int:
+		"""
+		Returns the position of the first (reverse = False) or last (reverse = True) valid timestamp.
+		"""
+		n = len(self.values)
+		for offset in range(0, n, self.block):
+			if reverse:
+				block = self.values[max(n - offset - self.block, 0):n - offset]
+				valid = np.flatnonzero(~np.isnat(block))
+				if len(valid):
+					return max(n - offset - self.block, 0) + int(valid[-1])
+			else:
+				valid = np.flatnonzero(~np.isnat(self.values[offset:offset + self.block]))
+				if len(valid):
+					return offset + int(valid[0])
+		raise ValueError('No valid timestamp in Datetime column')
+
+	@property
+	def first_index(self) -> int:
+		if self._first_index is None:
+			self._first_index = self._scan(reverse=False)
+		return self._first_index
+
+	@property
+	def last_index(self) -> int:
+		if self._last_index is None:
+			self._last_index = self._scan(reverse=True)
+		return self._last_index
+
+	@property
+	def start_time(self) -> pd.Timestamp:
+		return pd.Timestamp(self.values[self.first_index])
+
+	@property
+	def end_time(self) -> pd.Timestamp:
+		return pd.Timestamp(self.values[self.last_index])
+
+	def __repr__(self) -> str:
+		return f'ValidSpan(first_index={self.first_index}, last_index={self.last_index}, start_time={self.start_time}, end_time={self.end_time})'
+
+###### Timestamp validation ######
+def find_invalid_dates(datetimes, first_index:int, last_index:int, start_time, now, offset:int=0) -> np.ndarray:
+	"""
+	Vectorized timestamp validation. Returns a boolean mask of the timestamps that check_valid_date changes to NaT.
+	Works positionally on the int64 view of datetime64[ns], offset is the position of the first element (chunks). A timestamp is invalid if (start_time <= t <= now) fails,
+	if t >= next timestamp or if previous timestamp >= t. As in the row-by-row rules the previous timestamp is the
+	already checked one, so a timestamp following an invalidated timestamp has no previous neighbour.
+	"""
+	values = np.asarray(datetimes, dtype='datetime64[ns]').view('int64')
+	n = len(values)
+	invalid = np.zeros(n, dtype=bool)
+	if n == 0:
+		return invalid
+	nat = values == np.iinfo(np.int64).min
+	positions = np.arange(n) + offset
+	start_ns = np.datetime64(pd.Timestamp(start_time), 'ns').astype('int64')
+	now_ns = np.datetime64(pd.Timestamp(now), 'ns').astype('int64')
+
+	# (start_time <= datecheck <= now)
+	outside_window = (values < start_ns) | (values > now_ns)
+	# actual_date >= next_date (next_date = now after last valid index, comparisons with NaT are False)
+	next_values = np.empty_like(values)
+	next_values[:-1] = values[1:]
+	next_nat = np.ones(n, dtype=bool)
+	next_nat[:-1] = nat[1:]
+	after_last = positions >= last_index
+	next_values[after_last] = now_ns
+	next_nat[after_last] = False
+	not_before_next = ~next_nat & (values >= next_values)
+	# previous_date >= actual_date (previous_date of the first valid index is the timestamp itself)
+	previous_values = np.empty_like(values)
+	previous_values[1:] = values[:-1]
+	previous_nat = np.ones(n, dtype=bool)
+	previous_nat[1:] = nat[:-1]
+	not_after_previous = ~previous_nat & (previous_values >= values)
+	not_after_previous[positions <= first_index] = False
+	if 0 <= first_index - offset < n:
+		not_after_previous[first_index - offset] = True
+	if first_index == 0:
+		# previous_date = 0 --> no previous neighbour after the first row
+		not_after_previous[positions > 0] = False
+
+	candidates = ~nat
+	if 0 <= last_index - offset < n and nat[last_index - offset]:
+		candidates[:] = False
+	forced = candidates & (outside_window | not_before_next)
+	# previous_date is the already checked timestamp: if it was changed to NaT the previous check is False.
+	# Only forced timestamps can precede a timestamp failing the previous check (previous >= actual excludes
+	# actual < next for the previous one), so one shift of the forced mask resolves the row-by-row dependency.
+	previous_forced = np.zeros(n, dtype=bool)
+	previous_forced[1:] = forced[:-1]
+	invalid = forced | (candidates & not_after_previous & ~previous_forced)
+	return invalid
+
+def fill_nat_segments(datetimes, first_index:int, timegap, offset:int=0) -> np.ndarray:
+	"""
+	Vectorized NaT replacement. Finds the contiguous NaT runs once and fills each run from its valid anchors:
+	the first timestamp of a run is previous timestamp + timegap, the others are next timestamp - k * timegap.
+	Runs at the beginning (up to first_index) are filled backwards from the next timestamp, runs at the end forwards
+	from the previous timestamp. Offset is the position of the first element (chunks). Returns a new datetime64[ns] array.
+	"""
+	datetimes = np.array(datetimes, dtype='datetime64[ns]')
+	values = datetimes.view('int64')
+	nat = np.isnat(datetimes)
+	n = len(values)
+	if not nat.any() or nat.all() or pd.isnull(timegap):
+		return datetimes
+	gap = pd.Timedelta(timegap).value
+	positions = np.arange(n)
+	# Run-length segments of NaT
+	edges = np.diff(np.concatenate(([0], nat.astype('int8'), [0])))
+	run_starts = np.flatnonzero(edges == 1)
+	run_ends = np.flatnonzero(edges == -1) - 1
+	run_id = np.cumsum(edges[:-1] == 1) - 1
+	nat_positions = positions[nat]
+	start = run_starts[run_id[nat]]
+	end = run_ends[run_id[nat]]
+	previous_anchor = values[np.maximum(start - 1, 0)]
+	next_anchor = values[np.minimum(end + 1, n - 1)]
+
+	leading = (start + offset == 0) | (start + offset <= first_index)
+	trailing = (end == n - 1) & ~leading
+	forwards = trailing | ((nat_positions == start) & ~leading)
+	filled = np.where(forwards, previous_anchor + (nat_positions - start + 1) * gap, next_anchor - (end + 1 - nat_positions) * gap)
+	values[nat] = filled
+	return datetimes
+
+###### Value validation ######
+VALUE_RULES = {
+	'Temp': {'min': 0, 'max': 50, 'max_step': None, 'stuck': None},  # Valid range for temperature values
+	'Hum': {'min': 0, 'max': 100, 'max_step': None, 'stuck': None},  # Valid range for humidity values
+}
+
+class ValueRules(object):
+	"""
+	Validation rules per value column, each applied as one mask operation over the column:
+	- min/max: valid range, values outside are invalid.
+	- max_step: maximum step change per sample. A value that jumps by more than max_step from the previous valid value and
+	  back by more than max_step to the next valid value is a spike. A single step (level shift) is kept.
+	- stuck: stuck sensor. In a run of at least stuck identical consecutive values the repetitions are invalid.
+	Rules set to None are not applied.
+	"""
+	names = ['range', 'step', 'stuck']
+
+	def __init__(self, rules:dict=None) -> None:
+		"""
+		Constructor for the ValueRules class. rules overrides VALUE_RULES per column and rule.
+		"""
+		self.rules = {column: dict(rule) for column, rule in VALUE_RULES.items()}
+		for column, rule in (rules or {}).items():
+			if column not in self.rules:
+				raise ValueError(f'Unknown column in value rules: {column}')
+			unknown = sorted(set(rule) - set(self.rules[column]))
+			if unknown:
+				raise ValueError(f'Unknown value rules for {column}: {unknown}')
+			if (rule.get('stuck') is not None) and (int(rule['stuck']) < 2):
+				raise ValueError(f'stuck of {column} must be at least 2')
+			self.rules[column].update(rule)
+
+	@classmethod
+	def load(cls, path:str):
+		"""
+		Reads the rules from a JSON file, e.g. {"Temp": {"max_step": 5, "stuck": 24}, "Hum": {"min": 5}}.
+		"""
+		with open(path) as file:
+			return cls(json.load(file))
+
+	def sequential(self) -> bool:
+		"""
+		True if a rule depends on neighbouring rows (max_step or stuck).
+		"""
+		return any((rule['max_step'] is not None) or (rule['stuck'] is not None) for rule in self.rules.values())
+
+	def check(self, frame:pd.DataFrame) -> dict:
+		"""
+		Positions of the invalid values per column and rule: {column: {'range': positions, 'step': ..., 'stuck': ...}}.
+		The step rule only compares values inside the valid range.
+		"""
+		return {column: self.check_column(column, frame[column].to_numpy(dtype='float64')) for column in self.rules}
+
+	def check_column(self, column:str, values:np.ndarray) -> dict:
+		"""
+		Positions of the invalid values of one column per rule (see check).
+		"""
+		rule = self.rules[column]
+		low = -np.inf if rule['min'] is None else rule['min']
+		high = np.inf if rule['max'] is None else rule['max']
+		invalid = (values < low) | (values > high)
+		found = {'range': np.flatnonzero(invalid)}
+		if rule['max_step'] is not None:
+			found['step'] = self.spikes(values, ~invalid & ~np.isnan(values), rule['max_step'])
+		if rule['stuck'] is not None:
+			found['stuck'] = self.repetitions(values, int(rule['stuck']))
+		return found
+
+	@staticmethod
+	def replace(series:pd.Series, positions:np.ndarray):
+		"""
+		Values of series with NaN at positions (integer columns become float64).
+		"""
+		if not len(positions):
+			return series
+		values = series.to_numpy(dtype=None if series.dtype.kind == 'f' else 'float64', copy=True)
+		values[positions] = np.nan
+		return values
+
+	@staticmethod
+	def spikes(values:np.ndarray, valid:np.ndarray, max_step:float) -> np.ndarray:
+		"""
+		Positions of the valid values that jump by more than max_step from the previous and back to the next valid value.
+		"""
+		positions = np.flatnonzero(valid)
+		steps = np.diff(values[positions])
+		spike = (np.abs(steps[:-1]) > max_step) & (np.abs(steps[1:]) > max_step) & (np.sign(steps[:-1]) != np.sign(steps[1:]))
+		return positions[1:-1][spike]
+
+	@staticmethod
+	def repetitions(values:np.ndarray, length:int) -> np.ndarray:
+		"""
+		Positions of the repetitions (all but the first value) in runs of at least length identical consecutive values.
+		"""
+		if not len(values):
+			return np.empty(0, dtype='int64')
+		starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+		lengths = np.diff(np.append(starts, len(values)))
+		long = lengths >= length
+		starts, lengths = starts[long] + 1, lengths[long] - 1
+		# consecutive positions of each run without building a list per run
+		offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+		return np.repeat(starts, lengths) + offsets
+
+###### Interpolation ######
+INTERPOLATIONS = ['linear', 'time']
+
+def interpolate_gaps(values, datetimes, method:str='linear', max_gap:int=None) -> np.ndarray:
+	"""
+	Interpolates the NaN values of a column with np.interp like Series.interpolate: leading NaN stay NaN, trailing NaN get
+	the last valid value. linear interpolates by row position (interpolate(method='linear')), time by the timestamps of
+	datetimes (interpolate(method='time')). With max_gap (int64 nanoseconds) a NaN run stays NaN if the valid values
+	around it are more than max_gap apart (a trailing run: the last valid value and the last row).
+	"""
+	values = np.array(values, dtype='float64')
+	nan = np.isnan(values)
+	valid = np.flatnonzero(~nan)
+	if (not nan.any()) or (not len(valid)):
+		return values
+	missing = np.flatnonzero(nan)
+	times = np.asarray(datetimes, dtype='datetime64[ns]').view('int64')
+	x = times if method == 'time' else np.arange(len(values))
+	# np.interp needs increasing sample points, equal or backward timestamps are sorted like Series.interpolate does
+	order = np.argsort(x[valid], kind='stable')
+	values[missing] = np.interp(x[missing], x[valid][order], values[valid][order])
+	values[:valid[0]] = np.nan
+	if max_gap is not None:
+		# index of the next valid value of each NaN value, leading NaN have no previous one
+		following = np.searchsorted(valid, missing)
+		inner = following > 0
+		missing, following = missing[inner], following[inner]
+		end = np.where(following < len(valid), times[valid[np.minimum(following, len(valid) - 1)]], times[-1])
+		values[missing[end - times[valid[following - 1]] > max_gap]] = np.nan
+	return values
+
+class GridResampler(object):
+	"""
+	Resamples rows to a regular time grid with a fixed step (the median timegap), starting at the first timestamp. A grid
+	value is interpolated in time between the rows before and after the grid point. It is NaN if one of them is NaN or if
+	they are more than max_gap apart. Works chunk by chunk like a sort of all rows: rows are held back until no later row
+	can come before them, assuming the timestamps are never further out of order than the largest disorder seen so far
+	(how far a row lies before the latest timestamp of the rows before it). Rows that come later than that are counted in
+	late; the grid points around them were written already and differ from the resampling of all rows.
+	"""
+
+	def __init__(self, step, max_gap=None, columns:list=['Temp', 'Hum']) -> None:
+		"""
+		Constructor for the GridResampler class. step and max_gap are Timedeltas or offsets like '5min'.
+		"""
+		self.step = pd.Timedelta(step).value
+		if self.step <= 0:
+			raise ValueError(f'Invalid grid step: {step}')
+		self.max_gap = None if max_gap is None else pd.Timedelta(max_gap).value
+		self.columns = columns
+		# rows held back (sorted, in the order of arrival for equal timestamps), the next grid point, the latest timestamp,
+		# the largest disorder, the last timestamp used for grid points and the number of rows that came too late
+		self.times = np.empty(0, dtype='int64')
+		self.values = {column: np.empty(0, dtype='float64') for column in columns}
+		self.next_time = None
+		self.latest = None
+		self.disorder = 0
+		self.released = None
+		self.late = 0
+
+	def resample(self, frame:pd.DataFrame, final:bool=True) -> pd.DataFrame:
+		"""
+		Grid rows of frame and the rows held back (rows with NaT are skipped). Without final only the grid points that no
+		later row can change are returned, the others wait for the next frame.
+		"""
+		times = frame['Datetime'].to_numpy(dtype='datetime64[ns]').view('int64')
+		keep = times != np.iinfo(np.int64).min
+		times = times[keep]
+		values = {column: frame[column].to_numpy(dtype='float64')[keep] for column in self.columns}
+		if len(times):
+			latest = np.maximum.accumulate(times if self.latest is None else np.concatenate(([self.latest], times)))
+			before = latest[:-1] if self.latest is not None else np.concatenate(([times[0]], latest[:-1]))
+			self.disorder = max(self.disorder, int((before - times).max()))
+			self.latest = int(latest[-1])
+			if self.released is not None:
+				self.late += int((times < self.released).sum())
+		times = np.concatenate((self.times, times))
+		values = {column: np.concatenate((self.values[column], values[column])) for column in self.columns}
+		if len(times) and (np.diff(times) < 0).any():
+			order = np.argsort(times, kind='stable')
+			times = times[order]
+			values = {column: values[column][order] for column in self.columns}
+		dtypes = {column: frame[column].dtype if frame[column].dtype.kind == 'f' else np.dtype('float64') for column in self.columns}
+		empty = pd.DataFrame({**{column: np.empty(0, dtype=dtypes[column]) for column in self.columns}, 'Datetime': np.empty(0, dtype='datetime64[ns]')})
+		# rows before the limit are final, later rows may still get rows before them
+		final_rows = len(times) if final else int(np.searchsorted(times, self.latest - self.disorder, side='left')) if len(times) else 0
+		if not final_rows:
+			self.times, self.values = times, values
+			return empty
+		if self.next_time is None:
+			self.next_time = int(times[0])
+		last = int(times[final_rows - 1])
+		grid = np.arange(self.next_time, last + 1, self.step, dtype='int64')
+		left = np.searchsorted(times, grid, side='right') - 1
+		right = np.minimum(left + 1, len(times) - 1)
+		exact = times[left] == grid
+		span = times[right] - times[left]
+		weight = (grid - times[left]) / np.where(exact, 1, span)
+		result = {}
+		for column in self.columns:
+			column_values = values[column]
+			interpolated = column_values[left] + (column_values[right] - column_values[left]) * weight
+			result[column] = np.where(exact, column_values[left], interpolated)
+			if self.max_gap is not None:
+				result[column][~exact & (span > self.max_gap)] = np.nan
+			result[column] = result[column].astype(dtypes[column])
+		if len(grid):
+			self.next_time = int(grid[-1]) + self.step
+		self.released = last
+		# the last row before the next grid point is its left neighbour
+		anchor = max(int(np.searchsorted(times, self.next_time, side='right')) - 1, 0)
+		self.times = times[anchor:]
+		self.values = {column: values[column][anchor:] for column in self.columns}
+		return pd.DataFrame({**result, 'Datetime': grid.view('datetime64[ns]')})
+
+###### Estimators ######
+ESTIMATORS = ['exact', 'tdigest']
+
+class TDigest(object):
+	"""
+	Approximate quantiles of a stream of values with bounded memory (t-digest). The values are merged into centroids
+	(mean, weight), at most about `compression` of them. The scale function k(q) = compression * (asin(2q - 1) / pi + 0.5)
+	gives each centroid at most one unit of k, so centroids in the tails hold few values and centroids near the median
+	many. update merges a whole block of values with NumPy, the sketch is filled chunk by chunk.
+	"""
+
+	def __init__(self, compression:float=200) -> None:
+		"""
+		Constructor for the TDigest class.
+		"""
+		self.compression = compression
+		self.means = np.empty(0, dtype='float64')
+		self.weights = np.empty(0, dtype='float64')
+		self.count = 0.0
+		self.minimum = np.inf
+		self.maximum = -np.inf
+
+	def update(self, values) -> 'TDigest':
+		"""
+		Adds a block of values (NaN is ignored). The sorted block is compressed on its own first, then its centroids are
+		merged with the centroids of the sketch.
+		"""
+		values = np.asarray(values, dtype='float64').ravel()
+		values = np.sort(values[~np.isnan(values)])
+		if not len(values):
+			return self
+		self.minimum = min(self.minimum, values[0])
+		self.maximum = max(self.maximum, values[-1])
+		means, weights = self._compress(values, np.ones(len(values)))
+		means = np.concatenate((self.means, means))
+		weights = np.concatenate((self.weights, weights))
+		order = np.argsort(means, kind='stable')
+		self.means, self.weights = self._compress(means[order], weights[order])
+		self.count = self.weights.sum()
+		return self
+
+	def _compress(self, means:np.ndarray, weights:np.ndarray) -> tuple:
+		# merges sorted centroids that fall into the same unit of the scale function
+		q = (np.cumsum(weights) - weights / 2) / weights.sum()
+		k = np.floor(self.compression * (np.arcsin(np.clip(2 * q - 1, -1, 1)) / np.pi + 0.5))
+		starts = np.flatnonzero(np.diff(k, prepend=-1))
+		merged = np.add.reduceat(weights, starts)
+		return np.add.reduceat(means * weights, starts) / merged, merged
+
+	def quantile(self, q:float) -> float:
+		"""
+		Quantile by linear interpolation between the centroids. Equal to the linear quantile of pandas while every
+		centroid holds one value.
+		"""
+		if self.count == 0:
+			return np.nan
+		centers = np.cumsum(self.weights) - self.weights / 2
+		positions = np.concatenate(([0.5], centers, [self.count - 0.5]))
+		values = np.concatenate(([self.minimum], self.means, [self.maximum]))
+		return float(np.interp(q * (self.count - 1) + 0.5, positions, values))
+
+###### Chunked processing ######
+def parse_lines(lines:list) -> pd.DataFrame:
+	"""
+	Parses raw lines (bytes) like open_file parses the whole file and returns the string columns Date, Time, Temp, Hum, TO.
+	read_csv takes the number of columns from the first line, a part of short lines ("Date Time error") would have less
+	than 5 columns. So a line with 5 fields is put in front of the lines and dropped again.
+	"""
+	frame = pd.read_csv(io.BytesIO(b'- - - - -\n' + b''.join(lines)), sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True, dtype=object).iloc[1:]
+	frame.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+	return frame
+
+class _NaTGap(object):
+	"""
+	Stand-in for a NaT timegap in median_timegap. Like pd.NaT it is neither smaller nor greater than any timegap.
+	"""
+	def __lt__(self, other) -> bool:
+		return False
+
+	def __gt__(self, other) -> bool:
+		return False
+
+def median_timegap(timegaps) -> pd.Timedelta:
+	"""
+	Median of int64 nanosecond timegaps (NaT = int64 min) with the same result as statistics.median over the Timedeltas
+	in calculate_mean_timegap. Without NaT the middle values come from np.partition. With NaT, which every file with an
+	invalid timestamp has, the original sort order is reproduced on a list of Python ints: NaT is not ordered, so the
+	result of sorted() depends on the positions of the NaT and cannot be computed from the valid values alone. This is
+	a known slow path: O(n log n) in Python and about 7 times the memory of the array (RegressionCheck.py compares it
+	with statistics.median). --estimator tdigest ignores NaT and has neither cost.
+	"""
+	timegaps = np.asarray(timegaps, dtype='int64')
+	n = len(timegaps)
+	if n == 0:
+		raise statistics.StatisticsError('no median for empty data')
+	nat = timegaps == np.iinfo(np.int64).min
+	if nat.any():
+		nat_gap = _NaTGap()
+		data = sorted([nat_gap if is_nat else value for value, is_nat in zip(timegaps.tolist(), nat.tolist())])
+		low, high = data[(n - 1) // 2], data[n // 2]
+		if (low is nat_gap) or (high is nat_gap):
+			return pd.NaT
+	else:
+		partitioned = np.partition(timegaps, [(n - 1) // 2, n // 2])
+		low, high = partitioned[(n - 1) // 2], partitioned[n // 2]
+	if n % 2 == 1:
+		return pd.Timedelta(int(low))
+	return (pd.Timedelta(int(low)) + pd.Timedelta(int(high))) / 2
+
+DUPLICATE_POLICIES = ['first', 'last', 'mean']
+
+class DuplicateWindow(object):
+	"""
+	Duplicate removal across chunks. Rows are hashed to uint64 keys, over all columns or over the key columns only
+	(e.g. Datetime, to find the same timestamp with different values). A row is dropped if its key is found earlier in
+	the same chunk or among the last `size` kept keys. Equal to drop_duplicates for duplicates less than `size` rows apart.
+	Within a chunk keep decides which row of equal keys is kept: first, last or the first with the mean of the other
+	columns. Across chunks the row that was kept before wins.
+	"""
+
+	def __init__(self, size:int, columns:list=None, keep:str='first') -> None:
+		"""
+		Constructor for the DuplicateWindow class.
+		"""
+		if keep not in DUPLICATE_POLICIES:
+			raise ValueError(f'Invalid duplicate policy: {keep}')
+		self.size = size
+		self.columns = columns
+		self.keep = keep
+		self.keys = np.empty(0, dtype='uint64')
+
+	def drop_duplicates(self, dataframe:pd.DataFrame, keys:np.ndarray=None) -> pd.DataFrame:
+		if keys is None:
+			keys = pd.util.hash_pandas_object(dataframe if self.columns is None else dataframe[self.columns], index=False).to_numpy()
+		keep = ~pd.Series(keys).duplicated(keep='last' if self.keep == 'last' else 'first').to_numpy() & ~np.isin(keys, self.keys)
+		if self.size > 0:
+			self.keys = np.concatenate((self.keys, keys[keep]))[-self.size:]
+		if (self.keep == 'mean') and (keep.sum() < len(keys)):
+			dataframe = self.mean_values(dataframe, keys)
+		return dataframe[keep]
+
+	def mean_values(self, dataframe:pd.DataFrame, keys:np.ndarray) -> pd.DataFrame:
+		"""
+		Replaces the values of the float and datetime columns that are not key columns with the mean per key (NaN and NaT
+		are skipped like in groupby().mean()).
+		"""
+		codes, uniques = pd.factorize(keys)
+		dataframe = dataframe.copy()
+		for column in dataframe.columns:
+			if (self.columns is None) or (column in self.columns) or (dataframe[column].dtype.kind not in 'fM'):
+				continue
+			values = dataframe[column].to_numpy()
+			datetime = values.dtype.kind == 'M'
+			valid = ~(np.isnat(values) if datetime else np.isnan(values))
+			# timestamps relative to the earliest one, the float sums keep the precision of the timegaps
+			origin = int(values[valid].view('int64').min()) if (datetime and valid.any()) else 0
+			numbers = (values.view('int64') - origin).astype('float64') if datetime else values.astype('float64')
+			counts = np.bincount(codes[valid], minlength=len(uniques))
+			sums = np.bincount(codes[valid], weights=numbers[valid], minlength=len(uniques))
+			with np.errstate(invalid='ignore', divide='ignore'):
+				means = sums / counts
+			if datetime:
+				means = np.where(counts > 0, np.round(np.nan_to_num(means)).astype('int64') + origin, np.iinfo(np.int64).min).view(values.dtype)
+			dataframe[column] = means[codes].astype(values.dtype)
+		return dataframe
+
+class ChunkCleaner(object):
+	"""
+	Cleans consecutive chunks like check_valid_date, replace_nat, format_data_columns, check_valid_value and
+	interpolate_nan clean the whole Dataframe. The index of a chunk is the global row position. Rows that depend on
+	following rows (the next timestamp, the end of a NaT or NaN run) are held back until the next chunk arrives.
+	"""
+
+	def __init__(self, first_index:int, last_index:int, start_time, mean_timegap, now, rules:dict=None, interpolation:str='linear', max_gap:int=None) -> None:
+		"""
+		Constructor for the ChunkCleaner class. rules are the range rules of ValueRules (max_step and stuck are not applied),
+		interpolation and max_gap (int64 nanoseconds) are passed to interpolate_gaps.
+		"""
+		self.first_index = first_index
+		self.last_index = last_index
+		self.start_time = start_time
+		self.mean_timegap = mean_timegap
+		self.now = now
+		self.rules = ValueRules(rules).rules
+		self.interpolation = interpolation
+		self.max_gap = max_gap
+		# rows held back and anchors of the previous chunk for each stage
+		self.pending_date = None
+		self.previous_date = None
+		self.pending_fill = None
+		self.previous_filled = None
+		self.pending_values = None
+		self.previous_values = None
+		self.previous_time = None
+		self.counts = {'invalid_dates': 0, 'nat': 0, 'nan': 0, 'invalid_values': 0, 'gap_nan': 0}
+
+	def clean(self, chunk:pd.DataFrame, eof:bool=False) -> pd.DataFrame:
+		"""
+		Cleans one chunk. Returns the rows that are final, eof = True flushes all rows held back.
+		"""
+		frame = self.check_dates(chunk, eof)
+		frame = self.fill_dates(frame, eof)
+		frame = self.format_values(frame)
+		return self.interpolate_values(frame, eof)
+
+	def check_dates(self, chunk:pd.DataFrame, eof:bool) -> pd.DataFrame:
+		"""
+		check_valid_date for a chunk. The last row waits for its next timestamp.
+		"""
+		frame = chunk if self.pending_date is None else pd.concat([self.pending_date, chunk])
+		self.pending_date = None
+		if not eof and len(frame):
+			frame, self.pending_date = frame.iloc[:-1], frame.iloc[-1:]
+		if not len(frame):
+			return frame
+		values = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+		extended = values
+		offset = frame.index[0]
+		if self.previous_date is not None:
+			extended = np.concatenate(([self.previous_date], extended))
+			offset -= 1
+		if self.pending_date is not None:
+			extended = np.concatenate((extended, self.pending_date['Datetime'].to_numpy(dtype='datetime64[ns]')))
+		invalid = find_invalid_dates(extended, self.first_index, self.last_index, self.start_time, self.now, offset=offset)
+		invalid = invalid[frame.index[0] - offset:frame.index[0] - offset + len(values)]
+		self.previous_date = values[-1]
+		values = values.copy()
+		values[invalid] = np.datetime64('NaT')
+		self.counts['invalid_dates'] += int(invalid.sum())
+		frame = frame.copy()
+		frame['Datetime'] = values
+		return frame
+
+	def fill_dates(self, frame:pd.DataFrame, eof:bool) -> pd.DataFrame:
+		"""
+		replace_nat for a chunk. A NaT run at the end of the chunk waits for its next valid timestamp.
+		"""
+		if self.pending_fill is not None:
+			frame = pd.concat([self.pending_fill, frame])
+		self.pending_fill = None
+		values = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+		nat = np.isnat(values)
+		end = len(values)
+		if not eof and end and nat[-1]:
+			valid = np.flatnonzero(~nat)
+			end = int(valid[-1]) + 1 if len(valid) else 0
+			self.pending_fill = frame.iloc[end:]
+			frame, values, nat = frame.iloc[:end], values[:end], nat[:end]
+		if not len(frame):
+			return frame
+		offset = frame.index[0]
+		if self.previous_filled is not None:
+			values = np.concatenate(([self.previous_filled], values))
+			offset -= 1
+		filled = fill_nat_segments(values, self.first_index, self.mean_timegap, offset=offset)[frame.index[0] - offset:]
+		self.previous_filled = filled[-1]
+		self.counts['nat'] += int(nat.sum())
+		frame = frame.copy()
+		frame['Datetime'] = filled
+		return frame
+
+	def format_values(self, frame:pd.DataFrame) -> pd.DataFrame:
+		"""
+		format_data_columns and check_valid_value for a chunk.
+		"""
+		frame = frame.drop(columns=['TO'], errors='ignore')
+		for column, prefix in [('Temp', 'T='), ('Hum', 'H=')]:
+			if frame[column].dtype == object:
+				frame[column] = pd.to_numeric(frame[column].str.replace(prefix, ''), errors='coerce')
+			self.counts['nan'] += int(frame[column].isna().sum())
+		for column, found in ValueRules(self.rules).check(frame).items():
+			self.counts['invalid_values'] += len(found['range'])
+			frame[column] = ValueRules.replace(frame[column], found['range'])
+		return frame
+
+	def interpolate_values(self, frame:pd.DataFrame, eof:bool) -> pd.DataFrame:
+		"""
+		interpolate_nan for a chunk. A NaN run at the end of the chunk waits for its next valid value. The chunk is cut
+		after a row where no NaN run of any column is open, so a run of one column is never split at the end of another.
+		"""
+		if self.pending_values is not None:
+			frame = pd.concat([self.pending_values, frame])
+		self.pending_values = None
+		end = len(frame)
+		if not eof:
+			nan = {column: frame[column].isna().to_numpy() for column in ['Temp', 'Hum']}
+			while end:
+				cut = end
+				for column in ['Temp', 'Hum']:
+					if nan[column][end - 1]:
+						valid = np.flatnonzero(~nan[column][:end])
+						if len(valid):
+							cut = min(cut, int(valid[-1]) + 1)
+						elif (self.previous_values is not None) and not np.isnan(self.previous_values[column]):
+							cut = 0
+				if cut == end:
+					break
+				end = cut
+			self.pending_values = frame.iloc[end:] if end < len(frame) else None
+			frame = frame.iloc[:end]
+		if not len(frame):
+			return frame
+		frame = frame.copy()
+		datetimes = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+		if self.previous_values is not None:
+			datetimes = np.concatenate(([self.previous_time], datetimes))
+		for column in ['Temp', 'Hum']:
+			values = frame[column].to_numpy(dtype='float64')
+			if self.previous_values is not None:
+				values = np.concatenate(([self.previous_values[column]], values))
+			values = interpolate_gaps(values, datetimes, self.interpolation, self.max_gap)[len(values) - len(frame):]
+			if self.max_gap is not None:
+				self.counts['gap_nan'] += int(np.isnan(values).sum())
+			frame[column] = values.astype(frame[column].dtype)
+		self.previous_values = {column: frame[column].iloc[-1] for column in ['Temp', 'Hum']}
+		self.previous_time = datetimes[-1]
+		return frame
+
+###### Outliers ######
+class OutlierEngine(object):
+	"""
+	Outlier detection and replacement for a list of numeric columns. fit computes the statistics of each column once:
+	limits from the Interquartile Range (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR), the Standard deviation (mean -/+ n_std * SD)
+	or the Median absolute deviation (median -/+ n_std * 1.4826 * MAD) and the replacement value. apply finds the
+	outliers with one comparison per column and removes the rows or replaces the values with the mean, median, mode
+	(smallest if there are several) or the upper/lower limit.
+	With a time-based window (e.g. '1h') the limits, mean and median are computed per row over the centered window of
+	the Datetime column instead of the whole file. The windows are updated incrementally (pandas rolling), so the
+	runtime stays linear in the number of rows. The mode is always computed over the whole file.
+	"""
+	replacements = ['remove', 'mean', 'median', 'mode', 'limit', 'ignore']
+	methods = ['iqr', 'std', 'mad']
+
+	def __init__(self, method:str, replacement:str, n_std:float=3, columns:list=['Temp', 'Hum'], window:str=None, estimator:str='exact', threads:int=1) -> None:
+		"""
+		Constructor for the OutlierEngine class. method: 'iqr', 'std' or 'mad'. window: pandas offset (e.g. '1h') or None.
+		estimator: 'exact' or 'tdigest' (see ESTIMATORS). threads: columns summarized at the same time by fit.
+		"""
+		if replacement not in self.replacements:
+			raise ValueError(f'Unknown outlier replacement: {replacement}')
+		if method not in self.methods:
+			raise ValueError(f'Unknown outlier method: {method}')
+		if estimator not in ESTIMATORS:
+			raise ValueError(f'Unknown estimator: {estimator}')
+		self.estimator = estimator
+		self.method = method
+		self.replacement = replacement
+		self.n_std = n_std
+		self.columns = list(columns)
+		self.window = pd.tseries.frequencies.to_offset(window) if window else None
+		self.window_name = window
+		self.threads = threads
+		self.limits = {}
+
+	def fit(self, data) -> 'OutlierEngine':
+		"""
+		Computes limits and replacement value of each column over the whole data. data: Dataframe or structured array (e.g. memmap).
+		"""
+		if self.estimator == 'tdigest':
+			return self.fit_summary(self.sketch(data))
+		summarize = lambda column: self.summarize(pd.Series(np.asarray(data[column])))
+		if (self.threads > 1) and (len(self.columns) > 1):
+			# the sorts and reductions of NumPy release the GIL, so the columns are summarized in parallel
+			with ThreadPoolExecutor(max_workers=min(self.threads, len(self.columns))) as pool:
+				return self.fit_summary(dict(zip(self.columns, pool.map(summarize, self.columns))))
+		return self.fit_summary({column: summarize(column) for column in self.columns})
+
+	def sketch(self, data, block:int=1 << 20) -> dict:
+		"""
+		Statistics of each column with bounded memory (estimator 'tdigest'). data is read in blocks of rows: mean and SD are
+		combined from the blocks (Chan et al.), quartiles, median and MAD come from TDigests and the mode from RunningStats.
+		"""
+		summaries = {}
+		for column in self.columns:
+			blocks = lambda: (np.asarray(data[column][start:start + block], dtype='float64') for start in range(0, len(data), block))
+			digest = TDigest()
+			count, mean, m2 = 0, 0.0, 0.0
+			for values in blocks():
+				values = values[~np.isnan(values)]
+				if not len(values):
+					continue
+				digest.update(values)
+				block_mean = values.mean()
+				delta = block_mean - mean
+				total = count + len(values)
+				mean += delta * len(values) / total
+				m2 += ((values - block_mean) ** 2).sum() + delta ** 2 * count * len(values) / total
+				count = total
+			summary = {
+				'mean': mean if count else np.nan,
+				'sd': np.sqrt(m2 / (count - 1)) if count > 1 else np.nan,
+				'q1': digest.quantile(0.25),
+				'q3': digest.quantile(0.75),
+				'median': digest.quantile(0.5),
+			}
+			if self.method == 'mad':
+				deviations = TDigest()
+				for values in blocks():
+					deviations.update(np.abs(values - summary['median']))
+				summary['mad'] = deviations.quantile(0.5)
+			if self.replacement == 'mode':
+				table = RunningStats([column])
+				for values in blocks():
+					table.update(pd.DataFrame({column: values}))
+				summary['mode'] = table.summary(column)['mode']
+			summaries[column] = summary
+		return summaries
+
+	def summarize(self, values:pd.Series) -> dict:
+		"""
+		Statistics of a column needed by method and replacement.
+		"""
+		summary = {'mean': values.mean(), 'sd': values.std()}
+		if self.method == 'iqr':
+			summary['q1'], summary['q3'] = values.quantile([0.25, 0.75])
+		if (self.method == 'mad') or (self.replacement == 'median'):
+			summary['median'] = values.median()
+		if self.method == 'mad':
+			summary['mad'] = (values - summary['median']).abs().median()
+		if self.replacement == 'mode':
+			mode = values.mode()
+			summary['mode'] = mode.iloc[0] if len(mode) else np.nan
+		return summary
+
+	def fit_summary(self, summaries:dict) -> 'OutlierEngine':
+		"""
+		Computes limits and replacement value of each column from its statistics (summarize or RunningStats.summary).
+		"""
+		for column in self.columns:
+			summary = summaries[column]
+			limits = {'mean': summary['mean'], 'sd': summary['sd']}
+			if self.method == 'iqr':
+				q1, q3 = summary['q1'], summary['q3']
+				limits['lower'] = q1 - 1.5 * (q3 - q1)
+				limits['upper'] = q3 + 1.5 * (q3 - q1)
+			elif self.method == 'mad':
+				limits['lower'] = summary['median'] - (self.n_std * 1.4826 * summary['mad'])
+				limits['upper'] = summary['median'] + (self.n_std * 1.4826 * summary['mad'])
+			else:
+				limits['lower'] = limits['mean'] - (self.n_std * limits['sd'])
+				limits['upper'] = limits['mean'] + (self.n_std * limits['sd'])
+			if self.replacement in ['mean', 'median', 'mode']:
+				limits['replacement'] = summary[self.replacement]
+			self.limits[column] = limits
+		return self
+
+	def rolling(self, frame:pd.DataFrame) -> dict:
+		"""
+		Lower/upper limit and replacement value of every row over the centered time window. Returns arrays per column.
+		Rows are ordered by Datetime for the window, rows with NaT get no limits.
+		"""
+		times = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+		rows = np.flatnonzero(~np.isnat(times))
+		rows = rows[np.argsort(times[rows], kind='stable')]
+		index = pd.DatetimeIndex(times[rows])
+		bounds = {}
+		for column in self.columns:
+			series = pd.Series(frame[column].to_numpy(dtype='float64')[rows], index=index)
+			window = series.rolling(self.window, center=True, min_periods=1)
+			result = {}
+			if self.method == 'iqr':
+				q1, q3 = window.quantile(0.25), window.quantile(0.75)
+				result['lower'], result['upper'] = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+			elif self.method == 'mad':
+				median = window.median()
+				mad = 1.4826 * (series - median).abs().rolling(self.window, center=True, min_periods=1).median()
+				result['lower'], result['upper'] = median - (self.n_std * mad), median + (self.n_std * mad)
+				result['median'] = median
+			else:
+				mean, sd = window.mean(), window.std()
+				result['lower'], result['upper'] = mean - (self.n_std * sd), mean + (self.n_std * sd)
+				result['mean'] = mean
+			if self.replacement == 'mean':
+				result['replacement'] = result['mean'] if 'mean' in result else window.mean()
+			elif self.replacement == 'median':
+				result['replacement'] = result['median'] if 'median' in result else window.median()
+			elif self.replacement == 'mode':
+				result['replacement'] = self.limits[column]['replacement']
+			bounds[column] = {}
+			for key in ['lower', 'upper', 'replacement']:
+				if key in result and np.ndim(result[key]):
+					bounds[column][key] = np.full(len(frame), np.nan)
+					bounds[column][key][rows] = result[key].to_numpy()
+				elif key in result:
+					bounds[column][key] = result[key]
+		return bounds
+
+	def bounds(self, frame:pd.DataFrame) -> dict:
+		"""
+		Lower/upper limit and replacement value per column: scalars of fit or arrays of the rolling window.
+		"""
+		if self.window is not None:
+			return self.rolling(frame)
+		return {column: {key: limits[key] for key in ['lower', 'upper', 'replacement'] if key in limits} for column, limits in self.limits.items()}
+
+	def window_bounds(self, data, start:int, stop:int, margin:int) -> dict:
+		"""
+		Bounds of the rows start:stop of data (e.g. the memmap of the chunked mode), computed with margin rows before and after.
+		"""
+		context = pd.DataFrame(data[max(start - margin, 0):stop + margin])
+		offset = start - max(start - margin, 0)
+		bounds = self.rolling(context)
+		return {column: {key: value[offset:offset + (min(stop, len(data)) - start)] if np.ndim(value) else value for key, value in items.items()} for column, items in bounds.items()}
+
+	def masks(self, frame:pd.DataFrame, bounds:dict=None) -> dict:
+		"""
+		Boolean arrays below lower limit and above upper limit per column (NaN is no outlier).
+		"""
+		bounds = self.bounds(frame) if bounds is None else bounds
+		masks = {}
+		for column in self.columns:
+			values = frame[column].to_numpy(dtype='float64')
+			masks[column] = (values < bounds[column]['lower'], values > bounds[column]['upper'])
+		return masks
+
+	def apply(self, frame:pd.DataFrame, bounds:dict=None) -> tuple:
+		"""
+		Removes/replaces the outliers of frame. Returns the new Dataframe and the index labels of the outliers per column.
+		"""
+		bounds = self.bounds(frame) if bounds is None else bounds
+		masks = self.masks(frame, bounds)
+		outliers = {column: frame.index[low | high] for column, (low, high) in masks.items()}
+		if self.replacement == 'remove':
+			keep = ~np.logical_or.reduce([low | high for low, high in masks.values()]) if masks else np.ones(len(frame), dtype=bool)
+			frame = frame[keep]
+		elif self.replacement != 'ignore':
+			frame = frame.copy()
+			for column, (low, high) in masks.items():
+				values = frame[column].to_numpy(dtype='float64', copy=True)
+				if self.replacement == 'limit':
+					values[low] = self.pick(bounds[column]['lower'], low)
+					values[high] = self.pick(bounds[column]['upper'], high)
+				else:
+					values[low | high] = self.pick(bounds[column]['replacement'], low | high)
+				frame[column] = values.astype(frame[column].dtype, copy=False)
+		return frame, outliers
+
+	def summary(self, column:str) -> str:
+		"""
+		Statistical data of a column for the detailed logs.
+		"""
+		limits = self.limits[column]
+		if self.window is not None:
+			return f'{column}: mean {limits["mean"]}, SD {limits["sd"]}, limits per row over a rolling window of {self.window_name}'
+		return f'{column}: mean {limits["mean"]}, SD {limits["sd"]}, upper limit {limits["upper"]}, lower limit {limits["lower"]}'
+
+	@staticmethod
+	def pick(value, mask:np.ndarray):
+		"""
+		Scalar value or the masked rows of an array value.
+		"""
+		return value[mask] if np.ndim(value) else value
+
+class RunningStats(object):
+	"""
+	Statistics of numeric columns over rows that arrive in parts (follow mode). Keeps a table of the distinct values and
+	their counts per column, from which mean, SD, quartiles, median, MAD and mode are computed exactly. The raw sensor
+	values have a fixed resolution, but interpolated values (and mean/median replacements) are new float values, so a
+	table grows with every distinct value: up to one entry per row for files with many NaN runs.
+	"""
+
+	def __init__(self, columns:list=['Temp', 'Hum']) -> None:
+		"""
+		Constructor for the RunningStats class.
+		"""
+		self.columns = list(columns)
+		self.tables = {column: (np.empty(0, dtype='float64'), np.empty(0, dtype='int64')) for column in self.columns}
+
+	def update(self, frame:pd.DataFrame) -> None:
+		"""
+		Adds the values of frame (NaN is ignored like in pandas).
+		"""
+		for column in self.columns:
+			values = frame[column].to_numpy(dtype='float64')
+			values = values[~np.isnan(values)]
+			table, counts = self.tables[column]
+			table, inverse = np.unique(np.concatenate((table, values)), return_inverse=True)
+			counts = np.bincount(inverse.ravel(), weights=np.concatenate((counts, np.ones(len(values), dtype='int64'))), minlength=len(table)).astype('int64')
+			self.tables[column] = (table, counts)
+
+	@staticmethod
+	def quantile(values:np.ndarray, counts:np.ndarray, q:float) -> float:
+		"""
+		Quantile with linear interpolation (like pandas) of sorted values with counts.
+		"""
+		n = int(counts.sum())
+		if n == 0:
+			return np.nan
+		position = (n - 1) * q
+		cumulative = np.cumsum(counts)
+		lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+		upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+		return lower + (upper - lower) * (position - np.floor(position))
+
+	def summary(self, column:str) -> dict:
+		"""
+		Mean, SD, quartiles, median, MAD and mode (smallest) of a column for OutlierEngine.fit_summary.
+		"""
+		values, counts = self.tables[column]
+		n = int(counts.sum())
+		if n == 0:
+			return {key: np.nan for key in ['mean', 'sd', 'q1', 'q3', 'median', 'mad', 'mode']}
+		mean = (values * counts).sum() / n
+		median = self.quantile(values, counts, 0.5)
+		deviations = np.abs(values - median)
+		order = np.argsort(deviations, kind='stable')
+		return {
+			'mean': mean,
+			'sd': np.sqrt((counts * (values - mean) ** 2).sum() / (n - 1)) if n > 1 else np.nan,
+			'q1': self.quantile(values, counts, 0.25),
+			'q3': self.quantile(values, counts, 0.75),
+			'median': median,
+			'mad': self.quantile(deviations[order], counts[order], 0.5),
+			'mode': values[np.argmax(counts)],
+		}
+
+###### Follow mode ######
+class FollowCheckpoint(object):
+	"""
+	State of the follow mode between two runs, pickled to one file: byte offset of the first line not read yet, hash of the
+	first bytes of the input-file, options, the attributes of the ChunkCleaner (first valid timestamp, median timegap,
+	anchors and rows held back), the keys of both duplicate windows, the value tables of the RunningStats and the number
+	of rows written. A checkpoint is only used for the same input-file (not truncated or replaced) and the same options.
+	"""
+	version = 1
+	head_bytes = 1 << 16
+
+	def __init__(self, path:str) -> None:
+		"""
+		Constructor for the FollowCheckpoint class.
+		"""
+		self.path = path
+
+	def head(self, path:str, length:int) -> str:
+		"""
+		blake2b hash of the first length bytes (at most head_bytes) of the input-file.
+		"""
+		with open(path, 'rb') as file:
+			return hashlib.blake2b(file.read(min(length, self.head_bytes)), digest_size=16).hexdigest()
+
+	def load(self) -> dict:
+		"""
+		Returns the saved state or None.
+		"""
+		try:
+			with open(self.path, 'rb') as file:
+				state = pickle.load(file)
+		except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+			return None
+		return state if isinstance(state, dict) and state.get('version') == self.version else None
+
+	def mismatch(self, state:dict, path:str, options:dict) -> str:
+		"""
+		Reason why the state cannot be continued with the input-file and options or None.
+		"""
+		if state['options'] != options:
+			return 'options changed'
+		if os.path.getsize(path) < state['offset']:
+			return 'input-file truncated'
+		if self.head(path, state['offset']) != state['head']:
+			return 'input-file replaced'
+		return None
+
+	def store(self, state:dict, path:str) -> None:
+		"""
+		Writes the state (atomically) after the new rows of path up to state['offset'] were appended to the output-file.
+		"""
+		state = dict(state, version=self.version, head=self.head(path, state['offset']))
+		directory = os.path.dirname(os.path.abspath(self.path))
+		with tempfile.NamedTemporaryFile('wb', dir=directory, prefix='.checkpoint-', delete=False) as file:
+			pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(file.name, self.path)
+
+###### Output ######
+OUTPUT_FORMATS = ['csv', 'csv.gz', 'csv.zst', 'parquet', 'feather']
+
+def format_csv(frame:pd.DataFrame, header:bool=True, date_format:str=None) -> str:
+	"""
+	CSV text of frame like to_csv(index=False). Float columns and Datetime columns in whole seconds are formatted with
+	NumPy, also if all timestamps of frame are at midnight (to_csv would write only the dates, so the format of a row would
+	depend on the other rows of its chunk). Other columns, Datetime columns with fractions of seconds and an explicit
+	date_format are written by to_csv.
+	"""
+	columns = []
+	for column in frame.columns:
+		values = frame[column].to_numpy()
+		if values.dtype.kind == 'f':
+			text = values.astype(str).astype(object)
+			text[np.isnan(values)] = ''
+		elif (values.dtype.kind == 'M') and (date_format is None):
+			nat = np.isnat(values)
+			valid = values[~nat].astype('datetime64[ns]').view('int64')
+			if (not len(valid)) or (valid % 1000000000).any():
+				return frame.to_csv(index=False, header=header, lineterminator='\n')
+			# YYYY-MM-DDTHH:MM:SS with a space instead of T
+			chars = np.datetime_as_string(values, unit='s').astype('U19').view('U1').reshape(-1, 19).copy()
+			chars[:, 10] = ' '
+			text = chars.view('U19').ravel().astype(object)
+			text[nat] = ''
+		else:
+			return frame.to_csv(index=False, header=header, date_format=date_format, lineterminator='\n')
+		columns.append(text)
+	lines = [','.join(frame.columns)] if header else []
+	lines.extend(map(','.join, zip(*columns)))
+	return '\n'.join(lines) + '\n' if lines else ''
+
+class OutputWriter(object):
+	"""
+	Writes the output-file in parts (the whole Dataframe or the chunks of the chunked and follow mode) without keeping them.
+	Formats: CSV (plain, gzip or zstd compressed), Parquet and Feather (Arrow IPC file), chosen by output_format or by the
+	extension of the output-file. With partition the output-file is a directory with one subdirectory per day of the
+	Datetime column (date=YYYY-MM-DD) and part-files in it. With index the rows are written per period of the TimeIndex
+	and the index is saved when the writer is closed.
+	"""
+	extensions = {'.gz': 'csv.gz', '.zst': 'csv.zst', '.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+	suffixes = {'csv': '.csv', 'csv.gz': '.csv.gz', 'csv.zst': '.csv.zst', 'parquet': '.parquet', 'feather': '.feather'}
+
+	def __init__(self, path:str, output_format:str=None, partition:bool=False, date_format:str=None, append:bool=False, index:'TimeIndex'=None) -> None:
+		"""
+		Constructor for the OutputWriter class. index: new TimeIndex or, with append, the index of the output-file.
+		"""
+		self.path = path
+		self.format = output_format or self.detect(path)
+		self.partition = partition
+		self.date_format = date_format
+		self.append = append
+		# only needed for Parquet and Feather output-files / zstd compressed output-files
+		self.pyarrow = import_optional('pyarrow.parquet') and import_optional('pyarrow') if self.format in ['parquet', 'feather'] else None
+		self.zstandard = import_optional('zstandard') if self.format == 'csv.zst' else None
+		if (self.format in ['parquet', 'feather']) and (self.pyarrow is None):
+			raise ImportError(f'Output format {self.format} needs pyarrow')
+		if (self.format == 'csv.zst') and (self.zstandard is None):
+			raise ImportError(f'Output format {self.format} needs zstandard')
+		self.file = None
+		self.header = not append
+		self.schema = None
+		self.day = None
+		self.parts = {}
+		self.cleared = False
+		self.rows = 0
+		self.index = index
+		if (index is not None) and not append:
+			index.format = self.format
+			index.date_format = date_format
+		# part-file and rows written to it, for the index
+		self.part = ''
+		self.file_rows = 0
+
+	@classmethod
+	def detect(cls, path:str) -> str:
+		"""
+		Output format from the extension of path (default: csv).
+		"""
+		return cls.extensions.get(os.path.splitext(path)[1].lower(), 'csv')
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.close()
+		if (self.index is not None) and (exc[0] is None):
+			self.index.save(self.path)
+
+	def write(self, frame:pd.DataFrame) -> None:
+		"""
+		Writes the rows of frame after the rows written before.
+		"""
+		if self.schema is None and self.format in ['parquet', 'feather']:
+			self.schema = self.pyarrow.Schema.from_pandas(frame, preserve_index=False)
+		self.rows += len(frame)
+		if not self.partition:
+			if self.file is None:
+				self.file = self.open(self.path)
+			self.write_part(frame)
+			return
+		if not self.cleared:
+			self.clear()
+		# consecutive rows of the same day go to the same part-file
+		days = frame['Datetime'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+		starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1]))) if len(days) else np.empty(0, dtype='int64')
+		for start, stop in zip(starts, np.append(starts[1:], len(days))):
+			day = str(days[start])
+			if day != self.day:
+				self.close()
+				part = self.parts.get(day, 0)
+				self.parts[day] = part + 1
+				directory = os.path.join(self.path, f'date={day}')
+				os.makedirs(directory, exist_ok=True)
+				self.file = self.open(os.path.join(directory, f'part-{part}{self.suffixes[self.format]}'))
+				self.header = True
+				self.day = day
+			self.write_part(frame.iloc[start:stop])
+
+	def clear(self) -> None:
+		"""
+		Creates the directory of a partitioned output-file and removes the day directories of a previous run.
+		"""
+		os.makedirs(self.path, exist_ok=True)
+		for directory in glob.glob(os.path.join(glob.escape(self.path), 'date=*')):
+			shutil.rmtree(directory, ignore_errors=True)
+		self.cleared = True
+
+	def open(self, path:str):
+		"""
+		Opens a file (CSV) or a writer (Parquet, Feather).
+		"""
+		mode = 'at' if self.append else 'wt'
+		self.part = os.path.relpath(path, self.path) if self.partition else ''
+		self.file_rows = self.index.file_rows(self.part) if (self.index is not None) and self.append else 0
+		if self.format == 'csv':
+			return open(path, mode, encoding='utf-8')
+		if self.format == 'csv.gz':
+			# level 6 like the gzip command, level 9 is about 5 times slower for 5 % smaller files
+			return gzip.open(path, mode, compresslevel=6, encoding='utf-8')
+		if self.format == 'csv.zst':
+			return self.zstandard.open(path, mode, encoding='utf-8')
+		if self.format == 'parquet':
+			return self.pyarrow.parquet.ParquetWriter(path, self.schema)
+		return self.pyarrow.ipc.new_file(path, self.schema, options=self.pyarrow.ipc.IpcWriteOptions(compression='lz4'))
+
+	def write_part(self, frame:pd.DataFrame) -> None:
+		"""
+		Writes frame to the open file. With an index the rows of each period are written separately and added to the index
+		with their row range and, in plain CSV files, their byte range.
+		"""
+		if self.index is not None:
+			if self.header and (self.format not in ['parquet', 'feather']):
+				self.file.write(format_csv(frame.iloc[:0], True, self.date_format))
+				self.header = False
+			for start, stop in self.index.runs(frame):
+				part = frame.iloc[start:stop]
+				offset = self.file.tell() if self.format == 'csv' else None
+				if self.format in ['parquet', 'feather']:
+					self.file.write_table(self.pyarrow.Table.from_pandas(part, schema=self.schema, preserve_index=False))
+				else:
+					self.file.write(format_csv(part, False, self.date_format))
+				self.index.add(part, self.part, self.file_rows, offset, None if offset is None else self.file.tell() - offset)
+				self.file_rows += len(part)
+			return
+		if self.format in ['parquet', 'feather']:
+			self.file.write_table(self.pyarrow.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+		else:
+			self.file.write(format_csv(frame, self.header, self.date_format))
+			self.header = False
+
+	def close(self) -> None:
+		"""
+		Closes the open file.
+		"""
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+###### Time index ######
+INDEX_PERIODS = ['hour', 'day']
+
+class TimeIndex(object):
+	"""
+	Time index of an output-file, written next to it as JSON (<output-file>.index.json). The rows are split into partitions
+	of consecutive rows of the same hour or day. A partition keeps its first and last timestamp, the file and row range of
+	its rows (and the byte range in plain CSV files) and count/min/max/sum of the value columns, so range queries read only
+	the partitions in the range and aggregates need no row data at all.
+	"""
+	version = 1
+	units = {'hour': 'h', 'day': 'D'}
+
+	def __init__(self, period:str='hour', output_format:str='csv', date_format:str=None) -> None:
+		"""
+		Constructor for the TimeIndex class.
+		"""
+		self.period = period
+		self.format = output_format
+		self.date_format = date_format
+		self.columns = None
+		self.values = None
+		self.partitions = []
+		self.path = None
+
+	@staticmethod
+	def location(path:str) -> str:
+		"""
+		Path of the index of the output-file (or partition directory) path.
+		"""
+		return f'{os.path.normpath(path)}.index.json'
+
+	@staticmethod
+	def file_path(path:str, file:str) -> str:
+		"""
+		Path of a file of the index: the output-file itself ('') or a part-file of a partitioned output-file.
+		"""
+		return os.path.join(path, file) if file else path
+
+	def runs(self, frame:pd.DataFrame) -> list:
+		"""
+		(start, stop) of the consecutive rows of frame in the same period.
+		"""
+		keys = frame['Datetime'].to_numpy(dtype='datetime64[ns]').astype(f'datetime64[{self.units[self.period]}]').view('int64')
+		starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.empty(0, dtype='int64')
+		return list(zip(starts.tolist(), np.append(starts[1:], len(keys)).tolist()))
+
+	def add(self, frame:pd.DataFrame, file:str, row:int, offset:int=None, length:int=None) -> None:
+		"""
+		Adds the rows of one run (runs) written to file at row, in plain CSV files at the byte offset with length bytes. A run
+		that continues the last partition (the next chunk of the chunked mode) is merged into it.
+		"""
+		if not len(frame):
+			return
+		if self.columns is None:
+			self.columns = list(frame.columns)
+			self.values = [column for column in frame.columns if (column != 'Datetime') and (frame[column].dtype.kind in 'fiu')]
+		datetimes = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+		nat = np.isnat(datetimes)
+		valid = datetimes[~nat]
+		partition = {'period': None, 'start': None, 'end': None, 'file': file, 'row': row, 'rows': len(frame), 'offset': offset, 'length': length,
+			'sorted': bool((not nat.any()) and (valid[1:] >= valid[:-1]).all()), 'stats': {}}
+		if len(valid):
+			partition['period'] = str(valid[0].astype(f'datetime64[{self.units[self.period]}]'))
+			partition['start'] = pd.Timestamp(valid.min()).isoformat()
+			partition['end'] = pd.Timestamp(valid.max()).isoformat()
+		for column in self.values:
+			values = frame[column].to_numpy(dtype='float64')
+			values = values[~np.isnan(values)]
+			partition['stats'][column] = {'count': len(values), 'min': float(values.min()) if len(values) else None,
+				'max': float(values.max()) if len(values) else None, 'sum': float(values.sum())}
+		last = self.partitions[-1] if self.partitions else None
+		if (last is not None) and (last['file'] == file) and (last['period'] is not None) and (last['period'] == partition['period']) and (last['row'] + last['rows'] == row) and ((offset is None) or (last['offset'] + last['length'] == offset)):
+			self.merge(last, partition)
+		else:
+			self.partitions.append(partition)
+
+	@staticmethod
+	def merge(last:dict, partition:dict) -> None:
+		"""
+		Merges partition into last, the partition before it in the same file and period.
+		"""
+		last['sorted'] = last['sorted'] and partition['sorted'] and (np.datetime64(last['end']) <= np.datetime64(partition['start']))
+		last['start'] = min(last['start'], partition['start'], key=np.datetime64)
+		last['end'] = max(last['end'], partition['end'], key=np.datetime64)
+		last['rows'] += partition['rows']
+		if last['offset'] is not None:
+			last['length'] += partition['length']
+		for column, stats in partition['stats'].items():
+			merged = last['stats'][column]
+			for key, pick in [('min', min), ('max', max)]:
+				merged[key] = pick(value for value in [merged[key], stats[key]] if value is not None) if (merged[key] is not None) or (stats[key] is not None) else None
+			merged['count'] += stats['count']
+			merged['sum'] += stats['sum']
+
+	def file_rows(self, file:str) -> int:
+		"""
+		Number of rows of file in the index (rows written before an appending OutputWriter).
+		"""
+		return sum(partition['rows'] for partition in self.partitions if partition['file'] == file)
+
+	def save(self, path:str) -> None:
+		"""
+		Writes the index of the output-file path (atomically) with the size and modification time of its files.
+		"""
+		files = {}
+		for file in sorted({partition['file'] for partition in self.partitions}):
+			stat = os.stat(self.file_path(path, file))
+			files[file] = [stat.st_size, stat.st_mtime_ns]
+		data = {'version': self.version, 'period': self.period, 'format': self.format, 'date_format': self.date_format,
+			'columns': self.columns, 'values': self.values, 'files': files, 'partitions': self.partitions}
+		location = self.location(path)
+		with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(location)), prefix='.index-', suffix='.json', delete=False) as file:
+			json.dump(data, file)
+		os.replace(file.name, location)
+		self.path = path
+
+	@classmethod
+	def load(cls, path:str) -> 'TimeIndex':
+		"""
+		Index of the output-file path. Raises ValueError if there is no index or a file was changed after it was written.
+		"""
+		try:
+			with open(cls.location(path)) as file:
+				data = json.load(file)
+		except (OSError, ValueError):
+			raise ValueError(f'No index of the output-file: {path}')
+		if (not isinstance(data, dict)) or (data.get('version') != cls.version):
+			raise ValueError(f'No index of the output-file: {path}')
+		for file, (size, mtime) in data['files'].items():
+			try:
+				stat = os.stat(cls.file_path(path, file))
+			except OSError:
+				raise ValueError(f'File of the index is missing: {cls.file_path(path, file)}')
+			if (stat.st_size != size) or (stat.st_mtime_ns != mtime):
+				raise ValueError(f'Index is older than the output-file: {cls.file_path(path, file)}')
+		index = cls(data['period'], data['format'], data['date_format'])
+		index.columns = data['columns']
+		index.values = data['values']
+		index.partitions = data['partitions']
+		index.path = path
+		return index
+
+	@staticmethod
+	def bound(value) -> np.datetime64:
+		"""
+		Timestamp (string, datetime or pd.Timestamp) as datetime64[ns], None stays None.
+		"""
+		return None if value is None else np.datetime64(pd.Timestamp(value).to_datetime64(), 'ns')
+
+	def select(self, start=None, end=None) -> list:
+		"""
+		Partitions with rows in [start, end). Partitions with only NaT are never selected.
+		"""
+		start, end = self.bound(start), self.bound(end)
+		starts = np.array([partition['start'] for partition in self.partitions], dtype='datetime64[ns]')
+		ends = np.array([partition['end'] for partition in self.partitions], dtype='datetime64[ns]')
+		selected = ~np.isnat(starts)
+		if start is not None:
+			selected &= ends >= start
+		if end is not None:
+			selected &= starts < end
+		return [self.partitions[position] for position in np.flatnonzero(selected)]
+
+	def aggregates(self, start=None, end=None) -> pd.DataFrame:
+		"""
+		count/min/max/mean of the value columns per partition with rows in [start, end), only from the index. complete is False
+		for partitions that also have rows outside the range, their aggregates include these rows (query reads the exact rows).
+		"""
+		bounds = self.bound(start), self.bound(end)
+		rows = []
+		for partition in self.select(start, end):
+			row = {'period': partition['period'], 'start': partition['start'], 'end': partition['end'], 'rows': partition['rows'],
+				'complete': ((bounds[0] is None) or (np.datetime64(partition['start']) >= bounds[0])) and ((bounds[1] is None) or (np.datetime64(partition['end']) < bounds[1]))}
+			for column in self.values or []:
+				stats = partition['stats'][column]
+				row[f'{column}_count'] = stats['count']
+				row[f'{column}_min'] = np.nan if stats['min'] is None else stats['min']
+				row[f'{column}_max'] = np.nan if stats['max'] is None else stats['max']
+				row[f'{column}_mean'] = stats['sum'] / stats['count'] if stats['count'] else np.nan
+			rows.append(row)
+		columns = ['period', 'start', 'end', 'rows', 'complete'] + [f'{column}_{key}' for column in self.values or [] for key in ['count', 'min', 'max', 'mean']]
+		frame = pd.DataFrame(rows, columns=columns)
+		frame['start'] = pd.to_datetime(frame['start'])
+		frame['end'] = pd.to_datetime(frame['end'])
+		return frame
+
+	def query(self, start=None, end=None, columns:list=None) -> pd.DataFrame:
+		"""
+		Rows of the output-file with start <= Datetime < end (columns: value columns, Datetime is always included). Reads only
+		the partitions with rows in the range and finds the rows of a partition by a binary search of its sorted Datetime
+		column (a mask if it is not sorted or has NaT).
+		"""
+		start, end = self.bound(start), self.bound(end)
+		selected = self.select(start, end)
+		frames = []
+		for file in dict.fromkeys(partition['file'] for partition in selected):
+			partitions = [partition for partition in selected if partition['file'] == file]
+			for partition, frame in zip(partitions, self.read(file, partitions)):
+				datetimes = frame['Datetime'].to_numpy(dtype='datetime64[ns]')
+				if partition['sorted']:
+					first = np.searchsorted(datetimes, start, side='left') if start is not None else 0
+					stop = np.searchsorted(datetimes, end, side='left') if end is not None else len(datetimes)
+					frames.append(frame.iloc[first:stop])
+				else:
+					mask = ~np.isnat(datetimes)
+					if start is not None:
+						mask &= datetimes >= start
+					if end is not None:
+						mask &= datetimes < end
+					frames.append(frame[mask])
+		frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column == 'Datetime' else 'float64') for column in self.columns or ['Datetime']})
+		if columns:
+			frame = frame[[column for column in frame.columns if (column == 'Datetime') or (column in columns)]]
+		return frame
+
+	def read(self, file:str, partitions:list) -> list:
+		"""
+		Rows of the partitions of one file: the byte ranges of a plain CSV file, the row groups (Parquet) or record batches
+		(Feather) with their rows, in compressed CSV files the rows up to the last partition.
+		"""
+		path = self.file_path(self.path, file)
+		if self.format == 'csv':
+			frames = []
+			with open(path, 'rb') as handle:
+				for partition in partitions:
+					handle.seek(partition['offset'])
+					frames.append(self.parse_csv(io.BytesIO(handle.read(partition['length'])), header=None, names=self.columns))
+			return frames
+		first = min(partition['row'] for partition in partitions)
+		last = max(partition['row'] + partition['rows'] for partition in partitions)
+		if self.format in ['parquet', 'feather']:
+			pyarrow = import_optional('pyarrow.parquet') and import_optional('pyarrow')
+			if pyarrow is None:
+				raise ImportError(f'Index of format {self.format} needs pyarrow')
+			source = pyarrow.parquet.ParquetFile(path) if self.format == 'parquet' else pyarrow.ipc.open_file(path)
+			count = source.num_row_groups if self.format == 'parquet' else source.num_record_batches
+			sizes = [source.metadata.row_group(group).num_rows for group in range(count)] if self.format == 'parquet' else [source.get_batch(batch).num_rows for batch in range(count)]
+			offsets = np.concatenate(([0], np.cumsum(sizes, dtype='int64')))
+			groups = [group for group in range(count) if (offsets[group + 1] > first) and (offsets[group] < last)]
+			begin = int(offsets[groups[0]]) if groups else first
+			if self.format == 'parquet':
+				frame = source.read_row_groups(groups).to_pandas()
+			else:
+				frame = pyarrow.Table.from_batches([source.get_batch(batch) for batch in groups], schema=source.schema).to_pandas()
+		else:
+			frame = self.parse_csv(path, compression={'csv.gz': 'gzip', 'csv.zst': 'zstd'}[self.format], skiprows=range(1, first + 1), nrows=last - first)
+			begin = first
+		return [frame.iloc[partition['row'] - begin:partition['row'] - begin + partition['rows']].reset_index(drop=True) for partition in partitions]
+
+	def parse_csv(self, source, **options) -> pd.DataFrame:
+		"""
+		Rows of a CSV output-file with Datetime parsed with the date format of the output-file.
+		"""
+		frame = pd.read_csv(source, **options)
+		frame['Datetime'] = pd.to_datetime(frame['Datetime'], format=self.date_format)
+		return frame
+
+###### Plotting ######
+def minmax_decimate(values, buckets:int) -> tuple:
+	"""
+	Shape-preserving decimation of a line for plotting: the points are split into `buckets` buckets (one per pixel) and the
+	minimum and maximum of each bucket are kept in their order, so spikes stay visible. A bucket of NaN gives one NaN
+	(gap in the line). Returns the positions and the values of the kept points.
+	"""
+	values = np.asarray(values, dtype='float64')
+	n = len(values)
+	if n <= 2 * buckets:
+		return np.arange(n), values
+	size = -(-n // buckets)
+	rows = -(-n // size)
+	matrix = np.full(rows * size, np.nan)
+	matrix[:n] = values
+	matrix = matrix.reshape(rows, size)
+	nan = np.isnan(matrix)
+	low = np.where(nan, np.inf, matrix).argmin(axis=1)
+	high = np.where(nan, -np.inf, matrix).argmax(axis=1)
+	positions = (np.arange(rows)[:, None] * size + np.sort(np.stack((low, high), axis=1), axis=1)).ravel()
+	positions = np.unique(np.minimum(positions, n - 1))
+	return positions, values[positions]
+
+def boxplot_stats(values, label:str) -> dict:
+	"""
+	Statistics of one box for Axes.bxp, computed with NumPy like seaborn/matplotlib draw them: quartiles, whiskers at the
+	last values within 1.5 IQR and the distinct values outside as fliers. None if there are no values.
+	"""
+	values = np.asarray(values, dtype='float64')
+	values = values[~np.isnan(values)]
+	if not len(values):
+		return None
+	q1, median, q3 = np.percentile(values, [25, 50, 75])
+	lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+	inside = (values >= lower) & (values <= upper)
+	return {'label': label, 'q1': q1, 'med': median, 'q3': q3, 'whislo': values[inside].min(), 'whishi': values[inside].max(), 'fliers': np.unique(values[~inside])}
+
+###### Change tracking ######
+class ChangeTracker(object):
+	"""
+	Records the changes of the pipeline stages on the value columns (original values of modified rows, removed rows) after
+	a mark, so that plot_data can rebuild the Dataframe as it was at the mark without keeping copies of it. Records
+	nothing if it is disabled (no plot).
+	"""
+	def __init__(self, columns:list=['Temp', 'Hum'], enabled:bool=True) -> None:
+		self.columns = columns
+		self.enabled = enabled
+		self.marks = []
+		self.changes = []
+
+	def mark(self, name:str) -> None:
+		"""
+		Marks the current state of the Dataframe as name.
+		"""
+		if self.enabled:
+			self.marks.append(name)
+
+	def modified(self, column:str, index:pd.Index, values) -> None:
+		"""
+		Records the original values of column for the index labels that a stage is about to change.
+		"""
+		if self.enabled and self.marks and len(index):
+			self.changes.append((len(self.marks), column, index, np.asarray(values).copy()))
+
+	def record(self, before:pd.DataFrame, after:pd.DataFrame) -> None:
+		"""
+		Records the difference between the Dataframe before and after a stage that returned a new Dataframe: the removed
+		rows and the original values of the modified rows.
+		"""
+		if not (self.enabled and self.marks) or (before is after):
+			return
+		removed = before.index.difference(after.index, sort=False)
+		if len(removed):
+			self.changes.append((len(self.marks), None, removed, before.loc[removed, self.columns]))
+		for column in self.columns:
+			old = before[column].reindex(after.index).to_numpy()
+			new = after[column].to_numpy()
+			changed = (old != new) & ~(pd.isna(old) & pd.isna(new))
+			self.modified(column, after.index[changed], old[changed])
+
+	def view(self, name:str, frame:pd.DataFrame) -> pd.DataFrame:
+		"""
+		Value columns of frame as they were at the mark name: the changes recorded after the mark are undone in reverse order.
+		"""
+		view = frame[self.columns].copy()
+		if name not in self.marks:
+			return view
+		position = self.marks.index(name) + 1
+		restored = False
+		for mark, column, index, values in reversed(self.changes):
+			if mark < position:
+				break
+			if column is None:
+				view = pd.concat([view, values])
+				restored = True
+			else:
+				view.loc[index, column] = values
+		return view.sort_index() if restored else view
+
+###### Profiling ######
+class StageProfiler(object):
+	"""
+	Measures wall time, CPU time, memory and rows in/out of pipeline stages. Peak RSS is the peak of the process so far
+	(resource module, not on Windows). With trace_memory the peak and the change of memory allocated by Python and NumPy
+	during the stage are traced with tracemalloc (slower).
+	"""
+
+	def __init__(self, trace_memory:bool=False) -> None:
+		"""
+		Constructor for the StageProfiler class.
+		"""
+		self.trace_memory = trace_memory
+		self.records = []
+
+	def peak_rss(self) -> float:
+		"""
+		Peak resident set size of the process in MB (None without the resource module).
+		"""
+		if resource is None:
+			return None
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		# bytes on macOS, kilobytes on Linux
+		return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+	def measure(self, name:str, function, rows):
+		"""
+		Calls function() and records the stage. rows() returns the current number of rows.
+		"""
+		if self.trace_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		if self.trace_memory:
+			tracemalloc.reset_peak()
+			traced = tracemalloc.get_traced_memory()[0]
+		record = {'stage': name, 'rows_in': rows()}
+		wall = time.perf_counter()
+		cpu = time.process_time()
+		try:
+			return function()
+		finally:
+			record['wall'] = time.perf_counter() - wall
+			record['cpu'] = time.process_time() - cpu
+			record['rows_out'] = rows()
+			record['peak_rss_mb'] = self.peak_rss()
+			if self.trace_memory:
+				current, peak = tracemalloc.get_traced_memory()
+				record['traced_peak_mb'] = (peak - traced) / 1024**2
+				record['traced_delta_mb'] = (current - traced) / 1024**2
+			self.records.append(record)
+
+	def stop(self) -> None:
+		"""
+		Stops tracing memory.
+		"""
+		if self.trace_memory and tracemalloc.is_tracing():
+			tracemalloc.stop()
+
+	def timings(self) -> dict:
+		"""
+		Wall time per stage name (summed if a stage runs more than once).
+		"""
+		timings = {}
+		for record in self.records:
+			timings[record['stage']] = timings.get(record['stage'], 0) + record['wall']
+		return timings
+
+	def table(self, title:str) -> Table:
+		"""
+		The records as rich Table.
+		"""
+		table = Table(title=title)
+		columns = [('Stage', 'stage', '{}'), ('Wall (s)', 'wall', '{:.4f}'), ('CPU (s)', 'cpu', '{:.4f}'), ('Rows in', 'rows_in', '{}'), ('Rows out', 'rows_out', '{}'), ('Peak RSS (MB)', 'peak_rss_mb', '{:.1f}')]
+		if self.trace_memory:
+			columns += [('Traced peak (MB)', 'traced_peak_mb', '{:.2f}'), ('Traced delta (MB)', 'traced_delta_mb', '{:.2f}')]
+		for header, _, _ in columns:
+			table.add_column(header, justify='left' if header == 'Stage' else 'right', no_wrap=(header == 'Stage'))
+		for record in self.records + [self.total()]:
+			table.add_row(*['' if record.get(key) is None else pattern.format(record[key]) for _, key, pattern in columns])
+		return table
+
+	def total(self) -> dict:
+		"""
+		Sum of wall and CPU time, rows after the last stage, highest peaks.
+		"""
+		if not self.records:
+			return {'stage': 'total'}
+		total = {'stage': 'total', 'wall': sum(record['wall'] for record in self.records), 'cpu': sum(record['cpu'] for record in self.records),
+			'rows_out': self.records[-1]['rows_out'], 'peak_rss_mb': self.records[-1]['peak_rss_mb']}
+		if self.trace_memory:
+			total['traced_peak_mb'] = max(record['traced_peak_mb'] for record in self.records)
+		return total
+
+	def write(self, path:str, info:dict) -> None:
+		"""
+		Writes the records, the total and information about the run and the environment as JSON.
+		"""
+		report = {
+			'created': datetime.now().isoformat(timespec='seconds'),
+			'python': platform.python_version(),
+			'pandas': pd.__version__,
+			'numpy': np.__version__,
+			'platform': platform.platform(),
+			**info,
+			'stages': self.records,
+			'total': self.total(),
+		}
+		with open(path, 'w') as file:
+			json.dump(report, file, indent=2, default=str)
+
+###### Pipeline ######
+class Stage(object):
+	"""
+	A stage of the pipeline: the FileHandler method, the columns and values it reads and writes, the condition under which
+	it runs and its fuse group. name identifies the stage in --skip-stages (drop_duplicates runs twice).
+	"""
+
+	def __init__(self, name:str, method:str=None, reads:list=(), writes:list=(), when=None, fuse:str=None, reader:bool=False, sink:bool=False) -> None:
+		"""
+		Constructor for the Stage class. when(file) decides if the stage is configured. Consecutive stages of the same fuse
+		group run as one pass (FileHandler.fuse_<group>). reader stages are replaced by the parse cache, sink stages write
+		outside the Dataframe (cache, plot, output-file) and always run if configured.
+		"""
+		self.name = name
+		self.method = method or name
+		self.reads = set(reads)
+		self.writes = set(writes)
+		self.when = when
+		self.fuse = fuse
+		self.reader = reader
+		self.sink = sink
+
+VALUES = ['Temp', 'Hum']
+COLUMNS = ['rows', 'Datetime', 'Temp', 'Hum']
+PIPELINE = [
+	Stage('open_file', writes=COLUMNS, reader=True),
+	Stage('rename_columns', reads=COLUMNS, writes=COLUMNS, reader=True),
+	Stage('drop_raw_duplicates', 'drop_duplicates', reads=COLUMNS, writes=['rows'], reader=True), # Firstly to remove all duplicates that have been imported via input-file
+	Stage('create_datetime', reads=['Datetime'], writes=['Datetime'], reader=True),
+	Stage('store_cache', reads=COLUMNS, writes=['cache'], when=lambda file: file.cache is not None, reader=True, sink=True),
+	Stage('get_first_valid_timestamp', reads=['Datetime'], writes=['first_index']),
+	Stage('get_last_valid_timestamp', reads=['Datetime'], writes=['last_index']),
+	Stage('calculate_mean_timegap', reads=['Datetime'], writes=['timegap']),
+	Stage('check_valid_date', reads=['Datetime', 'first_index', 'last_index'], writes=['Datetime']),
+	Stage('replace_nat', reads=['Datetime', 'first_index', 'timegap'], writes=['Datetime']),
+	Stage('format_data_columns', reads=VALUES, writes=VALUES, fuse='values'),
+	Stage('check_valid_value', reads=VALUES, writes=VALUES, fuse='values'),
+	Stage('interpolate_nan', reads=VALUES + ['Datetime'], writes=VALUES),
+	Stage('remove_outliers', reads=COLUMNS, writes=COLUMNS, when=lambda file: not bool(file.no[0])),
+	Stage('drop_duplicates', reads=COLUMNS, writes=['rows']), # Secondly to remove all duplicates that may heve been created due to replace_nat or interpolate_nan
+	Stage('plot_data', reads=COLUMNS, writes=['plot'], when=lambda file: not bool(file.noplot[0]), sink=True),
+	Stage('resample_grid', reads=COLUMNS + ['timegap'], writes=COLUMNS, when=lambda file: bool(file.resample[0])),
+	Stage('export_file', reads=COLUMNS, writes=['output'], when=lambda file: file.outputfile[0] is not None, sink=True),
+]
+
+class Pipeline(object):
+	"""
+	Schedules the stages of a FileHandler: drops the stages that are not configured or skipped, the reader stages after a
+	cache hit and the stages whose writes are not read by a later stage (backwards from the sinks and the columns of the
+	result Dataframe). Consecutive stages of a fuse group are merged into one pass.
+	"""
+
+	def __init__(self, stages:list=PIPELINE, skip:list=()) -> None:
+		"""
+		Constructor for the Pipeline class. skip: names of stages that must not run.
+		"""
+		unknown = sorted(set(skip) - {stage.name for stage in stages})
+		if unknown:
+			raise ValueError(f'Unknown stages: {unknown}')
+		self.stages = stages
+		self.skip = set(skip)
+
+	def schedule(self, file, loaded:bool=False) -> tuple:
+		"""
+		Returns the steps [(name, function)] to run and the names of the skipped stages.
+		"""
+		active = [stage for stage in self.stages if (stage.name not in self.skip) and not (loaded and stage.reader) and ((stage.when is None) or stage.when(file))]
+		# backwards: a stage is needed if a later needed stage (or the result) reads one of its writes
+		live = set(COLUMNS)
+		needed = []
+		for stage in reversed(active):
+			if stage.sink or (stage.writes & live):
+				live |= stage.reads
+				needed.append(stage)
+		needed.reverse()
+		skipped = [stage.name for stage in self.stages if stage not in needed]
+		steps = []
+		position = 0
+		while position < len(needed):
+			stage = needed[position]
+			group = [stage]
+			while stage.fuse and (position + len(group) < len(needed)) and (needed[position + len(group)].fuse == stage.fuse):
+				group.append(needed[position + len(group)])
+			if len(group) > 1:
+				steps.append(('+'.join(member.method for member in group), functools.partial(getattr(file, f'fuse_{stage.fuse}'), [member.method for member in group])))
+			else:
+				steps.append((stage.method, getattr(file, stage.method)))
+			position += len(group)
+		return steps, skipped
 
 ###### FileHandler ######
 class FileHandler(object):
 
-	def __init__(self, args:argparse.Namespace) -> None:
+	def __init__(self, args:argparse.Namespace, console:Console=None, source=None) -> None:
 		"""
-		Constructor for the FileHandler class.
+		Constructor for the FileHandler class. Messages are printed to console (default: a new rich Console).
+		source replaces the input-file with data in memory (see memory_frame), args.inputfile is then only its name.
 		"""
 		# Assume a couple of meaningful defaults here
-		self.inputfile = args.inputfile,
+		self.source = source
+		self.inputfile = args.inputfile if (source is None) or args.inputfile else f'<{type(source).__name__}>',
 		self.outputfile = args.outputfile,
 		self.plot = args.plot,
 		self.iqr = args.iqr,
 		self.std = args.std,
+		self.mad = args.mad,
 		self.no = args.no,
 		self.outlier = args.outlier,
 		self.log = args.log,
 		self.s = args.s,
+		self.window = args.window,
+		self.estimator = args.estimator,
 		self.dataframe = pd.DataFrame(),
 		self.first_index = 0,
 		self.last_index = 0,
 		self.start_time = 0,
 		self.end_time = 0,
 		self.mean_timegap = 0
+		self.valid_span = None
+		self.chunksize = args.chunksize,
+		self.dupwindow = args.dupwindow,
+		self.dup_keys = args.dup_keys,
+		self.dup_keep = args.dup_keep,
+		self.follow = args.follow,
+		self.checkpoint = args.checkpoint,
+		self.parser = args.parser,
+		self.timestamp_format = args.timestamp_format,
+		self.reader = None
+		# the cache is keyed on the path of the input-file
+		self.cache = None if (args.no_cache or (source is not None)) else ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+		self.plotfile = args.plotfile,
+		self.noplot = args.noplot,
+		self.compact = args.compact,
+		self.output_format = args.output_format,
+		self.rules = args.rules,
+		self.partition = args.partition,
+		self.date_format = args.date_format,
+		self.interpolation = args.interpolation,
+		self.max_gap = args.max_gap,
+		self.resample = args.resample,
+		self.skip_stages = args.skip_stages,
+		self.column_threads = args.column_threads,
+		self.time_index = args.time_index,
+		self.value_dtype = 'float32' if args.compact else 'float64'
+		self.changes = ChangeTracker(['Temp', 'Hum'], not bool(args.noplot))
+		self.console = Console() if console is None else console
+		# counts, stage timings and error messages for the run summary
+		self.stats = {}
+		self.errors = []
+		self.profile = args.profile,
+		self.profiler = StageProfiler(trace_memory=bool(args.profile))
+
+	def error(self, message:str) -> None:
+		"""
+		Prints an error message and keeps it for the run summary.
+		"""
+		self.errors.append(message)
+		self.console.print(f'[{errorColor}]{message}')
+
+	def run(self) -> None:
+		"""
+		Runs the whole pipeline (or the chunked mode) and measures each stage. The pipeline stops after the first stage
+		that reports an error, except the sink stages (cache, plot), whose results are not read by the later stages. With
+		--profile the measurements are printed as table and written as JSON.
+		"""
+		rows = lambda: len(self.dataframe) if isinstance(self.dataframe, pd.DataFrame) else 0
+		sinks = {stage.method for stage in PIPELINE if stage.sink}
+		if (self.follow[0] or self.chunksize[0]) and ((self.source is not None) or (self.outputfile[0] is None)):
+			self.error('RUN EXCEPTION - Chunked and follow mode need an input-file and an output-file, not data in memory')
+			stages = []
+		elif self.follow[0]:
+			stages = [('process_new_lines', self.process_new_lines)]
+		elif self.chunksize[0]:
+			stages = [('process_chunks', self.process_chunks)]
+		else:
+			stages = self.schedule(self.profiler.measure('load_cache', self.load_cache, rows))
+		for position, (name, stage) in enumerate(stages):
+			errors = len(self.errors)
+			self.profiler.measure(name, stage, rows)
+			if (len(self.errors) > errors) and (name not in sinks) and (position + 1 < len(stages)):
+				# the later stages would only fail on the missing or incomplete columns
+				self.console.print(f'[{errorColor}]Pipeline stopped after {name}, skipped: {", ".join(name for name, _ in stages[position + 1:])}')
+				break
+		if stages and not (self.chunksize[0] or self.follow[0] or self.errors):
+			# without export_file (no output-file: library API) the rows of the result Dataframe
+			self.stats.setdefault('rows_out', rows())
+		if (self.chunksize[0] or self.follow[0]) and self.profiler.records:
+			# the chunked and follow mode keep no Dataframe
+			self.profiler.records[-1].update(rows_in=self.stats.get('rows_in', 0), rows_out=self.stats.get('rows_out', 0))
+		self.profiler.stop()
+		if self.profile[0]:
+			self.write_profile()
+
+	def write_profile(self) -> None:
+		"""
+		Prints the stage measurements and writes them to the --profile JSON file.
+		"""
+		try:
+			self.console.print(self.profiler.table(f'Profile: {self.inputfile[0]}'))
+			options = {key: self.__dict__[key][0] for key in ['iqr', 'std', 'no', 'outlier', 's', 'chunksize', 'parser']}
+			self.profiler.write(self.profile[0], {'input': self.inputfile[0], 'input_bytes': os.path.getsize(self.inputfile[0]), 'options': options, 'stats': self.stats, 'errors': self.errors})
+			self.console.print(f'[{messageColor}]Profile written: {self.profile[0]}')
+		except OSError:
+			self.error(f'WRITE_PROFILE EXCEPTION - Cannot write profile: {self.profile[0]}')
+		except Exception as e:
+			self.error(f'WRITE_PROFILE EXCEPTION - Something strange is going on: {type(e)}')
+
+	def schedule(self, loaded:bool) -> list:
+		"""
+		Steps of the pipeline (Pipeline.schedule of PIPELINE) without the stages of --skip-stages, the reader stages if the
+		input-file was loaded from the cache and the stages whose results are not used.
+		"""
+		try:
+			stages, skipped = Pipeline(PIPELINE, self.skipped_stages()).schedule(self, loaded)
+		except ValueError as e:
+			self.error(f'RUN EXCEPTION - {e}')
+			return []
+		if bool(self.no[0]):
+			self.console.print(f'[{messageColor}]Outlier removal/replacement is deactivated.')
+		if bool(self.noplot[0]):
+			self.console.print(f'[{messageColor}]Data plot is deactivated.')
+		if bool(self.log[0]):
+			self.console.print(f'[{messageColor}]Stages: {", ".join(name for name, _ in stages)}. Skipped: {", ".join(skipped)}')
+		return stages
 
 	def open_file(self) -> None:
 		"""
 		Creates Dataframe from the csv- or log-file in the specified path.
 		"""
 		try:
-			data_url = args.inputfile
-			self.dataframe = pd.read_csv(data_url, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True)
-			console.print(f'[{messageColor}]Input-file processed: {args.inputfile}')
+			data_url = self.inputfile[0]
+			if self.source is not None:
+				data_url = self.memory_frame(self.source)
+			if isinstance(data_url, pd.DataFrame):
+				self.dataframe = data_url
+			elif self.parser[0] == 'fast':
+				self.reader = SensorLogParser(self.timestamp_format[0], self.value_dtype)
+				self.dataframe = self.reader.read(data_url)
+				self.print_parser_counts()
+			elif bool(self.compact[0]):
+				self.dataframe = self.read_compact(data_url)
+			else:
+				self.dataframe = pd.read_csv(data_url, sep=" ", header=None, index_col=None, on_bad_lines='skip', usecols=[0,1,2,3,4], skip_blank_lines=True)
+			if self.dataframe.empty:
+				raise pd.errors.EmptyDataError('No data lines')
+			self.stats['rows_in'] = len(self.dataframe)
+			self.console.print(f'[{messageColor}]Input-file processed: {self.inputfile[0]}')
+			self.print_memory('after reading')
+			if bool(self.log[0]):
+				self.dataframe.info()
+		except OSError:
+			self.error(f'OPEN FILE EXCEPTION - Cannot open Input-file: {self.inputfile[0]}')
+		except pd.errors.EmptyDataError:
+			self.error(f'OPEN FILE EXCEPTION - Input-file has no data lines: {self.inputfile[0]}')
+		except UnicodeDecodeError:
+			self.error(f'OPEN FILE EXCEPTION - Input-file is not a text file: {self.inputfile[0]}')
+		except Exception as e:
+			self.error(f'OPEN FILE EXCEPTION - Something strange is going on: {type(e)}')
+
+	def memory_frame(self, source):
+		"""
+		Input of the library API (process) instead of the input-file: bytes or a binary file object with the lines of a
+		log-file, or a Dataframe / dict of arrays with the raw columns (Date, Time, Temp, Hum, TO as strings) or the parsed
+		columns (Datetime, Temp, Hum). Returns a binary file object for open_file or the Dataframe in the layout of the
+		parser.
+		"""
+		if isinstance(source, (bytes, bytearray, memoryview)):
+			return io.BytesIO(source)
+		if hasattr(source, 'read'):
+			return source
+		frame = pd.DataFrame(source).reset_index(drop=True)
+		if 'Datetime' not in frame.columns:
+			if len(frame.columns) != 5:
+				raise ValueError(f'Expected the columns Date, Time, Temp, Hum, TO or Datetime, Temp, Hum: {list(frame.columns)}')
+			frame.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+			return self.compact_columns(frame) if bool(self.compact[0]) else frame
+		# parsed columns: the layout of the fast parser, Key for the first drop_duplicates
+		result = pd.DataFrame({
+			'Temp': pd.to_numeric(frame['Temp'], errors='coerce').astype(self.value_dtype),
+			'Hum': pd.to_numeric(frame['Hum'], errors='coerce').astype(self.value_dtype),
+			'Datetime': pd.to_datetime(frame['Datetime'], errors='coerce'),
+		})
+		result['Key'] = pd.util.hash_pandas_object(result, index=False).to_numpy()
+		return result
+
+	def read_compact(self, source) -> pd.DataFrame:
+		"""
+		Reads the input-file (or source: a binary file object) for --compact in blocks of COMPACT_BLOCK lines and converts
+		each block with compact_columns, so the string columns of read_csv exist only for one block. TO is read as well, the
+		first drop_duplicates compares the hash of all raw fields. The timestamp format is guessed once from the first
+		timestamp, like pd.to_datetime does for the whole column.
+		"""
+		blocks = []
+		datetime_format = None
+		with (open(source, 'rb') if isinstance(source, (str, os.PathLike)) else contextlib.nullcontext(source)) as file:
+			while True:
+				lines = list(itertools.islice(file, COMPACT_BLOCK))
+				if not lines:
+					break
+				block = parse_lines(lines)
+				if datetime_format is None:
+					datetimes = (block['Date'] + ' ' + block['Time']).dropna()
+					# without a guessed format every timestamp is parsed on its own (like pd.to_datetime)
+					datetime_format = (guess_datetime_format(datetimes.iloc[0]) or 'mixed') if len(datetimes) else None
+				blocks.append(self.compact_columns(block, datetime_format=datetime_format))
+		if not blocks:
+			raise pd.errors.EmptyDataError('No data lines')
+		return pd.concat(blocks, ignore_index=True)
+
+	def compact_columns(self, dataframe:pd.DataFrame, key:bool=True, datetime_format:str=None) -> pd.DataFrame:
+		"""
+		Converts the columns of read_csv right after reading (--compact): Temp and Hum to float32, Date and Time to Datetime
+		(with datetime_format, default: guessed from the first timestamp). The string columns are not kept, TO only in Key
+		(hash of the raw row) for drop_duplicates.
+		"""
+		dataframe.columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
+		result = pd.DataFrame({
+			'Temp': pd.to_numeric(dataframe['Temp'].str.replace('T=', ''), errors='coerce').astype(self.value_dtype),
+			'Hum': pd.to_numeric(dataframe['Hum'].str.replace('H=', ''), errors='coerce').astype(self.value_dtype),
+			'Datetime': pd.to_datetime(dataframe['Date'] + ' ' + dataframe['Time'], format=datetime_format, errors="coerce"),
+		}, index=dataframe.index)
+		if key:
+			result['Key'] = pd.util.hash_pandas_object(dataframe, index=False).to_numpy()
+		return result
+
+	def print_memory(self, stage:str) -> None:
+		"""
+		Prints the memory of the Dataframe per row (--compact and detailed logs).
+		"""
+		if (bool(self.compact[0]) or bool(self.log[0])) and len(self.dataframe):
+			size = int(self.dataframe.memory_usage(index=True, deep=True).sum())
+			self.console.print(f'[{messageColor}]Memory {stage}: {size / len(self.dataframe):.1f} bytes per row ({size} bytes, {len(self.dataframe)} rows, columns: {escape(", ".join(f"{column} {dtype}" for column, dtype in self.dataframe.dtypes.items()))})')
+
+	def print_parser_counts(self) -> None:
+		"""
+		Prints the counts of irregular lines and fields of the fast parser.
+		"""
+		counts = self.reader.counts
+		self.console.print(f'[{messageColor}]Fast parser: {counts["lines"]} lines, {counts["blank_lines"]} blank lines skipped, {counts["short_lines"]} lines with missing fields, {counts["long_lines"]} lines with extra fields (ignored)')
+		self.console.print(f'[{messageColor}]Fast parser: {counts["invalid_timestamps"]} timestamps not matching {self.timestamp_format[0]}, {counts["invalid_values"]} empty or invalid values, {counts["value_fallback"]} irregular values')
+
+	def skipped_stages(self) -> list:
+		"""
+		Names of the stages in --skip-stages.
+		"""
+		return [name.strip() for name in (self.skip_stages[0] or '').split(',') if name.strip()]
+
+	def cache_options(self) -> dict:
+		"""
+		Parser options that change the parsed Dataframe. Skipped reader stages (e.g. drop_raw_duplicates) change it too,
+		so their entry is kept apart from the entry of a normal run.
+		"""
+		options = {'parser': self.parser[0], 'timestamp_format': self.timestamp_format[0] if self.parser[0] == 'fast' else None}
+		if bool(self.compact[0]):
+			options['dtype'] = self.value_dtype
+		skipped = sorted(stage.name for stage in PIPELINE if stage.reader and (not stage.sink) and (stage.name in self.skipped_stages()))
+		if skipped:
+			options['skip_stages'] = skipped
+		return options
+
+	def load_cache(self) -> bool:
+		"""
+		Loads the parsed input-file from the cache instead of open_file, rename_columns, drop_duplicates and create_datetime.
+		Returns True if the input-file was found in the cache.
+		"""
+		if self.cache is None:
+			return False
+		try:
+			cached = self.cache.load(self.inputfile[0], self.cache_options())
+			if cached is None:
+				return False
+			self.dataframe, meta = cached
+			self.stats['rows_in'] = meta['rows_in']
+			self.console.print(f'[{messageColor}]Input-file loaded from cache: {self.inputfile[0]} ({len(self.dataframe)} rows)')
+			self.print_memory('after reading')
 			if bool(self.log[0]):
 				self.dataframe.info()
+			return True
+		except Exception as e:
+			self.error(f'LOAD_CACHE EXCEPTION - Something strange is going on: {type(e)}')
+			return False
+
+	def store_cache(self) -> None:
+		"""
+		Converts Temp and Hum to float (like format_data_columns) and stores the parsed columns in the cache.
+		"""
+		if self.cache is None:
+			return
+		try:
+			if 'TO' in self.dataframe.columns:
+				self.dataframe = self.convert_data_columns(self.dataframe)
+			self.cache.store(self.inputfile[0], self.cache_options(), self.dataframe, self.stats.get('rows_in', len(self.dataframe)))
+			self.console.print(f'[{messageColor}]Parsed input-file stored in cache: {self.cache.directory}')
 		except OSError:
-			console.print(f'[{errorColor}]OPEN FILE EXCEPTION - Cannot open Input-file: {args.inputfile}')
+			self.error(f'STORE_CACHE EXCEPTION - Cannot write cache: {self.cache.directory}')
 		except Exception as e:
-			console.print(f'[{errorColor}]OPEN FILE EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'STORE_CACHE EXCEPTION - Something strange is going on: {type(e)}')
 
 	def export_file(self) -> None:
 		"""
 		Exports Dateframe to File in the specified path.
 		"""
 		try:
-			data_url = args.outputfile
-			self.dataframe.to_csv(data_url, index=False)
-			console.print(f'[{messageColor}]Output-file processed: {args.outputfile}')
+			if not isinstance(self.dataframe, pd.DataFrame) or ('Datetime' not in self.dataframe.columns):
+				# no parsed Dataframe (the input-file was not read), no output-file is created
+				self.error(f'EXPORT_FILE EXCEPTION - No data to export: {self.inputfile[0]}')
+				return
+			data_url = self.outputfile[0]
+			self.print_memory('before export')
+			with self.output_writer() as writer:
+				writer.write(self.dataframe)
+			self.stats['rows_out'] = len(self.dataframe)
+			self.console.print(f'[{messageColor}]Output-file processed: {self.outputfile[0]}')
+			self.print_index(writer)
 			if bool(self.log[0]):
 				self.dataframe.info()
+		except ImportError as e:
+			self.error(f'EXPORT_FILE EXCEPTION - {e}')
 		except OSError:
-			console.print(f'[{errorColor}]EXPORT_FILE EXCEPTION - Cannot export Output-file: {args.outputfile}')
+			self.error(f'EXPORT_FILE EXCEPTION - Cannot export Output-file: {self.outputfile[0]}')
 		except Exception as e:
-			console.print(f'[{errorColor}]EXPORT_FILE EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'EXPORT_FILE EXCEPTION - Something strange is going on: {type(e)}')
+
+	def output_writer(self, append:bool=False) -> OutputWriter:
+		"""
+		OutputWriter for the options --format, --partition-by-day, --date-format and --index. Appended rows (follow mode) are
+		added to the index of the output-file if it is still up to date.
+		"""
+		index = None
+		if self.time_index[0] is not None:
+			index = TimeIndex(self.time_index[0])
+			if append:
+				try:
+					index = TimeIndex.load(self.outputfile[0])
+				except ValueError as e:
+					index = None
+					self.console.print(f'[{messageColor}]Index not continued ({e})')
+				if (index is not None) and (index.period != self.time_index[0]):
+					index = None
+					self.console.print(f'[{messageColor}]Index not continued (period changed): {TimeIndex.location(self.outputfile[0])}')
+		return OutputWriter(self.outputfile[0], self.output_format[0], bool(self.partition[0]), self.date_format[0], append, index)
+
+	def print_index(self, writer:OutputWriter) -> None:
+		"""
+		Prints where the index of the output-file was written.
+		"""
+		if writer.index is not None:
+			self.console.print(f'[{messageColor}]Index written: {TimeIndex.location(writer.path)} ({len(writer.index.partitions)} partitions per {writer.index.period})')
 
 	def rename_columns(self) -> None:
 		"""
 		Renames the columns in the dataframe.
 		"""
 		try:
+			if 'Key' in self.dataframe.columns:
+				# the fast parser names its columns itself
+				self.console.print(f'[{messageColor}]Columns parsed: {str(list(self.dataframe.columns))}')
+				return
 			columns = ['Date', 'Time', 'Temp', 'Hum', 'TO']
 			self.dataframe.columns = columns
-			console.print(f'[{messageColor}]Columns renamed: {str(columns)}')
+			self.console.print(f'[{messageColor}]Columns renamed: {str(columns)}')
 		except Exception as e:
-			console.print(f'[{errorColor}]RENAME_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'RENAME_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
 
 	def create_datetime(self) -> None:
 		"""
 		Creates pandas Datetime in new column. Drops columns Date and Time.
 		"""
 		try:
+			if 'Date' not in self.dataframe.columns:
+				self.console.print(f'[{messageColor}]Datetime parsed with format {self.timestamp_format[0]}' if self.parser[0] == 'fast' else f'[{messageColor}]Datetime created while reading (--compact or parsed columns)')
+				return
 			# Converting colums Date + Time to new column with pd.timestamp 'Datetime'
 			self.dataframe['Datetime'] = pd.to_datetime(self.dataframe['Date'] + ' ' + self.dataframe['Time'], errors="coerce")
 			# Dropping Columns Date and Time
 			drop = ['Date', 'Time']
 			self.dataframe = self.dataframe.drop(columns=drop)
-			console.print(f'[{messageColor}]Datetime created. Columns dropped: {str(drop)}')
+			self.console.print(f'[{messageColor}]Datetime created. Columns dropped: {str(drop)}')
 		except Exception as e:
-			console.print(f'[{errorColor}]CREATE_DATETIME EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'CREATE_DATETIME EXCEPTION - Something strange is going on: {type(e)}')
+
+	def get_valid_span(self) -> ValidSpan:
+		"""
+		Returns the ValidSpan of the Datetime column. Created once and shared by the following stages.
+		"""
+		if self.valid_span is None:
+			self.valid_span = ValidSpan(self.dataframe['Datetime'])
+		return self.valid_span
 
 	def get_first_valid_timestamp(self) -> None:
 		"""
 		Gets the first valid timestamp of the Dataframe.
 		"""
 		try:
-			first_index = 0
 			# looking for first valid timestamp
-			for index in self.dataframe.index:
-				start_time = self.dataframe['Datetime'][first_index]
-				if np.isnat(np.datetime64(str(start_time))):
-					first_index+=1
-				else:
-					first_index = first_index
-			self.first_index = first_index
-			self.start_time = start_time
-			console.print(f'[{messageColor}]First valid Timestamp: {start_time}, index: {first_index}')
+			span = self.get_valid_span()
+			self.first_index = span.first_index
+			self.start_time = span.start_time
+			self.console.print(f'[{messageColor}]First valid Timestamp: {self.start_time}, index: {self.first_index}')
 		except Exception as e:
-			console.print(f'[{errorColor}]GET_FIRST_VALID_TIMESTAMP EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'GET_FIRST_VALID_TIMESTAMP EXCEPTION - Something strange is going on: {type(e)}')
 
 	def get_last_valid_timestamp(self) -> None:
 		"""
 		Gets the last valid timestamp of the Dataframe.
 		"""
 		try:
-			last_index = len(self.dataframe['Datetime'])-1
-			end_time = self.dataframe['Datetime'][last_index]
-
 			# looking for last valid timestamp
-			for index in self.dataframe.index:
-				end_time = self.dataframe['Datetime'][last_index]
-				if np.isnat(np.datetime64(str(end_time))):
-					last_index-=1
-				else:
-					last_index = last_index
-			self.last_index = last_index
-			self.end_time = end_time
-			console.print(f'[{messageColor}]Last valid Timestamp: {end_time}, index: {last_index}')
+			span = self.get_valid_span()
+			self.last_index = span.last_index
+			self.end_time = span.end_time
+			self.console.print(f'[{messageColor}]Last valid Timestamp: {self.end_time}, index: {self.last_index}')
 		except Exception as e:
-			console.print(f'[{errorColor}]GET_LAST_VALID_TIMESTAMP EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'GET_LAST_VALID_TIMESTAMP EXCEPTION - Something strange is going on: {type(e)}')
 
 	def calculate_mean_timegap(self):
 		"""
@@ -175,437 +2636,1023 @@ class FileHandler(object):
 		"""
 		try:
 			# calculating mean timegap between timestamps
-			datetimes = self.dataframe['Datetime']
-			# subtracting datetimes gives timedeltas
-			timedeltas = [datetimes[i]-datetimes[i-1] for i in range(1, len(datetimes))]
-			self.mean_timegap = statistics.median(timedeltas)
+			values = self.dataframe['Datetime'].to_numpy(dtype='datetime64[ns]')
+			# int64 nanoseconds between consecutive timestamps, NaT if one of them is NaT
+			timegaps = np.diff(values.view('int64'))
+			timegaps[np.isnat(values[1:]) | np.isnat(values[:-1])] = np.iinfo(np.int64).min
+			self.mean_timegap = self.median_timegap(timegaps)
 
-			console.print(f'[{messageColor}]Median Timegap between Timestamps: {self.mean_timegap}')
+			self.console.print(f'[{messageColor}]Median Timegap between Timestamps: {self.mean_timegap}')
 		except Exception as e:
-			console.print(f'[{errorColor}]CALCULATE_MEAN_TIMEGAP EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'CALCULATE_MEAN_TIMEGAP EXCEPTION - Something strange is going on: {type(e)}')
+
+	def median_timegap(self, timegaps) -> pd.Timedelta:
+		"""
+		Median of int64 nanosecond timegaps (NaT = int64 min) or of a TDigest of timegaps. --estimator exact gives the result
+		of statistics.median (median_timegap), tdigest the approximate median of the valid timegaps in seconds.
+		"""
+		if self.estimator[0] == 'tdigest':
+			if not isinstance(timegaps, TDigest):
+				timegaps = TDigest().update(timegaps[timegaps != np.iinfo(np.int64).min])
+			if timegaps.count == 0:
+				raise statistics.StatisticsError('no median for empty data')
+			# rounded to the resolution of the timestamps
+			return pd.Timedelta(int(round(timegaps.quantile(0.5)))).round('s')
+		return median_timegap(timegaps)
 
 	def check_valid_date(self):
 		""" check_valid_date(self)
 		Checks if the date is valid and replaces invalid dates with NaT. Calls replace_nat function to replace NaT with calculated Timestamp. 
 		""" 
 		now = datetime.today()
-		start_time = self.start_time
-		last_index = self.last_index
 
 		try:
+			span = self.get_valid_span()
+			start_time = span.start_time
+			last_index = span.last_index
 			# Checking for valid dates and replacing invalid dates with NaT
 			if bool(self.log[0]):
 				print("Change invalid Datetime to NaT...")
-			for index in self.dataframe.index:
-
-				if self.first_index >= index:
-					previous_date = (self.dataframe['Datetime'][self.first_index])
-				elif self.first_index == 0:
-					previous_date = 0
-				else: 
-					previous_date = (self.dataframe['Datetime'][index-1])
-
-				actual_date = (self.dataframe['Datetime'][index])
-
-				if last_index > index:
-					next_date = (self.dataframe['Datetime'][index+1])
-				elif len(self.dataframe.index) > last_index:
-					next_date = now
-				else:
-					print("Last valid date? --> Check file!")
-
-				last_nat = np.isnat(np.datetime64(str(self.dataframe['Datetime'][last_index])))
-				
-				# Checking if Datetime is allready NaT
-				if np.isnat(np.datetime64(str(self.dataframe['Datetime'][index]))):
-					is_nat = True
-				else:
-					is_nat = False           
-			
-				# Change Datetime to NaT if (start_time <= datecheck <= now), if actual_date >= next_date, if duplicate
-
-				if not is_nat:
-					if not last_nat:
-						if (not (start_time <= actual_date <= now)) or (actual_date >= next_date) or (previous_date >= actual_date):
-							if bool(self.log[0]):
-								print("df[" + str(index) + "]['Datetime']=" + str(self.dataframe['Datetime'][index]) + " is not valid! Changing invalid Date to NaT.")
-							# Changing invalid Date to NaT
-							self.dataframe['Datetime'][index] = str("NaT")
-							#self.dataframe.loc[self.dataframe.Datetime == index] = str("NaT")
-			console.print(f'[{messageColor}]Invalid Datetime replaced with NaT.')
+			datetimes = self.dataframe['Datetime'].to_numpy(dtype='datetime64[ns]', copy=True)
+			# Change Datetime to NaT if (start_time <= datecheck <= now), if actual_date >= next_date, if duplicate
+			invalid = find_invalid_dates(datetimes, span.first_index, last_index, start_time, now)
+			if bool(self.log[0]):
+				for index in self.dataframe.index[invalid]:
+					print("df[" + str(index) + "]['Datetime']=" + str(self.dataframe['Datetime'][index]) + " is not valid! Changing invalid Date to NaT.")
+			# Changing invalid Dates to NaT
+			datetimes[invalid] = np.datetime64('NaT')
+			self.dataframe['Datetime'] = datetimes
+			self.stats['invalid_dates'] = int(invalid.sum())
+			self.console.print(f'[{messageColor}]Invalid Datetime replaced with NaT.')
 		except Exception as e:
-			console.print(f'[{errorColor}]CHECK_VALID_DATE EXCEPTION - Something strange is going on: {type(e)}, Index: {index}')
+			self.error(f'CHECK_VALID_DATE EXCEPTION - Something strange is going on: {type(e)}')
 
 	def replace_nat(self) -> None:
 		""" replace_nat(self)
 		Checks the dataframe for NaT. Replaces all NaT / invalid timestamps. Uses the mean timegap for calculations.
 		"""    
 		try:
-			nat_index = []
-			mean_timegap = self.mean_timegap
-			first_index = self.first_index
-			self.dataframe.head(32)
+			datetimes = self.dataframe['Datetime'].to_numpy(dtype='datetime64[ns]', copy=True)
+			nat = np.isnat(datetimes)
+			nat_index = self.dataframe.index[nat].tolist()
+			self.stats['nat'] = len(nat_index)
 
 			# Checking for NaT
 			if bool(self.log[0]):
 				print("Checking for NaT...")
-			for index in self.dataframe.index:
-				if np.isnat(np.datetime64(str(self.dataframe['Datetime'][index]))):
-					if bool(self.log[0]):
-						print("df[" + str(index) + "]['Datetime']=" + str(self.dataframe['Datetime'][index]) + ": " + str(np.isnat(np.datetime64(str(self.dataframe['Datetime'][index])))))
-					nat_index.append(index)
-			if bool(self.log[0]):
 				print(f"Indices with NaT: {nat_index}")
-				
-			# #replacing NaT with calculated Timestamps
+
+			# Replacing NaT with calculated Timestamps
 			if bool(self.log[0]):
 				print("Replacing NaT with calculated Timestamps...")
-			# for nat in reversed(nat_index):
-			for nat in nat_index[::-1]:
-				if (first_index < nat):
-					if not np.isnat(np.datetime64(str(self.dataframe['Datetime'][nat - 1]))):
-						self.dataframe['Datetime'][nat] = self.dataframe['Datetime'][nat - 1] + mean_timegap
-					else: 
-						self.dataframe['Datetime'][nat] = self.dataframe['Datetime'][nat + 1] - mean_timegap
-				elif (first_index >= nat):
-					self.dataframe['Datetime'][nat] = self.dataframe['Datetime'][first_index+1] - mean_timegap
-					if first_index >= 1:
-						first_index-=1
-				else: 
-					self.dataframe['Datetime'][nat] = self.dataframe['Datetime'][first_index] - mean_timegap
-			
-				if bool(self.log[0]):
-					print("Calculated Timestamp for: df[" + str(nat) + "]['Datetime']=" + str(self.dataframe['Datetime'][nat]))
-			console.print(f'[{messageColor}]NaT replaced with calculated Timestamps. Indices: {nat_index}')
+			datetimes = fill_nat_segments(datetimes, self.get_valid_span().first_index, self.mean_timegap)
+			self.dataframe['Datetime'] = datetimes
+			if bool(self.log[0]):
+				for index, timestamp in zip(nat_index, datetimes[nat]):
+					print("Calculated Timestamp for: df[" + str(index) + "]['Datetime']=" + str(pd.Timestamp(timestamp)))
+			self.console.print(f'[{messageColor}]NaT replaced with calculated Timestamps. Indices: {nat_index}')
 		except Exception as e:
-			console.print(f'[{errorColor}]REPLACE_NAT EXCEPTION - Something strange is going on: {type(e)}, Index: {index}')
-			
+			self.error(f'REPLACE_NAT EXCEPTION - Something strange is going on: {type(e)}')
+
+	def convert_data_columns(self, dataframe:pd.DataFrame) -> pd.DataFrame:
+		"""
+		Replacing Strings in Temp and Hum. Drops column TO. Converts values to float. Replaces empty string with np.nan.
+		"""
+		# Replacing Strings in Temp and Hum
+		dataframe = dataframe.copy()
+		dataframe['Temp'] = dataframe['Temp'].str.replace('T=', '')
+		dataframe['Hum'] = dataframe['Hum'].str.replace('H=', '')
+		# Droping Column "TO"
+		dataframe = dataframe.drop(columns=['TO'])
+		# Convert each value of the column to float
+		dataframe['Temp'] = pd.to_numeric(dataframe['Temp'], errors='coerce')
+		dataframe['Hum'] = pd.to_numeric(dataframe['Hum'], errors='coerce')
+		# Replace empty string ('') with np.nan
+		dataframe['Temp'] = dataframe['Temp'].replace(r'^\s*$', np.nan, regex=True)
+		dataframe['Hum'] = dataframe['Hum'].replace(r'^\s*$', np.nan, regex=True)
+		return dataframe
+
 	def format_data_columns(self) -> None:
 		"""
 		Replacing Strings in Temp and Hum. Drops column TO. Converts values to float. Replaces empty string with np.nan. Creates NaN Index.
 		"""
 		try:
-			# Replacing Strings in Temp and Hum
-			self.dataframe['Temp'] = self.dataframe['Temp'].str.replace('T=', '')
-			self.dataframe['Hum'] = self.dataframe['Hum'].str.replace('H=', '')
-			# Droping Column "TO"
-			self.dataframe = self.dataframe.drop(columns=['TO'])
-			# Convert each value of the column to float
-			self.dataframe['Temp'] = pd.to_numeric(self.dataframe['Temp'], errors='coerce')
-			self.dataframe['Hum'] = pd.to_numeric(self.dataframe['Hum'], errors='coerce')
-			# Replace empty string ('') with np.nan
-			self.dataframe['Temp'] = self.dataframe['Temp'].replace(r'^\s*$', np.nan, regex=True)
-			self.dataframe['Hum'] = self.dataframe['Hum'].replace(r'^\s*$', np.nan, regex=True)
+			# Values of the fast parser and of the cache are floats already
+			if 'TO' in self.dataframe.columns:
+				self.dataframe = self.convert_data_columns(self.dataframe)
 			# Check for NaN Index
-			df_nan = self.dataframe.isna()
-			nan_index = []
-			for index in df_nan.index:
-				if (df_nan['Temp'][index]) or (df_nan['Hum'][index]):
-					nan_index.append(index)
+			nan = self.dataframe['Temp'].isna().to_numpy() | self.dataframe['Hum'].isna().to_numpy()
+			nan_index = self.dataframe.index[nan].tolist()
 
-			console.print(f'[{messageColor}]Data columns formated. Empty values replaced with NaN. Indices: {nan_index}')
+			self.console.print(f'[{messageColor}]Data columns formated. Empty values replaced with NaN. Indices: {nan_index}')
 		except Exception as e:
-			console.print(f'[{errorColor}]FORMAT_DATA_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'FORMAT_DATA_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
 	
+	def fuse_values(self, stages:list) -> None:
+		"""
+		format_data_columns and check_valid_value in one pass per column: strip the prefix, convert to float, mark NaN and
+		apply the ValueRules. The columns are processed in parallel (--column-threads), the messages are the ones of the
+		two stages.
+		"""
+		try:
+			convert = 'TO' in self.dataframe.columns
+			rules = self.value_rules()
+			prefixes = {'Temp': 'T=', 'Hum': 'H='}
+			def column_pass(column:str) -> tuple:
+				values = self.dataframe[column]
+				if convert:
+					values = pd.to_numeric(values.str.replace(prefixes[column], ''), errors='coerce')
+				return values, rules.check_column(column, values.to_numpy(dtype='float64'))
+			with ThreadPoolExecutor(max_workers=max(1, min(int(self.column_threads[0]), 2))) as pool:
+				results = dict(zip(['Temp', 'Hum'], pool.map(column_pass, ['Temp', 'Hum'])))
+			if convert:
+				self.dataframe = self.dataframe.drop(columns=['TO']).assign(**{column: values for column, (values, _) in results.items()})
+			nan = self.dataframe['Temp'].isna().to_numpy() | self.dataframe['Hum'].isna().to_numpy()
+			self.console.print(f'[{messageColor}]Data columns formated. Empty values replaced with NaN. Indices: {self.dataframe.index[nan].tolist()}')
+			# check_valid_value on the converted columns
+			self.replace_invalid_values({column: found for column, (_, found) in results.items()})
+		except OSError:
+			self.error(f'CHECK_VALID_VALUE EXCEPTION - Cannot read value rules: {self.rules[0]}')
+		except ValueError as e:
+			self.error(f'CHECK_VALID_VALUE EXCEPTION - Invalid value rules: {e}')
+		except Exception as e:
+			self.error(f'{"+".join(stages).upper()} EXCEPTION - Something strange is going on: {type(e)}')
+
 	def check_valid_value(self) -> None:
 		"""
-		Checks if the values of Temp and Hum are in a valid range. Invalid values are replaced with NaN.
-		"""
-		valid_temp = [0, 50]  # Valid range for temperature values
-		valid_hum = [0, 100]  # Valid range for humidity values
-		try:
-			# Create copy of the dataframe for visualization
-			global df_before_check_valid_value
-			df_before_check_valid_value = self.dataframe.copy(deep=True)
-			# Check for valid values and remove values that not match the valid range
-			nan_index = []
-			for index in self.dataframe.index:
-				if (self.dataframe['Temp'][index] < valid_temp[0]) or (self.dataframe['Temp'][index] > valid_temp[1]):
-					self.dataframe['Temp'][index] = np.nan
-					nan_index.append(index)
-				if (self.dataframe['Hum'][index] < valid_hum[0]) or (self.dataframe['Hum'][index] > valid_hum[1]):
-					self.dataframe['Hum'][index] = np.nan
-					nan_index.append(index)
-
-			console.print(f'[{messageColor}]Values checked. Invalid values replaced with NaN. Indices: {nan_index}')
+		Checks the values of Temp and Hum with the ValueRules (valid range, optionally spikes and stuck sensor). Invalid values are replaced with NaN.
+		"""
+		try:
+			self.replace_invalid_values(self.value_rules().check(self.dataframe))
+		except OSError:
+			self.error(f'CHECK_VALID_VALUE EXCEPTION - Cannot read value rules: {self.rules[0]}')
+		except ValueError as e:
+			self.error(f'CHECK_VALID_VALUE EXCEPTION - Invalid value rules: {e}')
 		except Exception as e:
-			console.print(f'[{errorColor}]FORMAT_DATA_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'CHECK_VALID_VALUE EXCEPTION - Something strange is going on: {type(e)}')
+
+	def replace_invalid_values(self, found:dict) -> None:
+		"""
+		Replaces the values found by the ValueRules ({column: {rule: positions}}) with NaN, records them for the plot and
+		prints the invalid values per rule and their indices (check_valid_value and fuse_values).
+		"""
+		# Record the replaced values for visualization
+		self.changes.mark('check_valid_value')
+		invalid = []
+		for column, rules in found.items():
+			positions = np.unique(np.concatenate(list(rules.values())))
+			self.changes.modified(column, self.dataframe.index[positions], self.dataframe[column].to_numpy()[positions])
+			self.dataframe[column] = ValueRules.replace(self.dataframe[column], positions)
+			invalid.append(positions)
+			if bool(self.log[0]) or (len(rules) > 1):
+				self.console.print(f'[{messageColor}]{column}: ' + ', '.join(f'{len(rules[name])} invalid ({name})' for name in ValueRules.names if name in rules))
+		# Indices row by row (Temp before Hum) like the row-by-row check
+		positions = np.concatenate(invalid)
+		nan_index = self.dataframe.index[positions[np.argsort(positions, kind='stable')]].tolist()
+		self.console.print(f'[{messageColor}]Values checked. Invalid values replaced with NaN. Indices: {nan_index}')
+
+	def value_rules(self) -> ValueRules:
+		"""
+		ValueRules of --rules (default: VALUE_RULES).
+		"""
+		return ValueRules.load(self.rules[0]) if self.rules[0] else ValueRules()
 	
 	def interpolate_nan(self) -> None:
 		"""
-		Interpolates NaN values of Temp and Hum.
+		Interpolates NaN values of Temp and Hum by row position (--interpolation linear) or by the repaired Datetime
+		(--interpolation time). With --max-gap NaN runs in gaps longer than max-gap are kept.
 		"""
 		try:
-			# Interpolate NaN
-			self.dataframe['Temp'] = self.dataframe['Temp'].interpolate(method='linear')
-			self.dataframe['Hum'] = self.dataframe['Hum'].interpolate(method='linear')
-			console.print(f'[{messageColor}]Interpolation of NaN values accomplished.')
+			max_gap = self.max_gap_value()
+			datetimes = self.dataframe['Datetime'].to_numpy(dtype='datetime64[ns]')
+			kept = 0
+			for column in ['Temp', 'Hum']:
+				nan = self.dataframe[column].isna().to_numpy()
+				# Record the interpolated values for visualization
+				self.changes.modified(column, self.dataframe.index[nan], np.full(nan.sum(), np.nan))
+				if nan.any():
+					values = interpolate_gaps(self.dataframe[column].to_numpy(), datetimes, self.interpolation[0], max_gap)
+					self.dataframe[column] = values.astype(self.dataframe[column].dtype)
+					kept += int(np.isnan(values).sum())
+			self.console.print(f'[{messageColor}]Interpolation of NaN values accomplished.')
+			if max_gap is not None:
+				self.console.print(f'[{messageColor}]NaN values kept in gaps longer than {pd.Timedelta(max_gap)}: {kept}')
+				self.stats['gap_nan'] = kept
+		except ValueError:
+			self.error(f'INTERPOLATE_NAN EXCEPTION - Invalid max-gap: {self.max_gap[0]}')
 		except Exception as e:
-			console.print(f'[{errorColor}]FORMAT_DATA_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'FORMAT_DATA_COLUMNS EXCEPTION - Something strange is going on: {type(e)}')
 	
+	def max_gap_value(self) -> int:
+		"""
+		--max-gap in int64 nanoseconds or None. Raises ValueError for an invalid or negative offset.
+		"""
+		if self.max_gap[0] is None:
+			return None
+		max_gap = pd.Timedelta(self.max_gap[0])
+		if pd.isnull(max_gap) or (max_gap < pd.Timedelta(0)):
+			raise ValueError(f'Invalid max-gap: {self.max_gap[0]}')
+		return max_gap.value
+
+	def resample_grid(self) -> None:
+		"""
+		Resamples Temp and Hum to a regular grid of the median timegap (--resample). Grid points in gaps longer than
+		--max-gap are NaN.
+		"""
+		try:
+			rows = len(self.dataframe)
+			self.dataframe = self.grid_resampler().resample(self.dataframe)
+			self.console.print(f'[{messageColor}]Resampled to a regular grid of {self.mean_timegap}: {len(self.dataframe)} rows ({rows} rows before)')
+		except ValueError:
+			self.error(f'RESAMPLE_GRID EXCEPTION - Invalid grid step or max-gap: {self.mean_timegap}, {self.max_gap[0]}')
+		except Exception as e:
+			self.error(f'RESAMPLE_GRID EXCEPTION - Something strange is going on: {type(e)}')
+
+	def grid_resampler(self) -> GridResampler:
+		"""
+		GridResampler for the median timegap and --max-gap.
+		"""
+		if pd.isnull(self.mean_timegap):
+			raise ValueError('Median Timegap is not defined')
+		return GridResampler(self.mean_timegap, self.max_gap_value(), ['Temp', 'Hum'])
+
 	def remove_outliers(self) -> None:
 		"""
 		Identifies and removes/replaces outliers. Works for Standard deviation (Z-Score) and for Interquatrile Range.
 		Replacement controlled via args: choices = ['remove', 'mean', 'median', 'limit', 'mode']
 		"""
-		# Create copy of the dataframe for visualization
-		global df_before_outliers
-		df_before_outliers = self.dataframe.copy(deep=True)
-		try:
-			outlier_temp = []
-			outlier_hum = []
-			mean_temp = self.dataframe['Temp'].mean()
-			sd_temp = self.dataframe['Temp'].std()
-			mean_hum = self.dataframe['Hum'].mean()
-			sd_hum = self.dataframe['Hum'].std()
-			# if arg iqr = True --> Identify outliers with Interquartile Range
-			if bool(self.iqr[0]):
-				# iqr
-				if bool(self.log[0]):
-					print(f'Removing outliers with IQR...')
-				q1_temp = self.dataframe['Temp'].quantile(0.25)
-				q3_temp = self.dataframe['Temp'].quantile(0.75)
-				iqr_temp = q3_temp - q1_temp
-				lower_limit_temp = q1_temp - 1.5 * iqr_temp
-				upper_limit_temp = q3_temp + 1.5 * iqr_temp
-				q1_hum = self.dataframe['Hum'].quantile(0.25)
-				q3_hum = self.dataframe['Hum'].quantile(0.75)
-				iqr_hum = q3_hum - q1_hum
-				lower_limit_hum = q1_hum - 1.5 * iqr_hum
-				upper_limit_hum = q3_hum + 1.5 * iqr_hum
-				# Find outliers
-				for hum in self.dataframe['Hum']:
-					if (hum > upper_limit_hum) or (hum < lower_limit_hum) :
-						outlier_hum.append(hum)
-				for temp in self.dataframe['Temp']:
-					if (temp > upper_limit_temp) or (temp < lower_limit_temp) :
-						outlier_temp.append(temp)
-
-				# Handling with outliers
-				# Trimming outliers (removing)
-				if (self.outlier[0] == "remove"):
-					self.dataframe = self.dataframe[~((self.dataframe['Temp'] < (lower_limit_temp)) | (self.dataframe['Temp'] > (upper_limit_temp)))]
-					self.dataframe = self.dataframe[~((self.dataframe['Hum'] < (lower_limit_hum)) | (self.dataframe['Hum'] > (upper_limit_hum)))]
-				
-				# Capping outliers (Replacing with Median)
-				if (self.outlier[0] == "median"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].median(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].median(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].median(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].median(), self.dataframe['Hum']))
-				
-				# Capping outliers (Replacing with Mean)
-				if (self.outlier[0] == "mean"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].mean(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].mean(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].mean(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].mean(), self.dataframe['Hum']))
-
-				# Capping outliers (Replacing with Mode)
-				if (self.outlier[0] == "mode"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].mode(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].mode(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].mode(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].mode(), self.dataframe['Hum']))
-
-				# Capping outliers (Replacing with upper/lower limits)
-				if (self.outlier[0] == "limit"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, upper_limit_temp,
-											np.where(self.dataframe['Temp'] < lower_limit_temp, lower_limit_temp, self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, upper_limit_hum,
-											np.where(self.dataframe['Hum'] < lower_limit_hum, lower_limit_hum, self.dataframe['Hum']))
-
-			# else --> Identify outliers with Standard Deviation
-			if (bool(self.std[0])):
-				if bool(self.log[0]):
-					print(f'Removing outliers with SD...')
-				# standard deviation
-				n_std = float(self.s[0])
-				threshold = n_std
-				# Temperature
-				sd_hum = self.dataframe['Hum'].std()
-				lower_limit_temp = mean_temp - (n_std*sd_temp)
-				upper_limit_temp = mean_temp + (n_std*sd_temp)
-				lower_limit_hum = mean_hum - (n_std*sd_hum)
-				upper_limit_hum = mean_hum + (n_std*sd_hum)
-				# Find outliers
-				for temp in self.dataframe['Temp']:
-					z = (temp - mean_temp)/sd_temp 
-					if z > threshold:
-						outlier_temp.append(temp)
-				for hum in self.dataframe['Hum']:
-					z = (hum - mean_hum)/sd_hum 
-					if z > threshold:
-						outlier_hum.append(hum)
-
-				# Handling with outliers
-				# Trimming outliers (removing)
-				if (self.outlier[0] == "remove"):
-					self.dataframe = self.dataframe[~((self.dataframe['Temp'] < (lower_limit_temp)) | (self.dataframe['Temp'] > (upper_limit_temp)))]
-					self.dataframe = self.dataframe[~((self.dataframe['Hum'] < (lower_limit_hum)) | (self.dataframe['Hum'] > (upper_limit_hum)))]
-				
-				# Capping outliers (Replacing with Median)
-				if (self.outlier[0] == "median"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].median(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].median(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].median(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].median(), self.dataframe['Hum']))
-				
-				# Capping outliers (Replacing with Mean)
-				if (self.outlier[0] == "mean"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].mean(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].mean(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].mean(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].mean(), self.dataframe['Hum']))
-
-				# Capping outliers (Replacing with Mode)
-				if (self.outlier[0] == "mode"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, self.dataframe['Temp'].mode(),
-											np.where(self.dataframe['Temp'] < lower_limit_temp, self.dataframe['Temp'].mode(), self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, self.dataframe['Hum'].mode(),
-											np.where(self.dataframe['Hum'] < lower_limit_hum, self.dataframe['Hum'].mode(), self.dataframe['Hum']))
-
-				# Capping outliers (Replacing with upper/lower limits)
-				if (self.outlier[0] == "limit"):
-					self.dataframe['Temp'] = np.where(self.dataframe['Temp'] > upper_limit_temp, upper_limit_temp,
-											np.where(self.dataframe['Temp'] < lower_limit_temp, lower_limit_temp, self.dataframe['Temp']))
-					self.dataframe['Hum'] = np.where(self.dataframe['Hum'] > upper_limit_hum, upper_limit_hum,
-											np.where(self.dataframe['Hum'] < lower_limit_hum, lower_limit_hum, self.dataframe['Hum']))
-			
-
+		# Mark the state for visualization
+		self.changes.mark('remove_outliers')
+		try:
 			if (bool(self.no[0])):
-				console.print(f'[{messageColor}]Outlier removal/replacement is deactivated.')
-
-			if not (bool(self.no[0])):
+				self.console.print(f'[{messageColor}]Outlier removal/replacement is deactivated.')
+				return
+			engine = self.outlier_engine().fit(self.dataframe)
+			if bool(self.log[0]):
+				print(f'Removing outliers with {engine.method.upper() if engine.method != "std" else "SD"}{f" over a rolling window of {self.window[0]}" if engine.window is not None else ""}...')
 				# Show statistical data
-				if bool(self.log[0]):
-					print(f'Mean Temperature: {mean_temp}')
-					print(f'Standard deviation of Temperature: {sd_temp}')
-					print(f'Upper Limit Temperature: {upper_limit_temp}')
-					print(f'Lower Limit Temperature: {lower_limit_temp}')
-					print(f'Mean Humidity: {mean_hum}')
-					print(f'Standard deviation of Humidity: {sd_hum}')
-					print(f'Upper Limit Humidity: {upper_limit_hum}')
-					print(f'Lower Limit Humidity: {lower_limit_hum}')
-
-			if not (bool(self.no[0])):
-				# Show Outliers	
-				console.print(f'[{messageColor}]Temperature Outliers in dataset: {outlier_temp}')
-				console.print(f'[{messageColor}]Humidity Outliers in dataset: {outlier_hum}')
-				console.print(f'[{messageColor}]{len(outlier_temp) + len(outlier_hum)} Outliers removed/replaced.')
+				for column in engine.columns:
+					print(engine.summary(column))
+			previous = self.dataframe
+			self.dataframe, outliers = engine.apply(self.dataframe)
+			self.changes.record(previous, self.dataframe)
+			# Show Outliers
+			for column, index in outliers.items():
+				shown = index.tolist() if bool(self.log[0]) else index[:20].tolist()
+				self.console.print(f'[{messageColor}]{column} Outliers in dataset: {len(index)}. Indices: {shown}{"" if len(shown) == len(index) else " ..."}')
+			count = sum(len(index) for index in outliers.values())
+			self.console.print(f'[{messageColor}]{count} Outliers removed/replaced.')
+			self.stats['outliers'] = count
 		except Exception as e:
-			console.print(f'[{errorColor}]REPLACE_OUTLIERS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'REPLACE_OUTLIERS EXCEPTION - Something strange is going on: {type(e)}')
+
+	def outlier_engine(self) -> OutlierEngine:
+		"""
+		OutlierEngine for the options --iqr/--std/--mad, --zscore, --window and --outlier.
+		"""
+		method = 'iqr' if bool(self.iqr[0]) else 'mad' if bool(self.mad[0]) else 'std'
+		return OutlierEngine(method, self.outlier[0], float(self.s[0]), ['Temp', 'Hum'], self.window[0], self.estimator[0], int(self.column_threads[0]))
 
 	def drop_duplicates(self) -> None:
 		"""
 		Drops duplicates. Running this will keep one instance of the duplicated row, and remove all those after.
+		The raw rows (first call) are compared completely. The parsed rows (second call) are compared by the hash of the
+		--dup-keys columns and --dup-keep decides which row is kept.
 		"""
 		try:
-			self.dataframe = self.dataframe.drop_duplicates()
-			console.print(f'[{messageColor}]Dropping duplicates.')
+			previous = self.dataframe
+			if 'Key' in self.dataframe.columns:
+				# rows of the fast parser are compared by the hash of their raw fields
+				self.dataframe = DuplicateWindow(0).drop_duplicates(self.dataframe, self.dataframe['Key'].to_numpy()).drop(columns=['Key'])
+			elif 'TO' in self.dataframe.columns:
+				self.dataframe = DuplicateWindow(0).drop_duplicates(self.dataframe)
+			else:
+				self.dataframe = self.duplicate_window(0).drop_duplicates(self.dataframe)
+			self.changes.record(previous, self.dataframe)
+			self.console.print(f'[{messageColor}]Dropping duplicates.')
+			if len(previous) != len(self.dataframe):
+				self.console.print(f'[{messageColor}]Duplicates dropped: {len(previous) - len(self.dataframe)}')
+		except ValueError:
+			self.error(f'DROP_DUPLICATES EXCEPTION - Invalid duplicate keys: {self.dup_keys[0]}')
 		except Exception as e:
-			console.print(f'[{errorColor}]REPLACE_OUTLIERS EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'REPLACE_OUTLIERS EXCEPTION - Something strange is going on: {type(e)}')
+
+	def duplicate_window(self, size:int) -> DuplicateWindow:
+		"""
+		DuplicateWindow for the parsed rows with the options --dup-keys and --dup-keep. Raises ValueError for unknown columns.
+		"""
+		columns = None
+		if self.dup_keys[0]:
+			columns = [column.strip() for column in str(self.dup_keys[0]).split(',') if column.strip()]
+			if (not columns) or any(column not in ['Temp', 'Hum', 'Datetime'] for column in columns):
+				raise ValueError(f'Invalid duplicate keys: {self.dup_keys[0]}')
+		return DuplicateWindow(size, columns, self.dup_keep[0])
+
+	def chunk_duplicate_window(self, stage:str) -> DuplicateWindow:
+		"""
+		duplicate_window of --dupwindow rows for the chunked and follow mode, None (with an error) for invalid keys.
+		"""
+		try:
+			return self.duplicate_window(int(self.dupwindow[0]))
+		except ValueError:
+			self.error(f'{stage} EXCEPTION - Invalid duplicate keys: {self.dup_keys[0]}')
+			return None
 
 	def plot_data(self) -> None:
 		"""
 		Creates Boxplots and Lineplots for Time series Temp and Hum. For a better data comparison two dataframes are compared to each other (before and after outlier removal). If plot = True a plot opened during runtime.
+		The boxplots are drawn from precomputed statistics and the lines are decimated to the minimum and maximum per pixel,
+		so the plot takes the same time for any file size. Without --plot the figure is rendered with the non-interactive Agg canvas.
 		"""
 		try:
+			if bool(self.noplot[0]):
+				self.console.print(f'[{messageColor}]Data plot is deactivated.')
+				return
 			# Dataframes
-			data_raw = df_before_check_valid_value
-			data_before = df_before_outliers
-			data_after = self.dataframe
+			datasets = [
+				('before removal of invalid values', self.changes.view('check_valid_value', self.dataframe)),
+				('before outlier removal', self.changes.view('remove_outliers', self.dataframe)),
+				('after outlier removal', self.dataframe),
+			]
+			# seaborn and matplotlib are only imported when a plot is created
+			import seaborn as sns
+			from matplotlib.figure import Figure
+			from matplotlib.backends.backend_agg import FigureCanvasAgg
 			# Create Plot
-			fig, ax = plt.subplots(3, 2, figsize=(14,10))
+			if bool(self.plot[0]):
+				import matplotlib.pyplot as plt
+				fig, ax = plt.subplots(3, 2, figsize=(14,10))
+			else:
+				fig = Figure(figsize=(14,10))
+				FigureCanvasAgg(fig)
+				ax = fig.subplots(3, 2)
 			fig.subplots_adjust(hspace=0.5)
 			# Plot Title
 			if bool(self.std[0]):
 				fig.suptitle(f'Sensor Data: Humidity and Temperature (Outlier removal with Standard deviation: SD = {int(self.s[0])} )')
 			else:
 				fig.suptitle('Sensor Data: Humidity and Temperature (Outlier removal with Interquartile Range: Q1 = 0.25, Q3 = 0.75 )')
-			# Boxplot
-			ax[0,0].set_xlim(0,150)
-			ax[1,0].set_xlim(0,150)
-			ax[2,0].set_xlim(0,150)
-			ax[0,0].set_title('Boxplot before removal of invalid values')
-			ax[1,0].set_title('Boxplot before outlier removal')
-			ax[2,0].set_title('Boxplot after outlier removal')
-			ax[0,0].set_xlabel('Values')
-			ax[1,0].set_xlabel('Values')
-			ax[2,0].set_xlabel('Values')
-			sns.boxplot(ax=ax[0,0], data=data_raw[['Temp', 'Hum']], orient="h")
-			sns.boxplot(ax=ax[1,0], data=data_before[['Temp', 'Hum']], orient="h")
-			sns.boxplot(ax=ax[2,0], data=data_after[['Temp', 'Hum']], orient="h")
-			# Lineplot
-			ax[0,1].set_title('Lineplot before removal of invalid values')
-			ax[1,1].set_title('Lineplot before outlier removal')
-			ax[2,1].set_title('Lineplot after outlier removal')
-			ax[0,1].set_xlabel('Measurements')
-			ax[1,1].set_xlabel('Measurements')
-			ax[2,1].set_xlabel('Measurements')
-			sns.lineplot(ax=ax[0,1], data=data_raw[['Temp', 'Hum']])
-			sns.lineplot(ax=ax[1,1], data=data_before[['Temp', 'Hum']])
-			sns.lineplot(ax=ax[2,1], data=data_after[['Temp', 'Hum']])
+			colors = sns.color_palette()
+			buckets = int(fig.get_figwidth() * fig.dpi * ax[0,1].get_position().width)
+			for row, (title, data) in enumerate(datasets):
+				# Boxplot
+				ax[row,0].set_xlim(0,150)
+				ax[row,0].set_title(f'Boxplot {title}')
+				ax[row,0].set_xlabel('Values')
+				stats = [boxplot_stats(data[column], column) for column in ['Temp', 'Hum']]
+				boxes = [(position, stat) for position, stat in enumerate(stats) if stat is not None]
+				artists = ax[row,0].bxp([stat for _, stat in boxes], positions=[position for position, _ in boxes], vert=False, widths=0.8, patch_artist=True, flierprops={'marker': 'd', 'markerfacecolor': '0.25', 'markeredgecolor': '0.25', 'markersize': 5}, medianprops={'color': '0.25'}, whiskerprops={'color': '0.25'}, capprops={'color': '0.25'})
+				for box, (position, _) in zip(artists['boxes'], boxes):
+					box.set_facecolor(sns.desaturate(colors[position], 0.75))
+					box.set_edgecolor('0.25')
+				ax[row,0].set_yticks([0, 1], ['Temp', 'Hum'])
+				ax[row,0].set_ylim(1.5, -0.5)
+				# Lineplot
+				ax[row,1].set_title(f'Lineplot {title}')
+				ax[row,1].set_xlabel('Measurements')
+				index = data.index.to_numpy()
+				for position, (column, style) in enumerate([('Temp', '-'), ('Hum', '--')]):
+					kept, values = minmax_decimate(data[column].to_numpy(dtype='float64'), buckets)
+					ax[row,1].plot(index[kept], values, style, color=colors[position], label=column)
+				ax[row,1].legend()
 			# Save Plot
-			fig.savefig('plot.png')
+			fig.savefig(self.plotfile[0])
 			# Show Plot
 			if bool(self.plot[0]):
 				plt.show()
-			console.print(f'[{messageColor}]Data plot accomplished: plot.png')
+				plt.close(fig)
+			self.console.print(f'[{messageColor}]Data plot accomplished: {self.plotfile[0]}')
 		except Exception as e:
-			console.print(f'[{errorColor}]PLOT_DATA EXCEPTION - Something strange is going on: {type(e)}')
+			self.error(f'PLOT_DATA EXCEPTION - Something strange is going on: {type(e)}')
 
-###### MAIN - argparse ######
-highlightColor = 'blue'
-messageColor = 'spring_green2'
-errorColor = 'red'
-	
-if __name__ == '__main__':
-	console = Console()
+	def read_chunks(self, duplicates:DuplicateWindow, source=None, position:int=0):
+		"""
+		Reads the input-file (or source: a binary file object) in chunks of --chunksize rows like open_file, rename_columns,
+		drop_duplicates and create_datetime. Yields the chunks with the global row position (starting at position) as index.
+		"""
+		source = self.inputfile[0] if source is None else source
+		self.stats['rows_in'] = 0
+		if self.parser[0] == 'fast':
+			self.reader = SensorLogParser(self.timestamp_format[0], self.value_dtype)
+			for chunk in self.reader.iter_chunks(source, int(self.chunksize[0])):
+				self.stats['rows_in'] += len(chunk)
+				chunk = duplicates.drop_duplicates(chunk, keys=chunk['Key'].to_numpy()).drop(columns=['Key'])
+				chunk.index = pd.RangeIndex(position, position + len(chunk))
+				position += len(chunk)
+				yield chunk
+			return
+		with (open(source, 'rb') if isinstance(source, (str, os.PathLike)) else contextlib.nullcontext(source)) as file:
+			while True:
+				lines = list(itertools.islice(file, int(self.chunksize[0])))
+				if not lines:
+					break
+				chunk = parse_lines(lines)
+				self.stats['rows_in'] += len(chunk)
+				chunk = duplicates.drop_duplicates(chunk)
+				chunk.index = pd.RangeIndex(position, position + len(chunk))
+				position += len(chunk)
+				if bool(self.compact[0]):
+					yield self.compact_columns(chunk, key=False)
+					continue
+				chunk['Datetime'] = pd.to_datetime(chunk['Date'] + ' ' + chunk['Time'], errors="coerce")
+				yield chunk.drop(columns=['Date', 'Time'])
+
+	def scan_chunks(self, source=None) -> None:
+		"""
+		First pass of the chunked mode. Gets the first and last valid timestamp and the median timegap without keeping the rows.
+		The exact median needs all timegaps (8 bytes per row, more if NaT are sorted in Python, see median_timegap), only
+		--estimator tdigest has bounded memory.
+		"""
+		first_index = None
+		last_index = None
+		previous = None
+		# all timegaps (exact) or a sketch of bounded size (tdigest)
+		timegaps = TDigest() if self.estimator[0] == 'tdigest' else []
+		for chunk in self.read_chunks(DuplicateWindow(int(self.dupwindow[0])), source):
+			if not len(chunk):
+				continue
+			values = chunk['Datetime'].to_numpy(dtype='datetime64[ns]')
+			valid = np.flatnonzero(~np.isnat(values))
+			if len(valid):
+				if first_index is None:
+					first_index = chunk.index[valid[0]]
+					self.start_time = pd.Timestamp(values[valid[0]])
+				last_index = chunk.index[valid[-1]]
+				self.end_time = pd.Timestamp(values[valid[-1]])
+			# timegaps between consecutive rows like calculate_mean_timegap (NaT if one of them is NaT)
+			extended = values if previous is None else np.concatenate(([previous], values))
+			gaps = np.diff(extended.view('int64'))
+			gaps[np.isnat(extended[1:]) | np.isnat(extended[:-1])] = np.iinfo(np.int64).min
+			if isinstance(timegaps, TDigest):
+				timegaps.update(gaps[gaps != np.iinfo(np.int64).min])
+			else:
+				timegaps.append(gaps)
+			previous = values[-1]
+		if first_index is None:
+			raise ValueError('No valid timestamp in Datetime column')
+		self.first_index = int(first_index)
+		self.last_index = int(last_index)
+		self.mean_timegap = self.median_timegap(timegaps if isinstance(timegaps, TDigest) else np.concatenate(timegaps))
+		self.console.print(f'[{messageColor}]First valid Timestamp: {self.start_time}, index: {self.first_index}')
+		self.console.print(f'[{messageColor}]Last valid Timestamp: {self.end_time}, index: {self.last_index}')
+		self.console.print(f'[{messageColor}]Median Timegap between Timestamps: {self.mean_timegap}')
+
+	def chunk_max_gap(self, stage:str):
+		"""
+		--max-gap for the chunked and follow mode. False with an error message if it is invalid.
+		"""
+		try:
+			return self.max_gap_value()
+		except ValueError:
+			self.error(f'{stage} EXCEPTION - Invalid max-gap: {self.max_gap[0]}')
+			return False
+
+	def chunk_resampler(self):
+		"""
+		GridResampler for --resample in the chunked and follow mode, None without --resample. False with the error message
+		of resample_grid if the grid step or --max-gap is invalid.
+		"""
+		if not bool(self.resample[0]):
+			return None
+		try:
+			return self.grid_resampler()
+		except ValueError:
+			self.error(f'RESAMPLE_GRID EXCEPTION - Invalid grid step or max-gap: {self.mean_timegap}, {self.max_gap[0]}')
+			return False
+
+	def print_late_rows(self, resampler:GridResampler) -> None:
+		"""
+		Prints the rows that came after the grid points around them were written (chunked and follow mode).
+		"""
+		if (resampler is not None) and resampler.late:
+			self.console.print(f'[{messageColor}]Resampling: {resampler.late} rows are further out of order than the rows before them, the grid points around them differ from a run without --chunksize/--follow')
+
+	def chunk_rules(self, stage:str) -> ValueRules:
+		"""
+		ValueRules for the chunked and follow mode, None (with an error) if they cannot be read or depend on neighbouring rows.
+		"""
+		try:
+			rules = self.value_rules()
+		except (OSError, ValueError) as e:
+			self.error(f'{stage} EXCEPTION - Cannot read value rules: {self.rules[0]} ({e})')
+			return None
+		if rules.sequential():
+			self.error(f'{stage} EXCEPTION - Value rules max_step and stuck are not available in chunked and follow mode')
+			return None
+		return rules
+
+	def process_chunks(self) -> None:
+		"""
+		Chunked mode (--chunksize) for files larger than RAM. Runs the whole pipeline with bounded memory:
+		1. scan_chunks gets the first/last valid timestamp and the median timegap.
+		2. ChunkCleaner repairs timestamps and values chunk by chunk. The cleaned rows are spooled to a binary temporary file.
+		3. Outliers are removed/replaced with the statistics of the spooled columns, duplicates are dropped and the chunks are
+		   appended to the output-file.
+		Duplicates are detected within a window of the last --dupwindow rows.
+		"""
+		try:
+			self.console.print(f'[{messageColor}]Chunked mode: {self.chunksize[0]} rows per chunk. Input-file: {self.inputfile[0]}')
+			rules = self.chunk_rules('PROCESS_CHUNKS')
+			max_gap = self.chunk_max_gap('PROCESS_CHUNKS')
+			duplicates = self.chunk_duplicate_window('PROCESS_CHUNKS')
+			if (rules is None) or (max_gap is False) or (duplicates is None):
+				return
+			self.scan_chunks()
+			cleaner = ChunkCleaner(self.first_index, self.last_index, self.start_time, self.mean_timegap, datetime.today(), rules.rules, self.interpolation[0], max_gap)
+			dtype = np.dtype([('Temp', self.value_dtype), ('Hum', self.value_dtype), ('Datetime', 'datetime64[ns]')])
+			with tempfile.TemporaryDirectory() as directory:
+				spool_path = os.path.join(directory, 'spool.bin')
+				rows_in = 0
+				rows_spooled = 0
+				with open(spool_path, 'wb') as spool_file:
+					for chunk in self.read_chunks(DuplicateWindow(int(self.dupwindow[0]))):
+						rows_in += len(chunk)
+						frame = cleaner.clean(chunk)
+						np.rec.fromarrays([frame[column].to_numpy(dtype=dtype[column]) for column in dtype.names], dtype=dtype).tofile(spool_file)
+						rows_spooled += len(frame)
+						if bool(self.log[0]):
+							print(f'Chunk cleaned: {len(chunk)} rows in, {len(frame)} rows ready')
+					frame = cleaner.clean(chunk.iloc[:0], eof=True)
+					np.rec.fromarrays([frame[column].to_numpy(dtype=dtype[column]) for column in dtype.names], dtype=dtype).tofile(spool_file)
+					rows_spooled += len(frame)
+				if self.reader is not None:
+					self.print_parser_counts()
+				self.console.print(f'[{messageColor}]Input-file processed: {self.inputfile[0]} ({rows_in} rows)')
+				self.stats.update({'invalid_dates': cleaner.counts['invalid_dates'], 'nat': cleaner.counts['nat']})
+				self.console.print(f'[{messageColor}]Invalid Datetime replaced with NaT: {cleaner.counts["invalid_dates"]}. NaT replaced with calculated Timestamps: {cleaner.counts["nat"]}')
+				self.console.print(f'[{messageColor}]Data columns formated. Empty values replaced with NaN: {cleaner.counts["nan"]}. Invalid values replaced with NaN: {cleaner.counts["invalid_values"]}')
+				self.console.print(f'[{messageColor}]Interpolation of NaN values accomplished.')
+				if max_gap is not None:
+					self.console.print(f'[{messageColor}]NaN values kept in gaps longer than {pd.Timedelta(max_gap)}: {cleaner.counts["gap_nan"]}')
+					self.stats['gap_nan'] = cleaner.counts['gap_nan']
+
+				spool = np.memmap(spool_path, dtype=dtype, mode='r') if rows_spooled else np.empty(0, dtype=dtype)
+				engine = None
+				if not bool(self.no[0]):
+					engine = self.outlier_engine().fit(spool)
+					if bool(self.log[0]):
+						for column in engine.columns:
+							print(engine.summary(column))
+				else:
+					self.console.print(f'[{messageColor}]Outlier removal/replacement is deactivated.')
+				resampler = self.chunk_resampler()
+				if resampler is False:
+					return
+				outliers = 0
+				rows_out = 0
+				rows_grid = 0
+				with self.output_writer() as writer:
+					for start in range(0, max(rows_spooled, 1), int(self.chunksize[0])):
+						frame = pd.DataFrame(spool[start:start + int(self.chunksize[0])])
+						if engine is not None:
+							# rolling windows see --chunksize rows before and after the chunk
+							bounds = engine.window_bounds(spool, start, start + int(self.chunksize[0]), int(self.chunksize[0])) if engine.window is not None else None
+							frame, found = engine.apply(frame, bounds)
+							outliers += sum(len(index) for index in found.values())
+						frame = duplicates.drop_duplicates(frame)
+						if resampler is not None:
+							rows_grid += len(frame)
+							frame = resampler.resample(frame, final=start + int(self.chunksize[0]) >= rows_spooled)
+						writer.write(frame)
+						rows_out += len(frame)
+				del spool
+			self.stats['rows_out'] = rows_out
+			if engine is not None:
+				self.console.print(f'[{messageColor}]{outliers} Outliers removed/replaced.')
+				self.stats['outliers'] = outliers
+			self.console.print(f'[{messageColor}]Dropping duplicates.')
+			if resampler is not None:
+				self.console.print(f'[{messageColor}]Resampled to a regular grid of {self.mean_timegap}: {rows_out} rows ({rows_grid} rows before)')
+				self.print_late_rows(resampler)
+			self.console.print(f'[{messageColor}]Output-file processed: {self.outputfile[0]} ({rows_out} rows)')
+			self.print_index(writer)
+			if bool(self.plot[0]):
+				self.console.print(f'[{messageColor}]Data plot is not available in chunked mode.')
+		except ImportError as e:
+			self.error(f'PROCESS_CHUNKS EXCEPTION - {e}')
+		except OSError:
+			self.error(f'PROCESS_CHUNKS EXCEPTION - Cannot process Input-file/Output-file: {self.inputfile[0]}, {self.outputfile[0]}')
+		except Exception as e:
+			self.error(f'PROCESS_CHUNKS EXCEPTION - Something strange is going on: {type(e)}')
+
+	def follow_options(self, stage:str) -> dict:
+		"""
+		Options of the follow mode (and of IngestionService.py) that must not change between runs, with the range rules.
+		None (with an error) if an option is not available for new lines.
+		"""
+		options = {key: self.__dict__[key][0] for key in ['parser', 'timestamp_format', 'iqr', 'std', 'mad', 'no', 'outlier', 's', 'dupwindow', 'estimator', 'compact', 'output_format', 'date_format', 'interpolation', 'max_gap', 'resample', 'dup_keys', 'dup_keep']}
+		if self.window[0]:
+			self.error(f'{stage} EXCEPTION - Rolling window outlier limits (--window) are not available in follow mode')
+			return None
+		rules = self.chunk_rules(stage)
+		max_gap = self.chunk_max_gap(stage)
+		write_duplicates = self.chunk_duplicate_window(stage)
+		if (rules is None) or (max_gap is False) or (write_duplicates is None):
+			return None
+		options['rules'] = rules.rules
+		return options
+
+	def clean_new_lines(self, data:bytes, state:dict, options:dict) -> tuple:
+		"""
+		Cleans complete new lines with the state of the lines before (None for the first lines), like the follow mode:
+		1. The first lines give the first valid timestamp and the median timegap (scan_chunks).
+		2. ChunkCleaner repairs the new rows. Rows that depend on following lines (the next timestamp, the end of a NaT
+		   or NaN run) are held back in the state.
+		3. Outlier limits come from the RunningStats of all rows cleaned so far.
+		Returns the cleaned rows and the new state (plain values and arrays), or (None, None) if the first lines have no
+		valid timestamp or median timegap yet.
+		"""
+		self.chunksize = (self.chunksize[0] or 100000),
+		max_gap = self.max_gap_value()
+		write_duplicates = self.duplicate_window(int(self.dupwindow[0]))
+		fresh = state is None
+		if fresh:
+			try:
+				self.scan_chunks(io.BytesIO(data))
+			except ValueError:
+				self.console.print(f'[{messageColor}]No valid timestamp in Input-file yet, nothing written.')
+				return None, None
+			if pd.isnull(self.mean_timegap):
+				self.console.print(f'[{messageColor}]Median Timegap is not defined yet (too few lines), nothing written.')
+				return None, None
+			state = {'options': options, 'offset': 0, 'position': 0, 'rows_out': 0}
+			# no last valid timestamp while the file grows: every row waits for its next timestamp
+			cleaner = ChunkCleaner(self.first_index, np.iinfo(np.int64).max, self.start_time, self.mean_timegap, datetime.today(), options['rules'], self.interpolation[0], max_gap)
+		else:
+			state = dict(state)
+			cleaner = ChunkCleaner(**{key: state['cleaner'][key] for key in ['first_index', 'last_index', 'start_time', 'mean_timegap']}, now=datetime.today())
+			cleaner.__dict__.update({key: value for key, value in state['cleaner'].items() if key != 'now'})
+		read_duplicates = DuplicateWindow(int(self.dupwindow[0]))
+		running = RunningStats(['Temp', 'Hum'])
+		self.mean_timegap = cleaner.mean_timegap
+		resampler = self.chunk_resampler()
+		if resampler is False:
+			return None, None
+		if not fresh:
+			read_duplicates.keys, write_duplicates.keys = state['read_duplicates'], state['write_duplicates']
+			running.tables = state['running']
+			if resampler is not None:
+				resampler.__dict__.update(state['resampler'])
+		counts = dict(cleaner.counts)
+		frames = []
+		self.stats['rows_in'] = 0
+		if data.strip():
+			for chunk in self.read_chunks(read_duplicates, io.BytesIO(data), state['position']):
+				state['position'] += len(chunk)
+				frames.append(cleaner.clean(chunk))
+		frame = pd.concat(frames) if frames else pd.DataFrame({'Temp': [], 'Hum': [], 'Datetime': pd.Series([], dtype='datetime64[ns]')})
+		if self.reader is not None:
+			self.print_parser_counts()
+		self.stats.update({key: cleaner.counts[key] - counts[key] for key in ['invalid_dates', 'nat']})
+		running.update(frame)
+		if not bool(self.no[0]):
+			engine = self.outlier_engine().fit_summary({column: running.summary(column) for column in ['Temp', 'Hum']})
+			if bool(self.log[0]):
+				for column in engine.columns:
+					print(engine.summary(column))
+			frame, found = engine.apply(frame)
+			self.stats['outliers'] = sum(len(index) for index in found.values())
+			self.console.print(f'[{messageColor}]{self.stats["outliers"]} Outliers removed/replaced.')
+		else:
+			self.console.print(f'[{messageColor}]Outlier removal/replacement is deactivated.')
+		frame = write_duplicates.drop_duplicates(frame)
+		if resampler is not None:
+			# the next lines may still have rows before the last grid points
+			frame = resampler.resample(frame, final=False)
+			self.print_late_rows(resampler)
+		self.stats['held'] = sum(len(pending) for pending in [cleaner.pending_date, cleaner.pending_fill, cleaner.pending_values] if pending is not None)
+		# plain values and arrays only, the checkpoint does not depend on the classes of this module
+		state.update(cleaner=dict(vars(cleaner)), read_duplicates=read_duplicates.keys, write_duplicates=write_duplicates.keys, running=running.tables)
+		if resampler is not None:
+			state['resampler'] = dict(vars(resampler))
+		state['rows_out'] += len(frame)
+		self.stats['rows_out'] = len(frame)
+		self.console.print(f'[{messageColor}]Invalid Datetime replaced with NaT: {self.stats["invalid_dates"]}. NaT replaced with calculated Timestamps: {self.stats["nat"]}')
+		if max_gap is not None:
+			self.stats['gap_nan'] = cleaner.counts['gap_nan'] - counts['gap_nan']
+			self.console.print(f'[{messageColor}]NaN values kept in gaps longer than {pd.Timedelta(max_gap)}: {self.stats["gap_nan"]}')
+		return frame, state
+
+	def process_new_lines(self) -> None:
+		"""
+		Follow mode (--follow) for input-files that are appended continuously. Only the lines appended since the last run are
+		read, repaired with the state of the checkpoint (clean_new_lines) and appended to the output-file. Rows in the
+		output-file are not changed. A partial last line is read in the next run.
+		"""
+		try:
+			checkpoint = FollowCheckpoint(self.checkpoint[0] or f'{self.outputfile[0]}.checkpoint')
+			options = self.follow_options('PROCESS_NEW_LINES')
+			if options is None:
+				return
+			if bool(self.partition[0]) or ((self.output_format[0] or OutputWriter.detect(self.outputfile[0])) not in ['csv', 'csv.gz', 'csv.zst']):
+				self.error('PROCESS_NEW_LINES EXCEPTION - Only CSV output-files (plain, gzip or zstd) without partitions can be appended in follow mode')
+				return
+			state = checkpoint.load()
+			reason = None if state is None else checkpoint.mismatch(state, self.inputfile[0], options)
+			if reason is not None:
+				self.console.print(f'[{messageColor}]Checkpoint ignored ({reason}): {checkpoint.path}')
+				state = None
+			offset = 0 if state is None else state['offset']
+			with open(self.inputfile[0], 'rb') as file:
+				file.seek(offset)
+				data = file.read()
+			data = data[:data.rfind(b'\n') + 1]
+			self.console.print(f'[{messageColor}]Follow mode: {len(data)} new bytes from offset {offset}. Input-file: {self.inputfile[0]}')
+			fresh = state is None
+			if not fresh:
+				self.console.print(f'[{messageColor}]Checkpoint loaded: {checkpoint.path} ({state["rows_out"]} rows written)')
+			frame, state = self.clean_new_lines(data, state, options)
+			if frame is None:
+				return
+			with self.output_writer(append=not fresh) as writer:
+				writer.write(frame)
+			self.print_index(writer)
+			state['offset'] = offset + len(data)
+			checkpoint.store(state, self.inputfile[0])
+			self.console.print(f'[{messageColor}]Output-file appended: {self.outputfile[0]} ({len(frame)} new rows, {self.stats["held"]} rows held back until the next lines)')
+			self.console.print(f'[{messageColor}]Checkpoint written: {checkpoint.path} (offset {state["offset"]} bytes)')
+			if bool(self.plot[0]):
+				self.console.print(f'[{messageColor}]Data plot is not available in follow mode.')
+		except ImportError as e:
+			self.error(f'PROCESS_NEW_LINES EXCEPTION - {e}')
+		except OSError:
+			self.error(f'PROCESS_NEW_LINES EXCEPTION - Cannot process Input-file/Output-file/Checkpoint: {self.inputfile[0]}, {self.outputfile[0]}')
+		except Exception as e:
+			self.error(f'PROCESS_NEW_LINES EXCEPTION - Something strange is going on: {type(e)}')
+
+###### Batch mode ######
+def batch_files(pattern:str) -> list:
+	"""
+	Input-files of the batch mode: all files of a directory or the files matching a glob pattern.
+	"""
+	if os.path.isdir(pattern):
+		return sorted(os.path.join(pattern, name) for name in os.listdir(pattern) if not name.startswith('.') and os.path.isfile(os.path.join(pattern, name)))
+	return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+def is_batch(pattern:str) -> bool:
+	"""
+	True if the input is a directory or a glob pattern.
+	"""
+	return os.path.isdir(pattern) or glob.has_magic(pattern)
+
+def process_file(args:argparse.Namespace) -> dict:
+	"""
+	Runs the FileHandler pipeline on one input-file of the batch mode (in a worker process). Returns the summary of the file.
+	"""
+	summary = {'file': args.inputfile, 'output': args.outputfile, 'status': 'ok', 'error': ''}
+	start = time.perf_counter()
+	try:
+		if os.path.abspath(args.inputfile) == os.path.abspath(args.outputfile):
+			raise ValueError('Output-file would overwrite the input-file')
+		file = FileHandler(args, Console(file=io.StringIO()))
+		file.run()
+		summary.update(file.stats)
+		summary.update({f'time_{stage}': seconds for stage, seconds in file.profiler.timings().items()})
+		if file.errors:
+			summary['status'] = 'error'
+			summary['error'] = '; '.join(file.errors)
+	except Exception as e:
+		summary['status'] = 'failed'
+		summary['error'] = f'{type(e).__name__}: {e}'
+	summary['seconds'] = time.perf_counter() - start
+	return summary
+
+def run_batch(args:argparse.Namespace, console:Console) -> pd.DataFrame:
+	"""
+	Batch mode: runs process_file for every input-file in a process pool with --workers processes. The output-files,
+	the plots and summary.csv are written to the output directory. A failing file does not stop the batch.
+	"""
+	files = batch_files(args.inputfile)
+	if not files:
+		console.print(f'[{errorColor}]BATCH EXCEPTION - No input-files found: {args.inputfile}')
+		return pd.DataFrame()
+	os.makedirs(args.outputfile, exist_ok=True)
+	console.print(f'[{messageColor}]Batch mode: {len(files)} input-files, {args.workers} workers. Output directory: {args.outputfile}')
+	jobs = []
+	for path in files:
+		name = pathlib.Path(path)
+		jobs.append(argparse.Namespace(**{**vars(args), 'inputfile': path, 'outputfile': os.path.join(args.outputfile, name.name if args.output_format is None else name.stem + OutputWriter.suffixes[args.output_format]),
+			'plotfile': os.path.join(args.outputfile, f'{name.stem}_plot.png'), 'plot': False,
+			'profile': os.path.join(args.outputfile, f'{name.stem}_profile.json') if args.profile else None}))
+	summaries = []
+	with ProcessPoolExecutor(max_workers=args.workers) as pool:
+		futures = {pool.submit(process_file, job): job for job in jobs}
+		for future in as_completed(futures):
+			job = futures[future]
+			try:
+				summary = future.result()
+			except Exception as e:
+				# the worker process died
+				summary = {'file': job.inputfile, 'output': job.outputfile, 'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+			summaries.append(summary)
+			color = messageColor if summary['status'] == 'ok' else errorColor
+			console.print(f'[{color}]{summary["status"].upper()}: {summary["file"]} {summary["error"]}')
+	summary = pd.DataFrame(summaries).sort_values('file').reset_index(drop=True)
+	for column in ['rows_in', 'rows_out', 'invalid_dates', 'nat', 'outliers']:
+		if column not in summary.columns:
+			summary[column] = np.nan
+	summary.insert(summary.columns.get_loc('rows_out') + 1, 'rows_dropped', summary['rows_in'] - summary['rows_out'])
+	summary.to_csv(os.path.join(args.outputfile, 'summary.csv'), index=False)
+	# aggregated summary
+	table = Table(title=f'Batch summary ({os.path.join(args.outputfile, "summary.csv")})')
+	for column in ['Files', 'OK', 'Errors', 'Failed', 'Rows in', 'Rows out', 'Rows dropped', 'NaT fixed', 'Outliers', 'Seconds']:
+		table.add_column(column, justify='right')
+	status = summary['status'].value_counts()
+	table.add_row(*[str(value) for value in [len(summary), status.get('ok', 0), status.get('error', 0), status.get('failed', 0)]],
+		*[str(int(summary[column].sum())) for column in ['rows_in', 'rows_out', 'rows_dropped', 'nat', 'outliers']], f'{summary["seconds"].sum():.2f}')
+	console.print(table)
+	stages = [column for column in summary.columns if column.startswith('time_')]
+	if stages:
+		table = Table(title='Time per stage (all files)')
+		table.add_column('Stage')
+		table.add_column('Seconds', justify='right')
+		for column in stages:
+			table.add_row(column[len('time_'):], f'{summary[column].sum():.3f}')
+		console.print(table)
+	return summary
+
+###### Library API ######
+class ProcessResult(object):
+	"""
+	Result of process: the processed Dataframe (empty in chunked and follow mode), the counts of the run (stats), the
+	error messages and the wall time per stage.
+	"""
+
+	def __init__(self, dataframe:pd.DataFrame, stats:dict, errors:list, timings:dict) -> None:
+		"""
+		Constructor for the ProcessResult class.
+		"""
+		self.dataframe = dataframe
+		self.stats = stats
+		self.errors = errors
+		self.timings = timings
+
+	@property
+	def ok(self) -> bool:
+		"""
+		True if no stage reported an error.
+		"""
+		return not self.errors
+
+def load_config(path:str) -> dict:
+	"""
+	Options from a JSON configuration file (--config), named like the options of default_config, e.g.
+	{"iqr": true, "outlier": "limit", "rules": "rules.json", "skip_stages": "plot_data,drop_duplicates"}.
+	"""
+	with open(path) as file:
+		config = json.load(file)
+	if not isinstance(config, dict):
+		raise ValueError(f'Configuration file must contain a JSON object: {path}')
+	return config
+
+OUTLIER_METHODS = ['iqr', 'std', 'mad', 'no']
+
+class OutlierMethod(argparse.Action):
+	"""
+	store_true for -iq/-st/-md/-no that also clears the other methods, so a method on the command line replaces the method
+	of a --config file (its options are defaults and set before the command line is parsed).
+	"""
 
-	# parse command line argiments
+	def __init__(self, option_strings:list, dest:str, default:bool=False, help:str=None) -> None:
+		"""
+		Constructor for the OutlierMethod class.
+		"""
+		super().__init__(option_strings, dest, nargs=0, default=default, help=help)
+
+	def __call__(self, parser, namespace, values, option_string:str=None) -> None:
+		for dest in OUTLIER_METHODS:
+			setattr(namespace, dest, dest == self.dest)
+
+def build_parser(defaults:dict=None) -> argparse.ArgumentParser:
+	"""
+	Command line arguments of TimeSeriesHandler.py. Their defaults are also the defaults of default_config. defaults
+	(load_config) replace them; arguments given there are not required on the command line any more.
+	"""
 	parser = argparse.ArgumentParser()
 
 	# arguments
 	outlier = parser.add_mutually_exclusive_group(required=True)
-	parser.add_argument('-i','--input', action='store', required=True, dest='inputfile', metavar='<filename>', help='Specify the path to the input-file')
-	parser.add_argument('-o','--output', action='store', required=True, dest='outputfile', metavar='<filename>', help='Specify the path to the output-file')
+	parser.add_argument('-i','--input', action='store', required=True, dest='inputfile', metavar='<filename>', help='Specify the path to the input-file. A directory or a glob pattern (quoted) starts the batch mode')
+	parser.add_argument('-o','--output', action='store', required=True, dest='outputfile', metavar='<filename>', help='Specify the path to the output-file (batch mode: output directory)')
 	parser.add_argument('-p','--plot', action='store_true', dest='plot', default=False, help='Show Plot (default: disabled)')
-	outlier.add_argument('-iq','--iqr', action='store_true', dest='iqr', default=False, help='Use IQR for outlier identification (default: disabled)')
-	outlier.add_argument('-st','--std', action='store_true', dest='std', default=False, help='Use Z-Score for outlier identification (default: disabled)')
-	outlier.add_argument('-no','--noremoval', action='store_true', dest='no', default=False, help='No outlier removal (default: disabled)')
+	parser.add_argument('--plotfile', action='store', dest='plotfile', default='plot.png', metavar='<filename>', help='Path of the saved plot (default: plot.png)')
+	parser.add_argument('--no-plot', action='store_true', dest='noplot', default=False, help='Do not create the plot (default: disabled)')
+	outlier.add_argument('-iq','--iqr', action=OutlierMethod, dest='iqr', default=False, help='Use IQR for outlier identification (default: disabled)')
+	outlier.add_argument('-st','--std', action=OutlierMethod, dest='std', default=False, help='Use Z-Score for outlier identification (default: disabled)')
+	outlier.add_argument('-md','--mad', action=OutlierMethod, dest='mad', default=False, help='Use median and Median absolute deviation (MAD) for outlier identification, limits: median -/+ <s> * 1.4826 * MAD (default: disabled)')
+	outlier.add_argument('-no','--noremoval', action=OutlierMethod, dest='no', default=False, help='No outlier removal (default: disabled)')
 	parser.add_argument('-u','--outlier', action='store', required=True, dest='outlier', metavar='<choice>', choices = ['remove', 'mean', 'median', 'limit', 'mode', 'ignore'], help='Choose outlier replacement method. Choices: [remove, mean, median, limit, mode, ignore]')
-	parser.add_argument('-z','--zscore', action='store', dest='s', default=3, metavar='<s>', required='--std' in sys.argv, type=float, help='Z-Score for outlier detection (default: 3)')
+	parser.add_argument('-z','--zscore', action='store', dest='s', default=3, metavar='<s>', required=('--std' in sys.argv) or ('--mad' in sys.argv), type=float, help='Z-Score for outlier detection (default: 3)')
+	parser.add_argument('--window', action='store', dest='window', default=None, metavar='<offset>', help='Compute the outlier limits over a centered rolling time window of the Datetime column, e.g. 1h or 30min: rolling quartiles (--iqr), rolling mean/SD (--std) or rolling median/MAD (--mad) (default: whole file)')
+	parser.add_argument('--estimator', action='store', dest='estimator', default='exact', metavar='<choice>', choices=ESTIMATORS, help='Estimator of the median timegap and the outlier statistics. tdigest computes approximate quantiles in one pass with bounded memory. exact reproduces the original median timegap, which sorts in Python if there are NaT. Choices: [exact, tdigest] (default: exact)')
+	parser.add_argument('--rules', action='store', dest='rules', default=None, metavar='<filename>', help='JSON file with validation rules per column (min, max, max_step, stuck), e.g. {"Temp": {"max_step": 5, "stuck": 24}} (default: Temp 0-50, Hum 0-100)')
+	parser.add_argument('--interpolation', action='store', dest='interpolation', default='linear', metavar='<choice>', choices=INTERPOLATIONS, help='Interpolation of NaN values. linear uses the row position, time the repaired Datetime (uneven timegaps). Choices: [linear, time] (default: linear)')
+	parser.add_argument('--max-gap', action='store', dest='max_gap', default=None, metavar='<offset>', help='Keep NaN values in gaps longer than <offset> (e.g. 30min, 2h) instead of interpolating them (default: no limit)')
+	parser.add_argument('--resample', action='store_true', dest='resample', default=False, help='Resample Temp and Hum to a regular grid of the median timegap, grid points in gaps longer than --max-gap are NaN (default: disabled)')
 	parser.add_argument('-l','--log', action='store_true', dest='log', default=False, help='Show detailed logs (default: disabled)')
+	parser.add_argument('-c','--chunksize', action='store', dest='chunksize', default=None, metavar='<rows>', type=int, help='Process the input-file in chunks of <rows> rows, for files larger than RAM. With --estimator exact the first pass keeps all timegaps (8 bytes per row), use --estimator tdigest for bounded memory (default: disabled)')
+	parser.add_argument('--parser', action='store', dest='parser', default='pandas', metavar='<choice>', choices=['pandas', 'fast'], help='Choose input parser. fast reads the fixed "Date Time T= H= TO=" format with NumPy. Choices: [pandas, fast] (default: pandas)')
+	parser.add_argument('--timestamp-format', action='store', dest='timestamp_format', default=TIMESTAMP_FORMAT, metavar='<format>', help='Timestamp format of the fast parser (default: %%Y-%%m-%%d %%H:%%M:%%S)')
+	parser.add_argument('--no-cache', action='store_true', dest='no_cache', default=False, help='Do not read or write the parse cache (default: cache enabled)')
+	parser.add_argument('--cache-dir', action='store', dest='cache_dir', default=os.path.join(pathlib.Path.home(), '.cache', 'TimeSeriesHandler'), metavar='<dir>', help='Directory of the parse cache (default: ~/.cache/TimeSeriesHandler)')
+	parser.add_argument('--cache-size', action='store', dest='cache_size', default=1024, metavar='<MB>', type=int, help='Maximum size of the parse cache in MB, least recently used entries are evicted (default: 1024)')
+	parser.add_argument('--profile', action='store', dest='profile', nargs='?', const='profile.json', default=None, metavar='<filename>', help='Print wall/CPU time, memory and rows of each stage and write them as JSON (default: disabled, <filename>: profile.json)')
+	parser.add_argument('-w','--workers', action='store', dest='workers', default=os.cpu_count(), metavar='<n>', type=int, help='Number of worker processes in batch mode (default: number of CPUs)')
+	parser.add_argument('--dupwindow', action='store', dest='dupwindow', default=100000, metavar='<rows>', type=int, help='Window of rows for duplicate detection in chunked mode (default: 100000)')
+	parser.add_argument('--dup-keys', action='store', dest='dup_keys', default=None, metavar='<columns>', help='Comma separated columns that identify a duplicate after parsing, e.g. Datetime for the same timestamp with different values. Columns: [Temp, Hum, Datetime] (default: all columns)')
+	parser.add_argument('--dup-keep', action='store', dest='dup_keep', default='first', metavar='<choice>', choices=DUPLICATE_POLICIES, help='Row kept of duplicates with equal --dup-keys: the first, the last or the first with the mean of the other columns. Choices: [first, last, mean] (default: first)')
+	parser.add_argument('--format', action='store', dest='output_format', default=None, metavar='<choice>', choices=OUTPUT_FORMATS, help='Format of the output-file. Choices: [csv, csv.gz, csv.zst, parquet, feather] (default: from the extension of the output-file: .gz, .zst, .parquet, .feather/.arrow, otherwise csv)')
+	parser.add_argument('--partition-by-day', action='store_true', dest='partition', default=False, help='Write the output-file as directory with one subdirectory (date=YYYY-MM-DD) of part-files per day (default: disabled)')
+	parser.add_argument('--date-format', action='store', dest='date_format', default=None, metavar='<format>', help='strftime format of Datetime in CSV output-files (default: %%Y-%%m-%%d %%H:%%M:%%S, formatted with NumPy)')
+	parser.add_argument('--compact', action='store_true', dest='compact', default=False, help='Compact memory mode: Temp and Hum as float32, string columns converted while reading. Prints the bytes per row (default: disabled)')
+	parser.add_argument('--follow', action='store_true', dest='follow', default=False, help='Process only the lines appended to the input-file since the last run and append the cleaned rows to the output-file. The median timegap of the first run is kept for all later runs, so the output can differ from a run over the whole file (default: disabled)')
+	parser.add_argument('--checkpoint', action='store', dest='checkpoint', default=None, metavar='<filename>', help='State of the follow mode between runs (default: <output-file>.checkpoint)')
+	parser.add_argument('--index', action='store', dest='time_index', default=None, metavar='<period>', choices=INDEX_PERIODS, help='Write a time index of the output-file (<output-file>.index.json) with the position of the rows and count/min/max/mean of Temp and Hum per period, for range queries with RangeQuery.py. Choices: [hour, day] (default: disabled)')
+	parser.add_argument('--skip-stages', action='store', dest='skip_stages', default=None, metavar='<stages>', help='Comma separated stages that do not run, e.g. drop_duplicates,plot_data. Stages whose results are not used are skipped anyway (default: none)')
+	parser.add_argument('--column-threads', action='store', dest='column_threads', default=2, metavar='<n>', type=int, help='Threads for the per-column work (value checks, outlier statistics) (default: 2)')
+	parser.add_argument('--config', action='store', dest='config', default=None, metavar='<filename>', help='JSON file with options, e.g. {"iqr": true, "outlier": "limit"}. Options on the command line take precedence (default: none)')
+	if defaults:
+		known = {action.dest for action in parser._actions}
+		unknown = sorted(set(defaults) - known)
+		if unknown:
+			raise ValueError(f'Unknown options in configuration file: {unknown}')
+		parser.set_defaults(**defaults)
+		for action in parser._actions:
+			if action.dest in defaults:
+				action.required = False
+		if any(defaults.get(key) for key in OUTLIER_METHODS):
+			outlier.required = False
+	return parser
+
+def default_config(**options) -> argparse.Namespace:
+	"""
+	Options of process with the defaults of the command line, overridden by options (names of args, e.g. iqr=True,
+	outlier='limit', compact=True). Other than on the command line no plot is created and no output-file is written
+	(outputfile=None). Without iqr/std/mad outliers are not removed, without outlier they are only reported.
+	"""
+	parser = build_parser()
+	config = {action.dest: action.default for action in parser._actions if action.default != argparse.SUPPRESS}
+	unknown = set(options) - set(config)
+	if unknown:
+		raise TypeError(f'Unknown options: {sorted(unknown)}')
+	config.update(noplot=True)
+	config.update(options)
+	if not (config['iqr'] or config['std'] or config['mad'] or config['no']):
+		config['no'] = True
+	if config['outlier'] is None:
+		config['outlier'] = 'ignore'
+	return argparse.Namespace(**config)
+
+def process(source, config:argparse.Namespace=None, console:Console=None, **options) -> ProcessResult:
+	"""
+	Runs the pipeline on one input without starting a new interpreter. source is the path of an input-file or data in
+	memory: bytes or a binary file object with log lines, a Dataframe or dict of arrays with the columns Date, Time, Temp,
+	Hum, TO (raw strings) or Datetime, Temp, Hum (parsed). config comes from default_config or is the path of a JSON
+	configuration file (load_config), options are applied on top (an outlier method in options replaces the one of config).
+	Messages go to console (default: discarded).
+	"""
+	if any(options.get(method) for method in OUTLIER_METHODS):
+		options = {**{method: False for method in OUTLIER_METHODS}, **options}
+	if isinstance(config, (str, os.PathLike)):
+		config = default_config(**{**load_config(config), **options})
+	else:
+		config = default_config(**options) if config is None else argparse.Namespace(**{**vars(config), **options})
+	if isinstance(source, (str, os.PathLike)):
+		config.inputfile, source = os.fspath(source), None
+	file = FileHandler(config, Console(file=io.StringIO()) if console is None else console, source)
+	file.run()
+	dataframe = file.dataframe if isinstance(file.dataframe, pd.DataFrame) else pd.DataFrame()
+	return ProcessResult(dataframe, file.stats, file.errors, file.profiler.timings())
+
+###### MAIN - argparse ######
+highlightColor = 'blue'
+messageColor = 'spring_green2'
+errorColor = 'red'
 	
+if __name__ == '__main__':
+	console = Console()
+
+	# parse command line argiments, the options of --config are the defaults
+	config = argparse.ArgumentParser(add_help=False)
+	config.add_argument('--config', action='store', dest='config', default=None)
+	config = config.parse_known_args()[0].config
+	parser = build_parser(load_config(config) if config else None)
 	args = parser.parse_args()
 
 	console.print(f'\n[{highlightColor}][bold]Case Study - Time Series - Dockal - TimeSeriesHandler.py STARTED![/bold]\n\n')
 
-###### Sensor Data Application #######
-try:
-	file = FileHandler(args)
-	file.open_file()
-	file.rename_columns()
-	file.drop_duplicates() # Firstly to remove all duplicates that have been imported via input-file
-	file.create_datetime()
-	file.get_first_valid_timestamp()
-	file.get_last_valid_timestamp()
-	file.calculate_mean_timegap()
-	file.check_valid_date()
-	file.replace_nat()
-	file.format_data_columns()
-	file.check_valid_value()
-	file.interpolate_nan()
-	file.remove_outliers()
-	file.drop_duplicates() # Secondly to remove all duplicates that may heve been created due to replace_nat or interpolate_nan
-	file.plot_data()
-	file.export_file()
-
-except KeyboardInterrupt as e:
-	console.print(f'[{messageColor}]Keyboard Interrupt!')
-except Exception:
-	console.print()
-	console.print_exception()
-finally:
-	console.print(f'\n[{highlightColor}][bold]Case Study - Time Series - Dockal - TimeSeriesHandler.py STOPPED![/bold]\n')
\ No newline at end of file
+	###### Sensor Data Application #######
+	try:
+		if is_batch(args.inputfile):
+			run_batch(args, console)
+		else:
+			file = FileHandler(args, console)
+			file.run()
+
+	except KeyboardInterrupt as e:
+		console.print(f'[{messageColor}]Keyboard Interrupt!')
+	except Exception:
+		console.print()
+		console.print_exception()
+	finally:
+		console.print(f'\n[{highlightColor}][bold]Case Study - Time Series - Dockal - TimeSeriesHandler.py STOPPED![/bold]\n')
\ No newline at end of file